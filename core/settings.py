@@ -16,9 +16,76 @@ import dj_database_url
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 
-# DB_URI = 'bolt://localhost:7687'
-# DB_USER="admin"
-# DB_PASSWORD="admin"
+# Neo4j: один драйвер с пулом соединений на процесс (db/api/neo4j_driver.py)
+NEO4J_URI = os.environ.get('NEO4J_URI', 'neo4j://127.0.0.1:7687')
+NEO4J_USER = os.environ.get('NEO4J_USER', 'neo4j')
+NEO4J_PASSWORD = os.environ.get('NEO4J_PASSWORD', '12345678')
+NEO4J_DATABASE = os.environ.get('NEO4J_DATABASE') or None
+NEO4J_MAX_CONNECTION_POOL_SIZE = int(os.environ.get('NEO4J_MAX_CONNECTION_POOL_SIZE', 50))
+# секунды ожидания свободного соединения из пула
+NEO4J_CONNECTION_ACQUISITION_TIMEOUT = float(os.environ.get('NEO4J_CONNECTION_ACQUISITION_TIMEOUT', 30))
+# секунды жизни соединения, после которых пул его пересоздаёт
+NEO4J_MAX_CONNECTION_LIFETIME = float(os.environ.get('NEO4J_MAX_CONNECTION_LIFETIME', 3600))
+# секунды между проверками версии кэша иерархии классов (db/api/class_hierarchy_cache.py)
+ONTOLOGY_CACHE_CHECK_INTERVAL = float(os.environ.get('ONTOLOGY_CACHE_CHECK_INTERVAL', 1))
+# узлов на транзакцию при каскадном удалении класса (CALL {} IN TRANSACTIONS)
+ONTOLOGY_DELETE_BATCH_SIZE = int(os.environ.get('ONTOLOGY_DELETE_BATCH_SIZE', 1000))
+
+
+# Embeddings
+# Модели загружаются один раз на процесс (см. db/utils/model_registry.py)
+EMBEDDING_MODELS = {
+    'default': 'sentence-transformers/paraphrase-multilingual-mpnet-base-v2',
+}
+EMBEDDING_MODEL = os.environ.get('EMBEDDING_MODEL', 'default')
+EMBEDDING_DEVICE = os.environ.get('EMBEDDING_DEVICE') or None
+# Модели, которые прогреваются при старте gunicorn-воркера (gunicorn.conf.py)
+EMBEDDING_WARMUP_MODELS = [EMBEDDING_MODEL]
+# Формат хранения векторов в БД: 'float32' или 'float16'
+EMBEDDING_STORAGE_DTYPE = os.environ.get('EMBEDDING_STORAGE_DTYPE', 'float32')
+# Разбиение текстов на чанки по умолчанию (db/utils/chunking.py); корпус может
+# переопределить любое поле в Corpus.chunking. max_tokens=None - предел модели
+TEXT_CHUNKING = {
+    'strategy': 'paragraph',
+    'min_tokens': 0,
+    'max_tokens': None,
+    'overlap': 16,
+}
+# Пачки для model.encode собираются по длине в токенах: не больше
+# EMBEDDING_BATCH_TOKENS токенов с паддингом и EMBEDDING_MAX_BATCH_SIZE чанков
+EMBEDDING_BATCH_TOKENS = 8192
+EMBEDDING_MAX_BATCH_SIZE = 128
+# Кэш эмбеддингов по хэшу чанка: записей в LRU-памяти процесса и размер пачки запросов к БД
+EMBEDDING_CACHE_SIZE = 10000
+EMBEDDING_CACHE_DB_BATCH = 500
+# Эмбеддинги текстов считаются фоновым воркером (manage.py embedding_worker)
+EMBEDDING_ASYNC = os.environ.get('EMBEDDING_ASYNC', '1') == '1'
+EMBEDDING_JOB_MAX_ATTEMPTS = 3
+# Через сколько секунд задача в статусе running считается брошенной
+EMBEDDING_JOB_TIMEOUT = 30 * 60
+EMBEDDING_WORKER_POLL_INTERVAL = 2
+# Сколько текстов кодируется и пишется в БД одной пачкой при массовом импорте
+TEXT_IMPORT_BATCH_SIZE = 64
+
+# Векторные индексы для семантического поиска (db/utils/vector_index.py)
+VECTOR_INDEX_DIR = os.environ.get('VECTOR_INDEX_DIR', os.path.join(BASE_DIR, 'indexes'))
+# Сколько векторов нужно накопить, прежде чем обучать IVF-кластеры
+VECTOR_INDEX_TRAIN_SIZE = 4096
+VECTOR_INDEX_NPROBE = 8
+# Сколько векторов копится в журнале изменений индекса, прежде чем он сливается в новое поколение
+VECTOR_INDEX_COMPACT_SIZE = 50000
+
+# Связи чанков текстов с классами и объектами онтологии (db/api/entity_link_repository.py)
+ENTITY_LINK_TOP_K = 5
+# минимальное косинусное сходство чанка и сущности
+ENTITY_LINK_THRESHOLD = 0.5
+ENTITY_LINK_BATCH_SIZE = 1024
+
+# Выравнивание текста и перевода по чанкам (db/utils/alignment.py):
+# сходство ниже ALIGNMENT_BASELINE выгоднее оставить без пары
+ALIGNMENT_BASELINE = 0.3
+ALIGNMENT_GAP_SCORE = 0.0
+ALIGNMENT_MERGE_PENALTY = 0.05
 
 
 
@@ -113,11 +180,16 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'core.wsgi.application'
+# async-представления онтологии работают под ASGI (uvicorn, см. Procfile)
+ASGI_APPLICATION = 'core.asgi.application'
 
 
 # Database
 # https://docs.djangoproject.com/en/3.0/ref/settings/#databases
 
+# Django 3.2: оставляем AutoField, чтобы не появлялись миграции на BigAutoField
+DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
@@ -0,0 +1,63 @@
+import hashlib
+import json
+from typing import List, Tuple
+
+import numpy as np
+from django.conf import settings
+
+from db.api.text_repository import TextRepository
+from db.models import Text, TextAlignment
+from db.utils.alignment import align
+
+
+class AlignmentRepository:
+    def __init__(self):
+        pass
+
+    def load_chunks(self, text: Text) -> Tuple[str, np.ndarray]:
+        chunks = list(text.chunks.exclude(vector=None).order_by('ordinal')
+                      .only('ordinal', 'content_hash', 'vector', 'vector_dtype', 'dim'))
+        signature = hashlib.sha1("".join(chunk.content_hash for chunk in chunks).encode('utf-8')).hexdigest()
+        if not chunks:
+            return signature, np.empty((0, 0), dtype=np.float32)
+        return signature, TextRepository.chunk_vectors(text, chunks).astype(np.float32, copy=False)
+
+    def collect_beads(self, beads: List[tuple]) -> List[dict]:
+        return [{"source": source, "target": target, "score": score} for source, target, score in beads]
+
+    def get_alignment(self, id: int, refresh: bool = False) -> dict:
+        text = Text.objects.get(pk=id)
+        if text.has_translation_id is None:
+            raise ValueError("Text has no translation")
+
+        source_signature, source = self.load_chunks(text)
+        target_signature, target = self.load_chunks(text.has_translation)
+
+        cached = TextAlignment.objects.filter(source=text, target_id=text.has_translation_id).first()
+        # подписи сверяем на случай, если чанки пересобрали в обход embed_text
+        if (cached is not None and not refresh and cached.source_signature == source_signature
+                and cached.target_signature == target_signature):
+            beads = json.loads(cached.beads)
+        else:
+            beads = self.collect_beads(align(
+                source,
+                target,
+                baseline=settings.ALIGNMENT_BASELINE,
+                gap=settings.ALIGNMENT_GAP_SCORE,
+                merge_penalty=settings.ALIGNMENT_MERGE_PENALTY,
+            ))
+            TextAlignment.objects.update_or_create(
+                source=text,
+                target_id=text.has_translation_id,
+                defaults={
+                    "source_signature": source_signature,
+                    "target_signature": target_signature,
+                    "beads": json.dumps(beads),
+                },
+            )
+
+        return {
+            "source": text.id,
+            "target": text.has_translation_id,
+            "beads": beads,
+        }
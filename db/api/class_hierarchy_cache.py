@@ -0,0 +1,212 @@
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from django.conf import settings
+
+from db.api.entities import Class, ClassSignature
+from db.api.neo4j_repository import Neo4jRepository
+
+VERSION_NAME = "class_hierarchy"
+
+
+class ClassHierarchyCache:
+    """
+    Граф SUBCLASS_OF, метаданные классов и сигнатуры в памяти процесса.
+    Поверх графа держится транзитивное замыкание (множества предков и потомков),
+    которое при добавлении классов и рёбер обновляется инкрементально.
+    Запись в любом воркере увеличивает счётчик версии в Neo4j; остальные
+    воркеры сверяют его не чаще раза в ONTOLOGY_CACHE_CHECK_INTERVAL секунд
+    и при расхождении перечитывают иерархию.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.loaded = False
+        self.version = None
+        self.checked_at = 0.0
+        self.classes: Dict[str, Class] = {}
+        self.parents: Dict[str, Tuple[str, ...]] = {}
+        self.children: Dict[str, Tuple[str, ...]] = {}
+        self.signatures: Dict[str, ClassSignature] = {}
+        self.ancestors: Dict[str, Set[str]] = {}
+        self.descendants: Dict[str, Set[str]] = {}
+
+    # ==================== VERSION ====================
+
+    def read_version(self, repo: Neo4jRepository) -> int:
+        query = "MATCH (v:CacheVersion {name: $name}) RETURN v.value AS value"
+        result = repo.run_custom_query(query, {"name": VERSION_NAME})
+        return result[0]["value"] if result else 0
+
+    def bump(self, repo: Neo4jRepository) -> None:
+        query = """
+        MERGE (v:CacheVersion {name: $name})
+        SET v.value = coalesce(v.value, 0) + 1
+        RETURN v.value AS value
+        """
+        value = repo.run_custom_query(query, {"name": VERSION_NAME})[0]["value"]
+        with self._lock:
+            # если между нашими записями версию поднял кто-то ещё, локальная копия устарела
+            if self.version is None or value != self.version + 1:
+                self.loaded = False
+            self.version = value
+
+    def ensure_fresh(self, repo: Neo4jRepository, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and self.loaded and now - self.checked_at < settings.ONTOLOGY_CACHE_CHECK_INTERVAL:
+            return
+
+        with self._lock:
+            version = self.read_version(repo)
+            if not self.loaded or version != self.version:
+                self.load(repo, version)
+            self.checked_at = now
+
+    # ==================== LOAD ====================
+
+    def load(self, repo: Neo4jRepository, version: Optional[int] = None) -> None:
+        query = """
+        MATCH (c:Class)
+        OPTIONAL MATCH (c)-[:SUBCLASS_OF]->(p:Class)
+        RETURN c.uri AS uri, c.title AS title, c.description AS description,
+               labels(c) AS labels, collect(p.uri) AS parents
+        """
+        classes, parents, children = {}, {}, {}
+        for row in repo.run_custom_query(query):
+            uri = row["uri"]
+            classes[uri] = Class(uri, row["title"], row["description"], row["labels"])
+            parents[uri] = tuple(row["parents"])
+            for parent_uri in row["parents"]:
+                children.setdefault(parent_uri, []).append(uri)
+
+        ancestors = build_closure(parents)
+        descendants = {uri: set() for uri in classes}
+        for uri, items in ancestors.items():
+            for ancestor in items:
+                descendants.setdefault(ancestor, set()).add(uri)
+
+        with self._lock:
+            self.classes = classes
+            self.parents = parents
+            self.children = {uri: tuple(items) for uri, items in children.items()}
+            self.ancestors = ancestors
+            self.descendants = descendants
+            self.signatures = {}
+            self.version = version if version is not None else self.read_version(repo)
+            self.loaded = True
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self.loaded = False
+
+    # ==================== READ ====================
+
+    def get_class(self, uri: str) -> Optional[Class]:
+        return self.classes.get(uri)
+
+    def get_parents(self, uri: str) -> List[Class]:
+        return [self.classes[p] for p in self.parents.get(uri, ()) if p in self.classes]
+
+    def get_children(self, uri: str) -> List[Class]:
+        return [self.classes[c] for c in self.children.get(uri, ()) if c in self.classes]
+
+    def get_ancestors(self, uri: str) -> List[Class]:
+        return [self.classes[a] for a in self.ancestors.get(uri, ()) if a in self.classes]
+
+    def get_descendants(self, uri: str) -> List[Class]:
+        return [self.classes[d] for d in self.descendants.get(uri, ()) if d in self.classes]
+
+    def get_descendant_uris(self, uri: str) -> List[str]:
+        return list(self.descendants.get(uri, ()))
+
+    def get_subtree(self, uri: str, max_depth: Optional[int] = None) -> Optional[dict]:
+        if uri not in self.classes:
+            return None
+
+        def build(node_uri, depth, path):
+            node = self.classes[node_uri].to_dict()
+            if max_depth is not None and depth >= max_depth:
+                node["children"] = []
+                return node
+            node["children"] = [
+                build(child, depth + 1, path | {child})
+                for child in self.children.get(node_uri, ())
+                if child in self.classes and child not in path
+            ]
+            return node
+
+        return build(uri, 0, {uri})
+
+    def get_leaves(self) -> List[Class]:
+        return [cls for uri, cls in self.classes.items() if not self.children.get(uri)]
+
+    def get_signature(self, uri: str, loader: Callable[[str], ClassSignature]) -> ClassSignature:
+        signature = self.signatures.get(uri)
+        if signature is None:
+            signature = loader(uri)
+            with self._lock:
+                self.signatures[uri] = signature
+        return signature
+
+    # ==================== PATCH ====================
+
+    def add_class(self, cls: Class, parent_uri: Optional[str] = None) -> None:
+        with self._lock:
+            if not self.loaded:
+                return
+            self.classes[cls.uri] = cls
+            self.parents[cls.uri] = ()
+            self.ancestors[cls.uri] = set()
+            self.descendants[cls.uri] = set()
+        if parent_uri:
+            self.add_parent(cls.uri, parent_uri)
+
+    def add_parent(self, child_uri: str, parent_uri: str) -> None:
+        with self._lock:
+            if not self.loaded:
+                return
+            self.parents[child_uri] = self.parents.get(child_uri, ()) + (parent_uri,)
+            self.children[parent_uri] = self.children.get(parent_uri, ()) + (child_uri,)
+
+            # новые предки child и всех его потомков: parent и предки parent
+            new_ancestors = {parent_uri} | self.ancestors.get(parent_uri, set())
+            subtree = {child_uri} | self.descendants.get(child_uri, set())
+            for uri in subtree:
+                self.ancestors.setdefault(uri, set()).update(new_ancestors)
+            for uri in new_ancestors:
+                self.descendants.setdefault(uri, set()).update(subtree)
+
+    def clear_signatures(self) -> None:
+        with self._lock:
+            self.signatures = {}
+
+
+def build_closure(parents: Dict[str, Tuple[str, ...]]) -> Dict[str, Set[str]]:
+    """Множества предков для каждого класса; циклы в данных не зацикливают обход."""
+    ancestors: Dict[str, Set[str]] = {}
+    for root in parents:
+        if root in ancestors:
+            continue
+        # итеративный DFS: рекурсия упирается в лимит на глубоких таксономиях
+        stack = [(root, iter(parents.get(root, ())))]
+        visiting = {root}
+        while stack:
+            uri, pending = stack[-1]
+            parent = next(pending, None)
+            if parent is None:
+                stack.pop()
+                visiting.discard(uri)
+                result = set()
+                for p in parents.get(uri, ()):
+                    result.add(p)
+                    result |= ancestors.get(p, set())
+                result.discard(uri)
+                ancestors[uri] = result
+            elif parent not in ancestors and parent not in visiting:
+                visiting.add(parent)
+                stack.append((parent, iter(parents.get(parent, ()))))
+    return ancestors
+
+
+hierarchy_cache = ClassHierarchyCache()
@@ -1,4 +1,9 @@
+import json
+
 from db.models import Corpus
+from db.utils.chunking import ChunkingConfig
+from db.utils.vector_index import get_vector_index
+from db.utils.vector_matrix import get_vector_matrix
 
 
 class CorpusRepository:
@@ -11,6 +16,7 @@ class CorpusRepository:
             "title": corpus.title,
             "description": corpus.description,
             "genre": corpus.genre,
+            "chunking": corpus.get_chunking(),
             "texts": [
                 {
                     "id": text.id,
@@ -23,6 +29,15 @@ class CorpusRepository:
             ],
         }
 
+    def dump_chunking(self, chunking):
+        if not chunking:
+            return None
+        if not isinstance(chunking, dict):
+            raise ValueError("chunking must be an object")
+        # неизвестная стратегия или неверные числа -> ValueError ещё до сохранения
+        ChunkingConfig.from_dict(chunking)
+        return json.dumps(chunking)
+
     def getCorpus(self, id: int):
         corpus = Corpus.objects.get(pk=id)
         return self.collect_corpus(corpus)
@@ -31,7 +46,8 @@ class CorpusRepository:
         corpus = Corpus.objects.create(
             title=data.get("title", ""),
             description=data.get("description", ""),
-            genre=data.get("genre", "")
+            genre=data.get("genre", ""),
+            chunking=self.dump_chunking(data.get("chunking")),
         )
         return self.collect_corpus(corpus)
 
@@ -40,10 +56,18 @@ class CorpusRepository:
         corpus.title = data.get("title", corpus.title)
         corpus.description = data.get("description", corpus.description)
         corpus.genre = data.get("genre", corpus.genre)
+        if "chunking" in data:
+            corpus.chunking = self.dump_chunking(data["chunking"])
         corpus.save()
         return self.collect_corpus(corpus)
 
     def deleteCorpus(self, id: int):
         corpus = Corpus.objects.get(pk=id)
+        text_ids = list(corpus.texts.values_list('id', flat=True))
         corpus.delete()
+
+        with get_vector_index().writing() as index:
+            for text_id in text_ids:
+                index.remove_text(text_id)
+        get_vector_matrix().mark_dirty()
         return id
@@ -0,0 +1,96 @@
+from datetime import timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from db.api.text_repository import TextRepository
+from db.models import EmbeddingJob, Text
+from db.utils.embedding_utils import EmbeddingUtils
+
+
+class EmbeddingJobRepository:
+    def __init__(self):
+        pass
+
+    def collect_job(self, job: EmbeddingJob):
+        return {
+            "id": job.id,
+            "status": job.status,
+            "attempts": job.attempts,
+            "error": job.error,
+            "created_at": job.created_at,
+            "started_at": job.started_at,
+            "finished_at": job.finished_at,
+        }
+
+    def get_status(self, text_id: int) -> dict:
+        text = Text.objects.only('id', 'embedding_status', 'embedded_at').get(pk=text_id)
+        job = text.embedding_jobs.order_by('-id').first()
+        return {
+            "id": text.id,
+            "embedding_status": text.embedding_status,
+            "embedded_at": text.embedded_at,
+            "job": self.collect_job(job) if job else None,
+        }
+
+    def requeue_stale(self) -> int:
+        # задачи упавших воркеров возвращаем в очередь
+        deadline = timezone.now() - timedelta(seconds=settings.EMBEDDING_JOB_TIMEOUT)
+        stale = EmbeddingJob.objects.filter(status=EmbeddingJob.RUNNING, started_at__lt=deadline)
+
+        # задача, которая раз за разом роняет воркер (OOM, segfault), в очередь больше не идёт
+        exhausted = stale.filter(attempts__gte=settings.EMBEDDING_JOB_MAX_ATTEMPTS)
+        text_ids = list(exhausted.values_list('text_id', flat=True))
+        if text_ids:
+            with transaction.atomic():
+                exhausted.update(
+                    status=EmbeddingJob.FAILED,
+                    error="worker did not finish the job",
+                    finished_at=timezone.now(),
+                )
+                Text.objects.filter(pk__in=text_ids) \
+                    .exclude(embedding_jobs__status=EmbeddingJob.PENDING) \
+                    .update(embedding_status=Text.EMBEDDING_FAILED)
+
+        return stale.update(status=EmbeddingJob.PENDING)
+
+    def claim_next(self) -> Optional[EmbeddingJob]:
+        candidates = EmbeddingJob.objects.filter(status=EmbeddingJob.PENDING).values_list('id', flat=True)[:10]
+        for job_id in candidates:
+            claimed = EmbeddingJob.objects.filter(pk=job_id, status=EmbeddingJob.PENDING).update(
+                status=EmbeddingJob.RUNNING,
+                started_at=timezone.now(),
+                attempts=F('attempts') + 1,
+            )
+            if claimed:
+                return EmbeddingJob.objects.get(pk=job_id)
+        return None
+
+    def run_job(self, job: EmbeddingJob, emb_utils: EmbeddingUtils) -> None:
+        Text.objects.filter(pk=job.text_id).update(embedding_status=Text.EMBEDDING_PROCESSING)
+        try:
+            with transaction.atomic():
+                # текст могли удалить, пока задача ждала в очереди
+                text = Text.objects.select_for_update().filter(pk=job.text_id).first()
+                if text is not None:
+                    TextRepository().embed_text(text, emb_utils)
+        except Exception as e:
+            failed = job.attempts >= settings.EMBEDDING_JOB_MAX_ATTEMPTS
+            EmbeddingJob.objects.filter(pk=job.pk).update(
+                status=EmbeddingJob.FAILED if failed else EmbeddingJob.PENDING,
+                error=repr(e),
+                finished_at=timezone.now() if failed else None,
+            )
+            Text.objects.filter(pk=job.text_id).update(
+                embedding_status=Text.EMBEDDING_FAILED if failed else Text.EMBEDDING_PENDING
+            )
+            raise
+
+        EmbeddingJob.objects.filter(pk=job.pk).update(
+            status=EmbeddingJob.DONE,
+            error=None,
+            finished_at=timezone.now(),
+        )
@@ -1,11 +1,16 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, asdict
 from typing import List, Optional
 
 from db.api.neo4j_repository import TNode
 
 
+class Serializable:
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
 @dataclass
-class Class:
+class Class(Serializable):
     uri: str
     title: str
     description: Optional[str] = None
@@ -13,7 +18,7 @@ class Class:
 
 
 @dataclass
-class Object:
+class Object(Serializable):
     uri: str
     title: str
     class_uri: str
@@ -21,20 +26,20 @@ class Object:
 
 
 @dataclass
-class Ontology:
+class Ontology(Serializable):
     classes: List[Class]
     objects: List[Object]
 
 
 @dataclass
-class DatatypeProperty:
+class DatatypeProperty(Serializable):
     uri: str
     title: str
     class_uri: str = None
 
 
 @dataclass
-class ObjectProperty:
+class ObjectProperty(Serializable):
     uri: str
     title: str
     class_uri: str = None
@@ -42,18 +47,48 @@ class ObjectProperty:
 
 
 @dataclass
-class ClassSignature:
+class ClassSignature(Serializable):
     class_uri: str
     datatype_properties: List[DatatypeProperty]
     object_properties: List[ObjectProperty]
 
 
 @dataclass
-class Ontology:
+class Ontology(Serializable):
     signatures: List[ClassSignature]
     objects: List[Object]
 
 
+@dataclass
+class Relation(Serializable):
+    id: Optional[str]
+    rel_type: Optional[str]
+    uri: str
+    title: Optional[str]
+    labels: List[str]
+    depth: int = 1
+
+
+@dataclass
+class ObjectView(Serializable):
+    object: Object
+    properties: dict
+    classes: List[Class]
+    outgoing: List[Relation]
+    incoming: List[Relation]
+    # узлы на расстоянии 2..depth, без типов связей
+    neighbours: List[Relation]
+
+
+@dataclass
+class SearchHit(Serializable):
+    uri: str
+    title: Optional[str]
+    description: Optional[str]
+    labels: List[str]
+    score: float
+
+
 def collect_from_node(node: TNode) -> Optional[Class | Object | DatatypeProperty | ObjectProperty]:
     if node is None or node.props.get("uri") is None or node.props.get("title") is None:
         return None
@@ -64,7 +99,7 @@ def collect_from_node(node: TNode) -> Optional[Class | Object | DatatypeProperty
     if node.labels.count("Class"):
         return Class(uri, title, node.props.get("description"))
     elif node.labels.count("Object"):
-        return Object(uri, title, node.props.get("description"))
+        return Object(uri, title, class_uri=None, description=node.props.get("description"))
     elif node.labels.count("DatatypeProperty"):
         return DatatypeProperty(uri, title)
     elif node.labels.count("ObjectProperty"):
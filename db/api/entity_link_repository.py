@@ -0,0 +1,215 @@
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from db.api.neo4j_repository import Neo4jRepository
+from db.api.ontology_repository import OntologyRepository
+from db.models import EntityEmbedding, TextChunk, TextEntityLink
+from db.utils.embedding_utils import EmbeddingUtils, hash_chunk
+from db.utils.model_registry import registry
+from db.utils.vector_matrix import get_vector_matrix
+
+ENTITY_LABELS = ("Class", "Object")
+
+# SQLite до 3.32 принимает не больше 999 параметров в одном запросе
+ID_BATCH_SIZE = 900
+
+
+def id_batches(ids: Iterable[int], size: int = ID_BATCH_SIZE) -> Iterator[List[int]]:
+    ids = sorted(set(ids))
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def entity_text(title: Any, description: Any) -> str:
+    # после импорта RDF у свойства может быть несколько значений (список)
+    parts = [part for value in (title, description) for part in (value if isinstance(value, list) else [value])]
+    return ". ".join(str(part).strip() for part in parts if part is not None and str(part).strip())
+
+
+class EntityLinkRepository:
+    """
+    Векторы классов и объектов онтологии держатся в таблице EntityEmbedding
+    и в матрице 'entities'; чанки текстов сопоставляются с ней пачками.
+    """
+
+    def __init__(self):
+        self.matrix = get_vector_matrix('entities')
+
+    # ==================== ENTITIES ====================
+
+    def embed_entities(self, emb_utils: EmbeddingUtils, batch_size: Optional[int] = None) -> Dict[str, int]:
+        batch_size = batch_size or settings.ENTITY_LINK_BATCH_SIZE
+        ontology = OntologyRepository(Neo4jRepository())
+        dtype = settings.EMBEDDING_STORAGE_DTYPE
+
+        existing = {
+            uri: (pk, content_hash, model_name)
+            for pk, uri, content_hash, model_name in
+            EntityEmbedding.objects.values_list('id', 'entity_uri', 'content_hash', 'model_name')
+        }
+        stats = {"embedded": 0, "unchanged": 0, "removed": 0}
+        seen = set()
+
+        def flush(pending):
+            vectors = emb_utils.get_embeddings([text for _, _, text in pending])
+            created, updated = [], []
+            for (entity, label, text), vector in zip(pending, vectors):
+                row = EntityEmbedding(
+                    entity_uri=entity.uri,
+                    label=label,
+                    title=entity_text(entity.title, None)[:255],
+                    content_hash=hash_chunk(text),
+                    model_name=emb_utils.model_name,
+                )
+                row.set_vector(vector, dtype)
+                if entity.uri in existing:
+                    row.pk = existing[entity.uri][0]
+                    updated.append(row)
+                else:
+                    created.append(row)
+            with transaction.atomic():
+                EntityEmbedding.objects.bulk_create(created)
+                EntityEmbedding.objects.bulk_update(
+                    updated, ['label', 'title', 'content_hash', 'model_name', 'vector', 'vector_dtype', 'dim']
+                )
+            stats["embedded"] += len(pending)
+
+        pending = []
+        for label in ENTITY_LABELS:
+            for entity in ontology.iter_ontology(label):
+                text = entity_text(entity.title, entity.description)
+                if not text or entity.uri in seen:
+                    continue
+                seen.add(entity.uri)
+
+                # перекодируем только изменившиеся названия и описания или при смене модели
+                known = existing.get(entity.uri)
+                if known and known[1] == hash_chunk(text) and known[2] == emb_utils.model_name:
+                    stats["unchanged"] += 1
+                    continue
+
+                pending.append((entity, label, text))
+                if len(pending) >= batch_size:
+                    flush(pending)
+                    pending = []
+        if pending:
+            flush(pending)
+
+        removed = [pk for uri, (pk, _, _) in existing.items() if uri not in seen]
+        for pks in id_batches(removed):
+            EntityEmbedding.objects.filter(pk__in=pks).delete()
+        stats["removed"] = len(removed)
+
+        self.build_matrix(batch_size)
+        return stats
+
+    def build_matrix(self, batch_size: Optional[int] = None) -> int:
+        entities = EntityEmbedding.objects.filter(dim__gt=0)
+        first = entities.order_by('id').first()
+        if first is None:
+            return 0
+
+        # второй столбец матрицы (text_id) для сущностей не нужен
+        rows = (
+            (entity.id, 0, entity.get_vector())
+            for entity in entities.only('id', 'vector', 'vector_dtype', 'dim')
+                                  .order_by('id').iterator(chunk_size=batch_size or settings.ENTITY_LINK_BATCH_SIZE)
+        )
+        return self.matrix.build(rows, entities.count(), first.dim)
+
+    # ==================== LINKS ====================
+
+    @staticmethod
+    def chunk_querysets(text_ids: Optional[Iterable[int]] = None) -> List:
+        chunks = TextChunk.objects.exclude(vector=None).filter(dim__gt=0)
+        if text_ids is None:
+            return [chunks]
+        return [chunks.filter(text_id__in=ids) for ids in id_batches(text_ids)]
+
+    def chunk_model(self, text_ids: Optional[Iterable[int]] = None) -> Optional[str]:
+        names = set()
+        for chunks in self.chunk_querysets(text_ids):
+            names.update(chunks.order_by().values_list('model_name', flat=True).distinct())
+        # model_name пуст у чанков, закодированных до появления поля: тогда была только модель по умолчанию
+        names = {name or registry.resolve_name() for name in names}
+        if len(names) > 1:
+            raise ValueError(f"Chunks are encoded with different models ({', '.join(sorted(names))}), "
+                             f"re-embed the texts with one model")
+        return names.pop() if names else None
+
+    def link_chunks(self, chunks: List[TextChunk], entity_uris: Dict[int, str], k: int,
+                    threshold: float) -> int:
+        queries = np.stack([chunk.get_vector() for chunk in chunks])
+        results = self.matrix.search_batch(queries, k)
+
+        links = [
+            TextEntityLink(text_id=chunk.text_id, chunk_id=chunk.id, entity_uri=entity_uris[entity_id], score=score)
+            for chunk, hits in zip(chunks, results)
+            for entity_id, _, score in hits
+            if score >= threshold and entity_id in entity_uris
+        ]
+        with transaction.atomic():
+            TextEntityLink.objects.filter(chunk_id__in=[chunk.id for chunk in chunks]).delete()
+            TextEntityLink.objects.bulk_create(links)
+        return len(links)
+
+    def link_texts(self, text_ids: Optional[Iterable[int]] = None, k: Optional[int] = None,
+                   threshold: Optional[float] = None, batch_size: Optional[int] = None) -> Dict[str, int]:
+        k = k or settings.ENTITY_LINK_TOP_K
+        threshold = settings.ENTITY_LINK_THRESHOLD if threshold is None else threshold
+        batch_size = batch_size or settings.ENTITY_LINK_BATCH_SIZE
+
+        if text_ids is not None:
+            text_ids = list(text_ids)
+
+        self.matrix.refresh()
+        if not len(self.matrix):
+            return {"chunks": 0, "links": 0}
+
+        # сходство векторов разных моделей ничего не значит
+        chunk_model = self.chunk_model(text_ids)
+        entity_models = set(EntityEmbedding.objects.values_list('model_name', flat=True).distinct())
+        if chunk_model and entity_models != {chunk_model}:
+            raise ValueError(f"Chunks are encoded with {chunk_model}, entities with {', '.join(sorted(entity_models))}; "
+                             f"re-embed the entities with the chunk model")
+        entity_uris = dict(EntityEmbedding.objects.values_list('id', 'entity_uri'))
+
+        stats = {"chunks": 0, "links": 0}
+        batch = []
+        # весь корпус идёт пачками chunk x entity, одним матричным умножением на пачку
+        for chunks in self.chunk_querysets(text_ids):
+            for chunk in chunks.only('id', 'text_id', 'vector', 'vector_dtype', 'dim').order_by('id') \
+                    .iterator(chunk_size=batch_size):
+                batch.append(chunk)
+                if len(batch) >= batch_size:
+                    stats["links"] += self.link_chunks(batch, entity_uris, k, threshold)
+                    stats["chunks"] += len(batch)
+                    batch = []
+        if batch:
+            stats["links"] += self.link_chunks(batch, entity_uris, k, threshold)
+            stats["chunks"] += len(batch)
+        return stats
+
+    def get_text_links(self, text_id: int) -> List[dict]:
+        links = TextEntityLink.objects.filter(text_id=text_id).select_related('chunk')
+        entities = {
+            entity.entity_uri: entity
+            for entity in EntityEmbedding.objects.filter(entity_uri__in=links.values('entity_uri'))
+                                                 .only('entity_uri', 'label', 'title')
+        }
+        result = []
+        for link in links:
+            entity = entities.get(link.entity_uri)
+            result.append({
+                "chunk": link.chunk.ordinal,
+                "char_start": link.chunk.char_start,
+                "char_end": link.chunk.char_end,
+                "entity_uri": link.entity_uri,
+                "label": entity.label if entity else None,
+                "title": entity.title if entity else None,
+                "score": link.score,
+            })
+        return result
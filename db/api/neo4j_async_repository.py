@@ -0,0 +1,61 @@
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from django.conf import settings
+
+from db.api.neo4j_driver import get_async_driver
+from db.api.neo4j_repository import Neo4jRepository, TNode, nodes_page_query
+from db.api.neo4j_schema import RESOURCE_LABEL, quote_name
+
+
+class AsyncNeo4jRepository:
+    """
+    Чтение графа через асинхронный драйвер для async-представлений под ASGI.
+    Запросы и преобразование узлов те же, что у Neo4jRepository.
+    """
+
+    def __init__(self, database: Optional[str] = None) -> None:
+        self.driver = get_async_driver()
+        self.database = database or settings.NEO4J_DATABASE
+
+    def session(self):
+        return self.driver.session(database=self.database)
+
+    async def run_custom_query(self, query: str, params: Optional[Dict[str, Any]] = None) -> List[Dict]:
+        async with self.session() as session:
+            result = await session.run(query, params or {})
+            return [record.data() async for record in result]
+
+    async def get_node_by_uri(self, uri: str, label: str = RESOURCE_LABEL) -> Optional[TNode]:
+        query = f"MATCH (n:{quote_name(label)} {{uri: $uri}}) RETURN n"
+        async with self.session() as session:
+            result = await session.run(query, {"uri": uri})
+            record = await result.single()
+            return Neo4jRepository.collect_node(record["n"]) if record else None
+
+    async def get_nodes_by_uris(self, uris: List[str], label: str = RESOURCE_LABEL) -> Dict[str, Optional[TNode]]:
+        query = f"""
+        UNWIND $uris AS uri
+        OPTIONAL MATCH (n:{quote_name(label)} {{uri: uri}})
+        RETURN uri, n
+        """
+        async with self.session() as session:
+            result = await session.run(query, {"uris": list(dict.fromkeys(uris))})
+            return {
+                record["uri"]: Neo4jRepository.collect_node(record["n"]) if record["n"] is not None else None
+                async for record in result
+            }
+
+    async def get_nodes_page(self, label: str, after_uri: Optional[str] = None, limit: int = 500) -> List[TNode]:
+        async with self.session() as session:
+            result = await session.run(nodes_page_query(label), {"after": after_uri or "", "limit": limit})
+            return [Neo4jRepository.collect_node(record["n"]) async for record in result]
+
+    async def iter_nodes(self, label: str, page_size: int = 500) -> AsyncIterator[TNode]:
+        after_uri = None
+        while True:
+            page = await self.get_nodes_page(label, after_uri, page_size)
+            for node in page:
+                yield node
+            if len(page) < page_size:
+                return
+            after_uri = page[-1].uri
@@ -0,0 +1,59 @@
+import asyncio
+import atexit
+import threading
+import weakref
+
+from django.conf import settings
+from neo4j import AsyncDriver, AsyncGraphDatabase, Driver, GraphDatabase
+
+_driver = None
+_lock = threading.Lock()
+
+# асинхронный драйвер привязан к event loop, поэтому держим по одному на loop
+_async_drivers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncDriver]" = weakref.WeakKeyDictionary()
+
+
+def driver_options() -> dict:
+    return {
+        "auth": (settings.NEO4J_USER, settings.NEO4J_PASSWORD),
+        "max_connection_pool_size": settings.NEO4J_MAX_CONNECTION_POOL_SIZE,
+        "connection_acquisition_timeout": settings.NEO4J_CONNECTION_ACQUISITION_TIMEOUT,
+        "max_connection_lifetime": settings.NEO4J_MAX_CONNECTION_LIFETIME,
+    }
+
+
+def get_driver() -> Driver:
+    global _driver
+    if _driver is not None:
+        return _driver
+
+    with _lock:
+        if _driver is None:
+            _driver = GraphDatabase.driver(settings.NEO4J_URI, **driver_options())
+    return _driver
+
+
+def get_async_driver() -> AsyncDriver:
+    loop = asyncio.get_running_loop()
+    driver = _async_drivers.get(loop)
+    if driver is None:
+        driver = AsyncGraphDatabase.driver(settings.NEO4J_URI, **driver_options())
+        _async_drivers[loop] = driver
+    return driver
+
+
+async def close_async_driver() -> None:
+    driver = _async_drivers.pop(asyncio.get_running_loop(), None)
+    if driver is not None:
+        await driver.close()
+
+
+def close_driver() -> None:
+    global _driver
+    with _lock:
+        if _driver is not None:
+            _driver.close()
+            _driver = None
+
+
+atexit.register(close_driver)
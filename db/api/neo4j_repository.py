@@ -1,9 +1,13 @@
 from dataclasses import dataclass
 from pprint import pprint
 
+from django.conf import settings
 from neo4j import GraphDatabase
 import uuid
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional
+
+from db.api.neo4j_driver import get_driver
+from db.api.neo4j_schema import RESOURCE_LABEL, quote_name
 
 @dataclass
 class TArc:
@@ -22,24 +26,43 @@ class TNode:
     arcs: Optional[List[TArc]] = None
 
 
+def nodes_page_query(label: str) -> str:
+    # keyset-пагинация по uri: каждая страница - поиск по индексу, без SKIP
+    return f"""
+    MATCH (n:{quote_name(label)})
+    WHERE n.uri > $after
+    RETURN n
+    ORDER BY n.uri
+    LIMIT $limit
+    """
+
+
 class Neo4jRepository:
-    def __init__(self, uri: str, user: str, password: str) -> None:
-        self.driver = GraphDatabase.driver(uri, auth=(user, password))
+    def __init__(self, uri: Optional[str] = None, user: Optional[str] = None, password: Optional[str] = None,
+                 database: Optional[str] = None) -> None:
+        # без явных параметров берём общий драйвер процесса с пулом соединений
+        self.owns_driver = uri is not None
+        self.driver = GraphDatabase.driver(uri, auth=(user, password)) if self.owns_driver else get_driver()
+        self.database = database or settings.NEO4J_DATABASE
 
     def close(self) -> None:
-        self.driver.close()
+        if self.owns_driver:
+            self.driver.close()
+
+    def session(self):
+        return self.driver.session(database=self.database)
 
     def generate_random_string(self) -> str:
         return str(uuid.uuid4())
 
     def run_custom_query(self, query: str, params: Optional[Dict[str, Any]] = None) -> List[Dict]:
-        with self.driver.session() as session:
+        with self.session() as session:
             result = session.run(query, params or {})
             return [record.data() for record in result]
 
     def get_all_nodes(self) -> List[TNode]:
         query = "MATCH (n) RETURN n"
-        with self.driver.session() as session:
+        with self.session() as session:
             result = session.run(query)
             return [self.collect_node(record["n"]) for record in result]
 
@@ -49,7 +72,7 @@ class Neo4jRepository:
         RETURN n, r, m.uri as to_uri, type(r) as rel_type
         """
 
-        with self.driver.session(database=self.database) as session:
+        with self.session() as session:
             result = session.run(query)
             nodes_dict = {}
 
@@ -76,66 +99,146 @@ class Neo4jRepository:
     def get_nodes_by_labels(self, labels: List[str]) -> List[TNode]:
         label_str = ":".join(labels)
         query = f"MATCH (n:{label_str}) RETURN n"
-        with self.driver.session() as session:
+        with self.session() as session:
             result = session.run(query)
             return [self.collect_node(record["n"]) for record in result]
 
-    def get_node_by_uri(self, uri: str) -> Optional[TNode]:
-        query = "MATCH (n {uri: $uri}) RETURN n"
-        with self.driver.session() as session:
+    def get_nodes_page(self, label: str, after_uri: Optional[str] = None, limit: int = 500) -> List[TNode]:
+        with self.session() as session:
+            result = session.run(nodes_page_query(label), {"after": after_uri or "", "limit": limit})
+            return [self.collect_node(record["n"]) for record in result]
+
+    def iter_nodes(self, label: str, page_size: int = 500) -> Iterator[TNode]:
+        after_uri = None
+        while True:
+            page = self.get_nodes_page(label, after_uri, page_size)
+            yield from page
+            if len(page) < page_size:
+                return
+            after_uri = page[-1].uri
+
+    def get_node_by_uri(self, uri: str, label: str = RESOURCE_LABEL) -> Optional[TNode]:
+        query = f"MATCH (n:{quote_name(label)} {{uri: $uri}}) RETURN n"
+        with self.session() as session:
             record = session.run(query, {"uri": uri}).single()
             return self.collect_node(record["n"]) if record else None
 
+    def get_nodes_by_uris(self, uris: List[str], label: str = RESOURCE_LABEL) -> Dict[str, Optional[TNode]]:
+        query = f"""
+        UNWIND $uris AS uri
+        OPTIONAL MATCH (n:{quote_name(label)} {{uri: uri}})
+        RETURN uri, n
+        """
+        with self.session() as session:
+            result = session.run(query, {"uris": list(dict.fromkeys(uris))})
+            return {
+                record["uri"]: self.collect_node(record["n"]) if record["n"] is not None else None
+                for record in result
+            }
+
     def create_node(self, params: Dict[str, Any], labels: Optional[List[str]] = None) -> TNode:
-        if not params["uri"]:
-            params["uri"] = self.generate_random_string()
+        return self.create_nodes([params], labels)[0]
 
-        labels_str = ""
-        if labels:
-            labels_str = ":" + ":".join(params["labels"])
+    def create_nodes(self, nodes: List[Dict[str, Any]], labels: Optional[List[str]] = None) -> List[TNode]:
+        # узлы с одинаковым набором меток создаются одним UNWIND-запросом
+        groups: Dict[tuple, List[Dict[str, Any]]] = {}
+        for params in nodes:
+            node_labels = tuple(params.get("labels") or labels or ())
+            if RESOURCE_LABEL not in node_labels:
+                node_labels += (RESOURCE_LABEL,)
+            groups.setdefault(node_labels, []).append({
+                "uri": params.get("uri") or self.generate_random_string(),
+                "title": params.get("title"),
+                "description": params.get("description"),
+            })
 
-        query = f"""
-        CREATE (n{labels_str} {{
-            uri: $uri,
-            title: $title,
-            description: $description
-        }})
-        RETURN n
-        """
+        def create(tx) -> Dict[str, TNode]:
+            created = {}
+            for node_labels, rows in groups.items():
+                labels_str = "".join(":" + quote_name(label) for label in node_labels)
+                query = f"""
+                UNWIND $rows AS row
+                CREATE (n{labels_str} {{uri: row.uri}})
+                SET n.title = row.title, n.description = row.description
+                RETURN n
+                """
+                for record in tx.run(query, rows=rows):
+                    node = self.collect_node(record["n"])
+                    created[node.uri] = node
+            return created
+
+        with self.session() as session:
+            created = session.execute_write(create)
 
-        self.run_custom_query(query, params)
+        return [created[row["uri"]] for rows in groups.values() for row in rows]
 
     def create_arc(self, node1_uri: str, node2_uri: str, rel_type: str = "RELATED") -> TArc:
+        arcs = self.create_arcs([{"from": node1_uri, "to": node2_uri, "rel_type": rel_type}])
+        if not arcs:
+            raise ValueError(f"Node not found: {node1_uri} or {node2_uri}")
+        return arcs[0]
+
+    def create_arcs(self, arcs: List[Dict[str, Any]]) -> List[TArc]:
+        # тип связи нельзя параметризовать, поэтому один запрос на каждый rel_type
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        for arc in arcs:
+            rel_type = arc.get("rel_type") or "RELATED"
+            groups.setdefault(rel_type, []).append({"from": arc["from"], "to": arc["to"]})
+
+        # узлы ищутся по метке Resource (индекс по uri); на старой базе сначала выполните neo4j_schema,
+        # иначе связи между непомеченными узлами молча не создадутся
+        def create(tx) -> List[TArc]:
+            created = []
+            for rel_type, rows in groups.items():
+                query = f"""
+                UNWIND $rows AS row
+                MATCH (a:{RESOURCE_LABEL} {{uri: row.from}})
+                MATCH (b:{RESOURCE_LABEL} {{uri: row.to}})
+                CREATE (a)-[r:{quote_name(rel_type)} {{id: randomUUID(), uri: $rel_type}}]->(b)
+                RETURN r, row.from AS from_uri, row.to AS to_uri
+                """
+                for record in tx.run(query, rows=rows, rel_type=rel_type):
+                    arc = self.collect_arc(record["r"])
+                    arc.node_uri_from = record["from_uri"]
+                    arc.node_uri_to = record["to_uri"]
+                    created.append(arc)
+            return created
+
+        with self.session() as session:
+            return session.execute_write(create)
+
+    def delete_node_by_uri(self, uri: str, label: str = RESOURCE_LABEL) -> None:
+        query = f"MATCH (n:{quote_name(label)} {{uri: $uri}}) DETACH DELETE n"
+        with self.session() as session:
+            session.run(query, {"uri": uri})
+
+    def delete_nodes_by_ids(self, ids: List[str], batch_size: int = 1000) -> None:
+        # CALL {} IN TRANSACTIONS работает только в auto-commit транзакции, т.е. через session.run
         query = f"""
-            MATCH (a {{uri: $node1_uri}}), (b {{uri: $node2_uri}})
-            CREATE (a)-[r:{rel_type} {{id: randomUUID(), uri: $rel_type}}]->(b)
-            RETURN r
+        UNWIND $ids AS id
+        CALL {{
+            WITH id
+            MATCH (n) WHERE elementId(n) = id
+            DETACH DELETE n
+        }} IN TRANSACTIONS OF {int(batch_size)} ROWS
         """
-        with self.driver.session() as session:
-            record = session.run(query, {
-                "node1_uri": node1_uri,
-                "node2_uri": node2_uri,
-                "rel_type": rel_type
-            }).single()
-            return self.collect_arc(record["r"], node1_uri, node2_uri)
-
-    def delete_node_by_uri(self, uri: str) -> None:
-        query = "MATCH (n {uri: $uri}) DETACH DELETE n"
-        with self.driver.session() as session:
-            session.run(query, {"uri": uri})
+        with self.session() as session:
+            session.run(query, {"ids": ids}).consume()
 
-    def delete_arc_by_id(self, arc_id: str) -> None:
-        query = "MATCH ()-[r]->() WHERE r.id = $id DELETE r"
-        with self.driver.session() as session:
+    def delete_arc_by_id(self, arc_id: str, rel_type: Optional[str] = None) -> None:
+        # с известным типом связи поиск идёт по индексу rel_<type>_id
+        rel_str = ":" + quote_name(rel_type) if rel_type else ""
+        query = f"MATCH ()-[r{rel_str}]->() WHERE r.id = $id DELETE r"
+        with self.session() as session:
             session.run(query, {"id": arc_id})
 
-    def update_node(self, uri: str, params: Dict[str, Any]) -> Optional[TNode]:
-        query = """
-            MATCH (n {uri: $uri})
+    def update_node(self, uri: str, params: Dict[str, Any], label: str = RESOURCE_LABEL) -> Optional[TNode]:
+        query = f"""
+            MATCH (n:{quote_name(label)} {{uri: $uri}})
             SET n += $params
             RETURN n
         """
-        with self.driver.session() as session:
+        with self.session() as session:
             record = session.run(query, {"uri": uri, "params": params}).single()
             return self.collect_node(record["n"]) if record else None
 
@@ -0,0 +1,49 @@
+from typing import Iterable, List
+
+# Метки онтологии; всем им дополнительно ставится общая метка Resource,
+# чтобы поиск по uri без известного типа тоже шёл через индекс
+ONTOLOGY_LABELS = ["Class", "Object", "DatatypeProperty", "ObjectProperty"]
+RESOURCE_LABEL = "Resource"
+RELATIONSHIP_TYPES = ["SUBCLASS_OF", "rdf__type", "domain", "range"]
+# полнотекстовый индекс для поиска классов и объектов по названию и описанию
+FULLTEXT_INDEX = "ontology_fulltext"
+FULLTEXT_LABELS = ["Class", "Object"]
+
+
+def quote_name(name: str) -> str:
+    # метки и типы связей подставляются в текст запроса, экранируем их
+    return "`" + name.replace("`", "``") + "`"
+
+
+def schema_statements(rel_types: Iterable[str] = RELATIONSHIP_TYPES) -> List[str]:
+    statements = []
+    for label in ONTOLOGY_LABELS + [RESOURCE_LABEL]:
+        statements.append(
+            f"CREATE CONSTRAINT {label.lower()}_uri_unique IF NOT EXISTS "
+            f"FOR (n:{quote_name(label)}) REQUIRE n.uri IS UNIQUE"
+        )
+    for rel_type in rel_types:
+        name = "".join(ch if ch.isalnum() else "_" for ch in rel_type.lower())
+        statements.append(
+            f"CREATE INDEX rel_{name}_id IF NOT EXISTS "
+            f"FOR ()-[r:{quote_name(rel_type)}]-() ON (r.id)"
+        )
+    statements.append(
+        f"CREATE FULLTEXT INDEX {FULLTEXT_INDEX} IF NOT EXISTS "
+        f"FOR (n:{'|'.join(quote_name(label) for label in FULLTEXT_LABELS)}) ON EACH [n.title, n.description]"
+    )
+    return statements
+
+
+def backfill_resource_label(session, batch_size: int = 10000) -> int:
+    labels = " OR ".join(f"n:{quote_name(label)}" for label in ONTOLOGY_LABELS)
+    query = f"""
+    MATCH (n) WHERE ({labels}) AND NOT n:{RESOURCE_LABEL}
+    CALL {{ WITH n SET n:{RESOURCE_LABEL} }} IN TRANSACTIONS OF $batch_size ROWS
+    """
+    summary = session.run(query, batch_size=batch_size).consume()
+    return summary.counters.labels_added
+
+
+def relationship_types(session) -> List[str]:
+    return [record["relationshipType"] for record in session.run("CALL db.relationshipTypes()")]
@@ -0,0 +1,92 @@
+import asyncio
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from .entities import *
+from .neo4j_async_repository import AsyncNeo4jRepository
+from .ontology_repository import (
+    CLASS_OBJECTS_QUERY,
+    FULLTEXT_SEARCH_QUERY,
+    INHERITED_SIGNATURE_QUERY,
+    collect_class_objects,
+    collect_inherited_signatures,
+    collect_object_view,
+    collect_search_hits,
+    object_view_query,
+    search_params,
+)
+
+
+class AsyncOntologyRepository:
+    """Асинхронные варианты читающих методов OntologyRepository."""
+
+    def __init__(self, repository: AsyncNeo4jRepository):
+        self.repo = repository
+
+    async def search(self, text: str, mode: str = "prefix", labels: Optional[List[str]] = None,
+                     limit: int = 20) -> List[SearchHit]:
+        params = search_params(text, mode, labels, limit)
+        if params is None:
+            return []
+        return collect_search_hits(await self.repo.run_custom_query(FULLTEXT_SEARCH_QUERY, params))
+
+    async def get_ontology_page(self, label: str, after_uri: Optional[str] = None,
+                                limit: int = 500) -> Tuple[List[Class | Object], Optional[str]]:
+        nodes = await self.repo.get_nodes_page(label, after_uri, limit)
+        items = [item for item in (collect_from_node(node) for node in nodes) if item is not None]
+        next_uri = nodes[-1].uri if len(nodes) == limit else None
+        return items, next_uri
+
+    async def iter_ontology(self, label: str, page_size: int = 500) -> AsyncIterator[Class | Object]:
+        async for node in self.repo.iter_nodes(label, page_size):
+            item = collect_from_node(node)
+            if item is not None:
+                yield item
+
+    # ==================== CLASS ====================
+
+    async def get_class(self, class_uri: str) -> Optional[Class]:
+        node = await self.repo.get_node_by_uri(class_uri, "Class")
+        if node is None or "Class" not in node.labels:
+            return None
+
+        return collect_from_node(node)
+
+    async def get_classes(self, class_uris: List[str]) -> Dict[str, Optional[Class]]:
+        nodes = await self.repo.get_nodes_by_uris(class_uris, "Class")
+        return {uri: collect_from_node(node) for uri, node in nodes.items()}
+
+    async def get_class_objects(self, class_uri: str) -> List[Object]:
+        results = await self.repo.run_custom_query(CLASS_OBJECTS_QUERY, {"uris": [class_uri]})
+        return collect_class_objects(results)
+
+    async def collect_inherited_signature(self, class_uri: str) -> ClassSignature:
+        return (await self.collect_inherited_signatures([class_uri]))[class_uri]
+
+    async def collect_inherited_signatures(self, class_uris: List[str]) -> Dict[str, ClassSignature]:
+        class_uris = list(dict.fromkeys(class_uris))
+        results = await self.repo.run_custom_query(INHERITED_SIGNATURE_QUERY, {"uris": class_uris})
+        return collect_inherited_signatures(class_uris, results)
+
+    # ==================== OBJECTS ====================
+
+    async def get_object(self, object_uri: str) -> Optional[Object]:
+        node = await self.repo.get_node_by_uri(object_uri, "Object")
+        if node is None or "Object" not in node.labels:
+            return None
+
+        return collect_from_node(node)
+
+    async def get_objects(self, object_uris: List[str]) -> Dict[str, Optional[Object]]:
+        nodes = await self.repo.get_nodes_by_uris(object_uris, "Object")
+        return {uri: collect_from_node(node) for uri, node in nodes.items()}
+
+    async def get_object_view(self, object_uri: str, depth: int = 1, limit: int = 100) -> Optional[ObjectView]:
+        results = await self.repo.run_custom_query(object_view_query(depth), {"uri": object_uri, "limit": limit})
+        return collect_object_view(results[0]) if results else None
+
+    async def get_object_views(self, object_uris: List[str], depth: int = 1,
+                               limit: int = 100) -> Dict[str, Optional[ObjectView]]:
+        # карточки независимы: запросы идут параллельно по соединениям из пула
+        object_uris = list(dict.fromkeys(object_uris))
+        views = await asyncio.gather(*(self.get_object_view(uri, depth, limit) for uri in object_uris))
+        return dict(zip(object_uris, views))
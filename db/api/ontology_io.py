@@ -0,0 +1,333 @@
+import csv
+import json
+import os
+import re
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from db.api.neo4j_repository import Neo4jRepository
+from db.api.neo4j_schema import RESOURCE_LABEL, quote_name
+from db.onthology_namespace import (
+    CLASS, COMMENT, NOTE, OBJECT, PREFIXES, PROPERTY_DOMAIN, PROPERTY_LABEL, PROPERTY_LABEL_OBJECT,
+    PROPERTY_RANGE, RDF_TYPE, RDFS_CLASS, SUB_CLASS, TITLE, XSD_BOOLEAN, XSD_DOUBLE, XSD_INTEGER,
+)
+from db.utils.rdf_utils import Triple, is_bnode, node_iri, node_uri, predicate_for, rel_type_for
+
+# rdf:type -> метка узла
+TYPE_LABELS = {
+    CLASS: "Class",
+    RDFS_CLASS: "Class",
+    OBJECT: "Object",
+    PROPERTY_LABEL: "DatatypeProperty",
+    PROPERTY_LABEL_OBJECT: "ObjectProperty",
+}
+LABEL_TYPES = {"Class": CLASS, "Object": OBJECT, "DatatypeProperty": PROPERTY_LABEL,
+               "ObjectProperty": PROPERTY_LABEL_OBJECT}
+
+# предикаты, для которых в графе заведены собственные типы связей
+EDGE_TYPES = {SUB_CLASS: "SUBCLASS_OF", PROPERTY_DOMAIN: "domain", PROPERTY_RANGE: "range"}
+EDGE_PREDICATES = {rel_type: predicate for predicate, rel_type in EDGE_TYPES.items()}
+
+PROPERTY_KEYS = {TITLE: "title", NOTE: "description", COMMENT: "description"}
+KEY_PREDICATES = {"title": TITLE, "description": NOTE}
+
+# rdf:type на элементы словарей RDF/OWL, кроме перечисленных в TYPE_LABELS, не переносим
+META_NAMESPACES = tuple(PREFIXES[prefix] for prefix in ("rdf", "rdfs", "owl"))
+
+# литерал с языковым тегом хранится в свойстве "<ключ>@<язык>"; если у узла нет title/description
+# без тега, туда копируется первое значение с тегом, иначе API и поиск узел не увидят
+LANGUAGE_KEY = re.compile(r'(.+)@([A-Za-z]+(?:-[A-Za-z0-9]+)*)')
+
+# типы, которые хранятся в графе значениями Neo4j; литералы прочих типов - строками
+XSD_TYPES = {XSD_BOOLEAN: bool, XSD_INTEGER: int, XSD_DOUBLE: float}
+VALUE_TYPES = {bool: XSD_BOOLEAN, int: XSD_INTEGER, float: XSD_DOUBLE}
+
+
+def literal_value(triple: Triple) -> Any:
+    value_type = XSD_TYPES.get(triple.datatype)
+    try:
+        if value_type is bool:
+            return {"true": True, "1": True, "false": False, "0": False}[triple.object.strip()]
+        if value_type is not None:
+            return value_type(triple.object)
+    except (KeyError, ValueError):
+        pass
+    return triple.object
+
+
+def literal_triple(subject: str, predicate: str, value: Any, language: Optional[str] = None) -> Triple:
+    datatype = VALUE_TYPES.get(type(value))
+    if datatype == XSD_BOOLEAN:
+        value = "true" if value else "false"
+    return Triple(subject, predicate, str(value), True, language, datatype)
+
+
+def as_list(value: Any) -> List[Any]:
+    return list(value) if isinstance(value, list) else [] if value is None else [value]
+
+
+def merge_property(stored: Any, values: List[Any]) -> Any:
+    # значения одного ключа копятся списком: повтор тройки их не дублирует
+    items = as_list(stored)
+    items += [value for value in values if value not in items]
+    if len({type(item) for item in items}) > 1:
+        # массивы свойств в Neo4j однотипные
+        items = list(dict.fromkeys(str(item) for item in items))
+    return items[0] if len(items) == 1 else items
+
+
+class Checkpoint:
+    """Сколько записей источника уже записано в граф; позволяет продолжить прерванный импорт."""
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+
+    def load(self, source: str) -> int:
+        if not self.path or not os.path.exists(self.path):
+            return 0
+        with open(self.path) as f:
+            data = json.load(f)
+        return data.get("processed", 0) if data.get("source") == source else 0
+
+    def save(self, source: str, processed: int) -> None:
+        if not self.path:
+            return
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"source": source, "processed": processed}, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self) -> None:
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class GraphBatchWriter:
+    """
+    Копит метки, свойства и связи и записывает их пачкой: по одному UNWIND
+    на метку и тип связи в одной транзакции. Все записи через MERGE, поэтому
+    повтор пачки после сбоя ничего не дублирует. Значения свойств добавляются
+    к уже сохранённым: у ключа с несколькими значениями в графе лежит список.
+    """
+
+    def __init__(self, repo: Neo4jRepository, batch_size: int):
+        self.repo = repo
+        self.batch_size = batch_size
+        self.labels: Dict[str, Set[str]] = {}
+        self.props: Dict[str, Dict[str, List[Any]]] = {}
+        self.edges: Dict[str, Set[Tuple[str, str]]] = {}
+        self.size = 0
+
+    def add_label(self, uri: str, label: str) -> None:
+        self.labels.setdefault(label, set()).add(uri)
+        self.size += 1
+
+    def add_property(self, uri: str, key: str, value: Any) -> None:
+        values = self.props.setdefault(uri, {}).setdefault(key, [])
+        if value not in values:
+            values.append(value)
+        self.size += 1
+
+    def add_edge(self, from_uri: str, rel_type: str, to_uri: str) -> None:
+        self.edges.setdefault(rel_type, set()).add((from_uri, to_uri))
+        self.size += 1
+
+    @staticmethod
+    def merge_props(stored: Dict[str, Any], props: Dict[str, List[Any]]) -> Dict[str, Any]:
+        merged = {key: merge_property(stored.get(key), values) for key, values in props.items()}
+        for key, values in props.items():
+            match = LANGUAGE_KEY.fullmatch(key)
+            if match and match.group(1) in KEY_PREDICATES:
+                merged.setdefault(match.group(1), stored.get(match.group(1)) or values[0])
+        return merged
+
+    def full(self) -> bool:
+        return self.size >= self.batch_size
+
+    def flush(self) -> None:
+        if not self.size:
+            return
+
+        def write(tx):
+            for label, uris in self.labels.items():
+                tx.run(f"""
+                UNWIND $uris AS uri
+                MERGE (n:{RESOURCE_LABEL} {{uri: uri}})
+                SET n:{quote_name(label)}
+                """, uris=list(uris)).consume()
+
+            if self.props:
+                stored = {
+                    record["uri"]: record["props"]
+                    for record in tx.run(f"""
+                    UNWIND $uris AS uri
+                    MATCH (n:{RESOURCE_LABEL} {{uri: uri}})
+                    RETURN uri, properties(n) AS props
+                    """, uris=list(self.props))
+                }
+                rows = [{"uri": uri, "props": self.merge_props(stored.get(uri, {}), props)}
+                        for uri, props in self.props.items()]
+                tx.run(f"""
+                UNWIND $rows AS row
+                MERGE (n:{RESOURCE_LABEL} {{uri: row.uri}})
+                SET n += row.props
+                """, rows=rows).consume()
+
+            for rel_type, pairs in self.edges.items():
+                tx.run(f"""
+                UNWIND $rows AS row
+                MERGE (a:{RESOURCE_LABEL} {{uri: row.from}})
+                MERGE (b:{RESOURCE_LABEL} {{uri: row.to}})
+                MERGE (a)-[r:{quote_name(rel_type)}]->(b)
+                ON CREATE SET r.id = randomUUID(), r.uri = $rel_type
+                """, rows=[{"from": a, "to": b} for a, b in pairs], rel_type=rel_type).consume()
+
+        with self.repo.session() as session:
+            session.execute_write(write)
+
+        self.labels, self.props, self.edges = {}, {}, {}
+        self.size = 0
+
+
+class OntologyImporter:
+    def __init__(self, repo: Neo4jRepository, batch_size: int = 5000, checkpoint_path: Optional[str] = None):
+        self.writer = GraphBatchWriter(repo, batch_size)
+        self.checkpoint = Checkpoint(checkpoint_path)
+
+    def add_triple(self, triple: Triple) -> bool:
+        # пустые узлы (ограничения OWL и т.п.) в модель Class/Object/Property не ложатся
+        if is_bnode(triple.subject) or (not triple.literal and is_bnode(triple.object)):
+            return False
+
+        subject, predicate, obj = node_uri(triple.subject), triple.predicate, triple.object
+        if triple.literal:
+            key = PROPERTY_KEYS.get(predicate) or rel_type_for(predicate)
+            if triple.language:
+                key = f"{key}@{triple.language}"
+            self.writer.add_property(subject, key, literal_value(triple))
+        elif predicate == RDF_TYPE and obj in TYPE_LABELS:
+            self.writer.add_label(subject, TYPE_LABELS[obj])
+        elif predicate == RDF_TYPE and obj.startswith(META_NAMESPACES):
+            return False
+        else:
+            self.writer.add_edge(subject, EDGE_TYPES.get(predicate) or rel_type_for(predicate), node_uri(obj))
+        return True
+
+    def add_csv_row(self, row: Dict[str, str]) -> bool:
+        if "from" in row:
+            if not row.get("from") or not row.get("to") or not row.get("rel_type"):
+                return False
+            self.writer.add_edge(row["from"], row["rel_type"], row["to"])
+            return True
+
+        uri = row.get("uri")
+        if not uri:
+            return False
+        for label in filter(None, (row.get("labels") or "").split(";")):
+            self.writer.add_label(uri, label)
+        for key, value in row.items():
+            if key not in ("uri", "labels") and value not in (None, ""):
+                self.writer.add_property(uri, key, value)
+        return True
+
+    def run(self, records: Iterable[Any], source: str, add) -> Dict[str, int]:
+        skip = self.checkpoint.load(source)
+        stats = {"processed": 0, "imported": 0, "skipped": 0, "resumed_from": skip}
+
+        for processed, record in enumerate(records, 1):
+            if processed <= skip:
+                continue
+            if add(record):
+                stats["imported"] += 1
+            else:
+                stats["skipped"] += 1
+            if self.writer.full():
+                self.writer.flush()
+                self.checkpoint.save(source, processed)
+            stats["processed"] = processed
+
+        self.writer.flush()
+        self.checkpoint.clear()
+        return stats
+
+    def import_triples(self, triples: Iterable[Triple], source: str) -> Dict[str, int]:
+        return self.run(triples, source, self.add_triple)
+
+    def import_csv(self, file: IO[str], source: str) -> Dict[str, int]:
+        # узлы: uri,labels,title,description[,...]; связи: from,rel_type,to
+        return self.run(csv.DictReader(file), source, self.add_csv_row)
+
+
+class OntologyExporter:
+    def __init__(self, repo: Neo4jRepository, page_size: int = 5000):
+        self.repo = repo
+        self.page_size = page_size
+
+    def iter_nodes(self) -> Iterator[Dict[str, Any]]:
+        # keyset-пагинация по uri вместе с исходящими связями каждого узла страницы
+        query = f"""
+        MATCH (n:{RESOURCE_LABEL}) WHERE n.uri > $after
+        WITH n ORDER BY n.uri LIMIT $limit
+        OPTIONAL MATCH (n)-[r]->(m:{RESOURCE_LABEL})
+        WITH n, [arc IN collect({{rel_type: type(r), to: m.uri}}) WHERE arc.to IS NOT NULL] AS arcs
+        RETURN n.uri AS uri, labels(n) AS labels, properties(n) AS props, arcs
+        ORDER BY uri
+        """
+        after_uri = ""
+        while True:
+            page = self.repo.run_custom_query(query, {"after": after_uri, "limit": self.page_size})
+            yield from page
+            if len(page) < self.page_size:
+                return
+            after_uri = page[-1]["uri"]
+
+    def node_triples(self, node: Dict[str, Any]) -> Iterator[Triple]:
+        subject = node_iri(node["uri"])
+        for label in node["labels"]:
+            if label in LABEL_TYPES:
+                yield Triple(subject, RDF_TYPE, LABEL_TYPES[label])
+
+        props = node["props"]
+        tagged = {}
+        for key, value in props.items():
+            match = LANGUAGE_KEY.fullmatch(key)
+            if match and match.group(1) in KEY_PREDICATES:
+                tagged.setdefault(match.group(1), []).extend(as_list(value))
+
+        for key, value in props.items():
+            if key == "uri" or value is None:
+                continue
+            # title/description, скопированные из значения с языковым тегом, повторно не выгружаем
+            if key in tagged and all(item in tagged[key] for item in as_list(value)):
+                continue
+            language = None
+            match = LANGUAGE_KEY.fullmatch(key)
+            if match:
+                key, language = match.groups()
+            predicate = KEY_PREDICATES.get(key) or predicate_for(key)
+            for item in value if isinstance(value, list) else [value]:
+                yield literal_triple(subject, predicate, item, language)
+
+        for arc in node["arcs"]:
+            predicate = EDGE_PREDICATES.get(arc["rel_type"]) or predicate_for(arc["rel_type"])
+            yield Triple(subject, predicate, node_iri(arc["to"]))
+
+    def iter_triples(self) -> Iterator[Triple]:
+        for node in self.iter_nodes():
+            yield from self.node_triples(node)
+
+    def export_csv(self, nodes_file: IO[str], edges_file: IO[str]) -> Dict[str, int]:
+        nodes = csv.writer(nodes_file)
+        edges = csv.writer(edges_file)
+        nodes.writerow(["uri", "labels", "title", "description"])
+        edges.writerow(["from", "rel_type", "to"])
+
+        stats = {"nodes": 0, "edges": 0}
+        for node in self.iter_nodes():
+            labels = [label for label in node["labels"] if label != RESOURCE_LABEL]
+            props = node["props"]
+            nodes.writerow([node["uri"], ";".join(labels), props.get("title") or "", props.get("description") or ""])
+            for arc in node["arcs"]:
+                edges.writerow([node["uri"], arc["rel_type"], arc["to"]])
+            stats["nodes"] += 1
+            stats["edges"] += len(node["arcs"])
+        return stats
@@ -1,116 +1,282 @@
-from typing import Dict, Any
+import re
+from typing import Dict, Any, Iterator
 
+from django.conf import settings
+
+from .class_hierarchy_cache import ClassHierarchyCache, hierarchy_cache
 from .entities import *
 from .neo4j_repository import Neo4jRepository
+from .neo4j_schema import FULLTEXT_INDEX
+
+
+CLASS_OBJECTS_QUERY = """
+MATCH (o:Object)-[:rdf__type]->(c:Class)
+WHERE c.uri IN $uris
+RETURN DISTINCT o.uri AS uri, o.title AS title, o.description AS description, c.uri AS class_uri
+"""
+
+
+def collect_class_objects(rows: List[Dict[str, Any]]) -> List[Object]:
+    return [
+        Object(row["uri"], row["title"], class_uri=row["class_uri"], description=row["description"])
+        for row in rows
+    ]
+
+
+LUCENE_SPECIAL = re.compile(r'([+\-&|!(){}\[\]^"~*?:\\/])')
+SEARCH_MODES = ("prefix", "fuzzy", "exact")
+
+# фильтр по меткам идёт после индекса, поэтому кандидатов берём с запасом
+FULLTEXT_SEARCH_QUERY = """
+CALL db.index.fulltext.queryNodes($index, $query, {limit: $fetch}) YIELD node, score
+WHERE $labels IS NULL OR any(label IN labels(node) WHERE label IN $labels)
+RETURN node.uri AS uri, node.title AS title, node.description AS description, labels(node) AS labels, score
+ORDER BY score DESC
+LIMIT $limit
+"""
+
+
+def fulltext_query(text: str, mode: str = "prefix") -> Optional[str]:
+    # слова экранируем, чтобы ввод пользователя не разбирался как синтаксис Lucene
+    terms = [LUCENE_SPECIAL.sub(r'\\\1', term.lower()) for term in text.split()]
+    if not terms:
+        return None
+
+    if mode == "exact":
+        clause = '"' + " ".join(terms) + '"'
+    elif mode == "fuzzy":
+        clause = " AND ".join(term + "~" for term in terms)
+    else:
+        # typeahead: последнее слово ещё набирается
+        clause = " AND ".join(terms[:-1] + [terms[-1] + "*"])
+    return f"title:({clause})^3 OR description:({clause})"
+
+
+def search_params(text: str, mode: str, labels: Optional[List[str]], limit: int) -> Optional[Dict[str, Any]]:
+    query = fulltext_query(text, mode)
+    if query is None:
+        return None
+    return {
+        "index": FULLTEXT_INDEX,
+        "query": query,
+        "labels": labels or None,
+        "limit": limit,
+        "fetch": limit * 5 if labels else limit,
+    }
+
+
+def collect_search_hits(rows: List[Dict[str, Any]]) -> List[SearchHit]:
+    return [SearchHit(row["uri"], row["title"], row["description"], row["labels"], row["score"]) for row in rows]
+
+
+def object_view_query(depth: int) -> str:
+    # глубину нельзя передать параметром, поэтому уровни обхода разворачиваются в текст запроса
+    depth = max(1, int(depth))
+    neighbours = "RETURN [] AS neighbours"
+    if depth > 1:
+        # обход в ширину по различным узлам: каждый узел раскрывается один раз, а не перебираются
+        # все пути через общие узлы (класс объекта и т.п.); seen - узлы на расстоянии до текущего
+        # уровня включительно, поэтому в neighbours попадают только узлы с расстоянием от 2
+        levels = "".join(f"""
+        CALL {{
+            WITH seen, frontier, found
+            WITH seen, frontier, found WHERE size(found) < $limit
+            UNWIND frontier AS m
+            MATCH (m)--(n:Resource)
+            WHERE NOT n IN seen
+            WITH DISTINCT n LIMIT $limit
+            RETURN collect(n) AS next
+        }}
+        WITH seen + next AS seen, next AS frontier,
+             found + [n IN next | {{uri: n.uri, title: n.title, labels: labels(n), depth: {level}}}] AS found
+        """ for level in range(2, depth + 1))
+        neighbours = f"""
+        OPTIONAL MATCH (o)--(n:Resource)
+        WITH o, collect(DISTINCT n) AS first
+        WITH [o] + first AS seen, first AS frontier, [] AS found
+        {levels}
+        RETURN found[..$limit] AS neighbours
+        """
+
+    return f"""
+    MATCH (o:Object {{uri: $uri}})
+    CALL {{
+        WITH o
+        MATCH (o)-[:rdf__type]->(c:Class)
+        RETURN collect(DISTINCT {{uri: c.uri, title: c.title, description: c.description}}) AS classes
+    }}
+    CALL {{
+        WITH o
+        MATCH (o)-[r]->(n)
+        WHERE type(r) <> 'rdf__type'
+        WITH r, n LIMIT $limit
+        RETURN collect({{id: r.id, rel_type: type(r), uri: n.uri, title: n.title, labels: labels(n)}}) AS outgoing
+    }}
+    CALL {{
+        WITH o
+        MATCH (o)<-[r]-(n)
+        WITH r, n LIMIT $limit
+        RETURN collect({{id: r.id, rel_type: type(r), uri: n.uri, title: n.title, labels: labels(n)}}) AS incoming
+    }}
+    CALL {{
+        WITH o
+        {neighbours}
+    }}
+    RETURN properties(o) AS props, classes, outgoing, incoming, neighbours
+    """
+
+
+def collect_object_view(result: Dict[str, Any]) -> ObjectView:
+    props = result["props"]
+    classes = [Class(c["uri"], c["title"], c["description"]) for c in result["classes"]]
+    obj = Object(
+        props.get("uri"),
+        props.get("title"),
+        class_uri=classes[0].uri if classes else None,
+        description=props.get("description")
+    )
+
+    def relations(items):
+        return [Relation(
+            id=item.get("id"),
+            rel_type=item.get("rel_type"),
+            uri=item["uri"],
+            title=item["title"],
+            labels=item["labels"],
+            depth=item.get("depth", 1)
+        ) for item in items]
+
+    return ObjectView(
+        object=obj,
+        properties=props,
+        classes=classes,
+        outgoing=relations(result["outgoing"]),
+        incoming=relations(result["incoming"]),
+        neighbours=relations(result["neighbours"])
+    )
+
+
+# свойства класса и всех его предков; class_uri у свойства - класс, где оно объявлено
+INHERITED_SIGNATURE_QUERY = """
+UNWIND $uris AS class_uri
+MATCH (c:Class {uri: class_uri})-[:SUBCLASS_OF*0..]->(owner:Class)
+WITH DISTINCT class_uri, owner
+MATCH (owner)-[:domain]-(p)
+WHERE p:DatatypeProperty OR p:ObjectProperty
+OPTIONAL MATCH (p)-[:range]->(rng:Class)
+RETURN DISTINCT class_uri, owner.uri AS owner_uri, p.uri AS uri, p.title AS title,
+       p:ObjectProperty AS is_object, rng.uri AS range_uri
+"""
+
+
+def collect_inherited_signatures(class_uris: List[str], rows: List[Dict[str, Any]]) -> Dict[str, ClassSignature]:
+    signatures = {
+        uri: ClassSignature(class_uri=uri, datatype_properties=[], object_properties=[])
+        for uri in class_uris
+    }
+    seen = set()
+
+    for result in rows:
+        key = (result["class_uri"], result["uri"])
+        if key in seen:
+            continue
+        seen.add(key)
+
+        signature = signatures[result["class_uri"]]
+        if result["is_object"]:
+            signature.object_properties.append(ObjectProperty(
+                uri=result["uri"],
+                title=result["title"],
+                class_uri=result["owner_uri"],
+                range_class_uri=result["range_uri"]
+            ))
+        else:
+            signature.datatype_properties.append(DatatypeProperty(
+                uri=result["uri"],
+                title=result["title"],
+                class_uri=result["owner_uri"]
+            ))
+
+    return signatures
 
 
 class OntologyRepository:
-    def __init__(self, repository: Neo4jRepository):
+    def __init__(self, repository: Neo4jRepository, cache: Optional[ClassHierarchyCache] = None):
         self.repo = repository
+        self.cache = cache or hierarchy_cache
 
     # ==================== CLASS ====================
 
     def get_ontology(self) -> Ontology:
-        all_nodes = self.repo.get_all_nodes()
-
-        classes = [collect_from_node(node) for node in all_nodes if "Class" in node.labels]
-        objects = [collect_from_node(obj) for obj in all_nodes if "Object" in obj.labels]
+        classes = list(self.iter_ontology("Class"))
+        objects = list(self.iter_ontology("Object"))
 
         return Ontology(classes, objects)
 
+    def iter_ontology(self, label: str, page_size: int = 500) -> Iterator[Class | Object]:
+        for node in self.repo.iter_nodes(label, page_size):
+            item = collect_from_node(node)
+            if item is not None:
+                yield item
 
-    def get_ontology_parent_classes(self) -> List[Class]:
-        query = """
-        MATCH (c:Class)
-        WHERE NOT (c)<-[:SUBCLASS_OF]-(:Class)
-        RETURN c, labels(c) as class_labels
-        """
-
-
-        results = self.repo.run_custom_query(query)
-        classes = []
 
-        for result in results:
-            node_data = result["c"]
-            class_label = result.get("class_labels", [])
+    def search(self, text: str, mode: str = "prefix", labels: Optional[List[str]] = None,
+               limit: int = 20) -> List[SearchHit]:
+        params = search_params(text, mode, labels, limit)
+        if params is None:
+            return []
+        return collect_search_hits(self.repo.run_custom_query(FULLTEXT_SEARCH_QUERY, params))
 
-            node_data["labels"] = class_label
-            class_obj = collect_from_node(node_data)
-            classes.append(class_obj)
-
-        return classes
+    def get_ontology_parent_classes(self) -> List[Class]:
+        self.cache.ensure_fresh(self.repo)
+        return self.cache.get_leaves()
 
     def get_class(self, class_uri: str) -> Optional[Class]:
-        node = self.repo.get_node_by_uri(class_uri)
+        node = self.repo.get_node_by_uri(class_uri, "Class")
 
         if node is None or "Class" not in node.labels:
             return None
 
         return collect_from_node(node)
 
-
+    def get_classes(self, class_uris: List[str]) -> Dict[str, Optional[Class]]:
+        nodes = self.repo.get_nodes_by_uris(class_uris, "Class")
+        return {uri: collect_from_node(node) for uri, node in nodes.items()}
 
     def get_class_parents(self, class_uri: str) -> List[Class]:
-        query = """
-        MATCH (c:Class {uri: $uri})-[:SUBCLASS_OF]->(parent:Class)
-        RETURN parent, labels(parent) as parent_labels
-        """
-        results = self.repo.run_custom_query(query, {"uri": class_uri})
-        parents = []
-
-        for result in results:
-            parent_data = result["parent"]
-            parent_labels = result.get("parent_labels", [])
-
-            parent_data["labels"] = parent_labels
-
-            parent_class = collect_from_node(parent_data)
-            parents.append(parent_class)
-
-        return parents
+        self.cache.ensure_fresh(self.repo)
+        return self.cache.get_parents(class_uri)
 
     def get_class_children(self, class_uri: str) -> List[Class]:
-        query = """
-        MATCH (c:Class {uri: $uri})<-[:SUBCLASS_OF]-(child:Class)
-        RETURN child
-        """
-        results = self.repo.run_custom_query(query, {"uri": class_uri})
-        children = []
-
-        for result in results:
-            child_data = result["child"]
-            child_labels = result.get("child_labels", [])
+        self.cache.ensure_fresh(self.repo)
+        return self.cache.get_children(class_uri)
 
-            # Добавляем метки к данным дочернего класса
-            child_data["labels"] = child_labels
+    def get_class_ancestors(self, class_uri: str) -> List[Class]:
+        self.cache.ensure_fresh(self.repo)
+        return self.cache.get_ancestors(class_uri)
 
-            child_class = collect_from_node(child_data)
-            children.append(child_class)
+    def get_class_descendants(self, class_uri: str) -> List[Class]:
+        self.cache.ensure_fresh(self.repo)
+        return self.cache.get_descendants(class_uri)
 
-        return children
+    def get_class_subtree(self, class_uri: str, max_depth: Optional[int] = None) -> Optional[dict]:
+        self.cache.ensure_fresh(self.repo)
+        return self.cache.get_subtree(class_uri, max_depth)
 
-    def get_class_objects(self, class_uri: str) -> List[Object]:
-        query = """
-        MATCH (o:Object)-[:rdf__type]->(c:Class {uri: $uri})
-        RETURN o, labels(o) as object_labels
-        """
-
-        results = self.repo.run_custom_query(query, {"uri": class_uri})
-        objects = []
-
-        for result in results:
-            object_data = result["o"]
-            object_labels = result.get("object_labels", [])
-
-            object_data["labels"] = object_labels
-
-            obj = collect_from_node(object_data)
-            objects.append(obj)
+    def get_class_objects(self, class_uri: str, deep: bool = False) -> List[Object]:
+        class_uris = [class_uri]
+        if deep:
+            self.cache.ensure_fresh(self.repo)
+            class_uris += self.cache.get_descendant_uris(class_uri)
 
-        return objects
+        results = self.repo.run_custom_query(CLASS_OBJECTS_QUERY, {"uris": class_uris})
+        return collect_class_objects(results)
 
     def update_class(self, class_uri: str, params: Dict[str, Any]) -> Optional[Class]:
-        return collect_from_node(self.repo.update_node(class_uri, params))
+        cls = collect_from_node(self.repo.update_node(class_uri, params, "Class"))
+        self.cache.invalidate()
+        self.cache.bump(self.repo)
+        return cls
 
     def create_class(self, title: str, description: str, parent_uri: Optional[str] = None) -> Class:
         uri = self.repo.generate_random_string()
@@ -121,17 +287,54 @@ class OntologyRepository:
         if parent_uri:
             self.repo.create_arc(node.uri, parent_uri, "SUBCLASS_OF")
 
-        return collect_from_node(node)
+        cls = collect_from_node(node)
+        self.cache.add_class(Class(cls.uri, cls.title, cls.description, list(node.labels)), parent_uri)
+        self.cache.bump(self.repo)
+        return cls
+
+    def collect_class_deletion(self, class_uri: str) -> Dict[str, List[str]]:
+        # подклассы берём из индекса замыкания, а не из SUBCLASS_OF*: обход путей в DAG не линеен;
+        # версию кэша сверяем сразу, чтобы не пропустить подклассы, добавленные другим воркером
+        self.cache.ensure_fresh(self.repo, force=True)
+        class_uris = [class_uri] + self.cache.get_descendant_uris(class_uri)
+        # объекты, как и раньше, по rdf__type*: в том числе типизированные через цепочку других объектов
 
-    def delete_class(self, class_uri: str) -> None:
         query = """
-        MATCH (c:Class {uri: $uri})
-        OPTIONAL MATCH (c)<-[:SUBCLASS_OF*]-(child:Class)
-        OPTIONAL MATCH (c)<-[:rdf__type*]-(o:Object)
-        OPTIONAL MATCH (c)<-[:domain]-(q)
-        DETACH DELETE c, child, o, q
+        UNWIND $uris AS uri
+        MATCH (cls:Class {uri: uri})
+        WITH collect(cls) AS classes
+        CALL {
+            WITH classes
+            UNWIND classes AS cls
+            MATCH (cls)<-[:rdf__type*]-(o:Object)
+            RETURN collect(DISTINCT elementId(o)) AS objects
+        }
+        CALL {
+            WITH classes
+            UNWIND classes AS cls
+            MATCH (cls)-[:domain]-(p)
+            WHERE p:DatatypeProperty OR p:ObjectProperty
+            RETURN collect(DISTINCT elementId(p)) AS properties
+        }
+        RETURN [cls IN classes | elementId(cls)] AS classes, objects, properties
         """
-        self.repo.run_custom_query(query, {"uri": class_uri})
+        result = self.repo.run_custom_query(query, {"uris": class_uris})[0]
+        return {key: result[key] for key in ("objects", "properties", "classes")}
+
+    def delete_class(self, class_uri: str, dry_run: bool = False) -> Dict[str, int]:
+        affected = self.collect_class_deletion(class_uri)
+        counts = {key: len(ids) for key, ids in affected.items()}
+        if dry_run:
+            return counts
+
+        # сначала объекты и свойства, классы последними
+        for ids in affected.values():
+            if ids:
+                self.repo.delete_nodes_by_ids(ids, settings.ONTOLOGY_DELETE_BATCH_SIZE)
+
+        self.cache.invalidate()
+        self.cache.bump(self.repo)
+        return counts
 
     # ==================== CLASS ATTRIBUTES ====================
 
@@ -139,51 +342,75 @@ class OntologyRepository:
         prop = self.repo.create_node({"title": title}, labels=["DatatypeProperty"])
 
         self.repo.create_arc(prop.uri, class_uri, "domain")
+        self.signature_changed()
         return collect_from_node(prop)
 
     def delete_class_attribute(self, prop_uri: str) -> None:
-        self.repo.delete_node_by_uri(prop_uri)
+        self.repo.delete_node_by_uri(prop_uri, "DatatypeProperty")
+        self.signature_changed()
 
     def add_class_object_attribute(self, class_uri: str, attr_name: str, range_class_uri: str) -> ObjectProperty:
         prop = self.repo.create_node({"title": attr_name}, labels=["ObjectProperty"])
 
-        self.repo.create_arc(prop.uri, class_uri, "domain")
-        self.repo.create_arc(prop.uri, range_class_uri, "range")
+        self.repo.create_arcs([
+            {"from": prop.uri, "to": class_uri, "rel_type": "domain"},
+            {"from": prop.uri, "to": range_class_uri, "rel_type": "range"},
+        ])
+        self.signature_changed()
 
         return collect_from_node(prop)
 
     def delete_class_object_attribute(self, object_property_uri: str) -> None:
-        self.repo.delete_node_by_uri(object_property_uri)
+        self.repo.delete_node_by_uri(object_property_uri, "ObjectProperty")
+        self.signature_changed()
 
     def add_class_parent(self, parent_uri: str, target_uri: str) -> None:
         self.repo.create_arc(target_uri, parent_uri, "SUBCLASS_OF")
+        self.cache.add_parent(target_uri, parent_uri)
+        self.cache.bump(self.repo)
+
+    def signature_changed(self) -> None:
+        # по uri свойства класс не известен, поэтому сбрасываем все сигнатуры
+        self.cache.clear_signatures()
+        self.cache.bump(self.repo)
 
     # ==================== OBJECTS ====================
 
     def get_object(self, object_uri: str) -> Optional[Object]:
-        node = self.repo.get_node_by_uri(object_uri)
+        node = self.repo.get_node_by_uri(object_uri, "Object")
         if node is None or "Object" not in node.labels:
             return None
 
         return collect_from_node(node)
 
+    def get_object_view(self, object_uri: str, depth: int = 1, limit: int = 100) -> Optional[ObjectView]:
+        results = self.repo.run_custom_query(object_view_query(depth), {"uri": object_uri, "limit": limit})
+        return collect_object_view(results[0]) if results else None
+
+    def get_objects(self, object_uris: List[str]) -> Dict[str, Optional[Object]]:
+        nodes = self.repo.get_nodes_by_uris(object_uris, "Object")
+        return {uri: collect_from_node(node) for uri, node in nodes.items()}
+
     def delete_object(self, object_uri: str) -> None:
-        self.repo.delete_node_by_uri(object_uri)
+        self.repo.delete_node_by_uri(object_uri, "Object")
 
     def create_object(self, params: Dict[str, Any], obj_params: list[Dict[str, Any]]) -> Object:
         obj = self.repo.create_node(params, labels=["Object", params["uri"]])
+
+        arcs = []
         for param in obj_params:
             if param["direction"] == 1:
-                self.repo.create_arc(obj.uri, param["value_uri"], param["rel_type"])
+                arcs.append({"from": obj.uri, "to": param["value_uri"], "rel_type": param["rel_type"]})
             else:
-                self.repo.create_arc(param["value_uri"], obj.uri, param["rel_type"])
-
+                arcs.append({"from": param["value_uri"], "to": obj.uri, "rel_type": param["rel_type"]})
+        if arcs:
+            self.repo.create_arcs(arcs)
 
         return collect_from_node(obj)
 
     def update_object(self, object_uri: str, params: Dict[str, Any]) -> Optional[Object]:
         update_params = {"uri": params["uri"], "title": params["title"], "description": params["description"]}
-        return self.repo.update_node(object_uri, update_params)
+        return self.repo.update_node(object_uri, update_params, "Object")
 
         # if params["datatype"]:
         #     for prop_name, value in params["datatype"].items():
@@ -212,6 +439,10 @@ class OntologyRepository:
 
 
     def collect_signature(self, class_uri: str) -> Optional[ClassSignature]:
+        self.cache.ensure_fresh(self.repo)
+        return self.cache.get_signature(class_uri, self.load_signature)
+
+    def load_signature(self, class_uri: str) -> ClassSignature:
         datatype_query = """
         MATCH (c:Class {uri: $class_uri})-[:domain]->(dtp:DatatypeProperty)
         RETURN dtp
@@ -250,4 +481,12 @@ class OntologyRepository:
             class_uri=class_uri,
             datatype_properties=datatype_properties,
             object_properties=object_properties
-        )
\ No newline at end of file
+        )
+
+    def collect_inherited_signature(self, class_uri: str) -> ClassSignature:
+        return self.collect_inherited_signatures([class_uri])[class_uri]
+
+    def collect_inherited_signatures(self, class_uris: List[str]) -> Dict[str, ClassSignature]:
+        class_uris = list(dict.fromkeys(class_uris))
+        results = self.repo.run_custom_query(INHERITED_SIGNATURE_QUERY, {"uris": class_uris})
+        return collect_inherited_signatures(class_uris, results)
@@ -0,0 +1,92 @@
+from typing import List, Optional
+
+import numpy as np
+
+from db.models import Text, TextChunk
+from db.utils.embedding_utils import EmbeddingUtils
+from db.utils.vector_index import get_vector_index
+from db.utils.vector_matrix import get_vector_matrix
+
+
+class SearchRepository:
+    def __init__(self):
+        pass
+
+    def allowed_text_ids(self, corpus: Optional[int] = None, genre: Optional[str] = None) -> Optional[List[int]]:
+        if corpus is None and not genre:
+            return None
+
+        texts = Text.objects.all()
+        if corpus is not None:
+            texts = texts.filter(corpus_id=corpus)
+        if genre:
+            texts = texts.filter(corpus__genre=genre)
+        return list(texts.values_list('id', flat=True))
+
+    def collect_hits(self, hits: list) -> List[dict]:
+        chunks = TextChunk.objects.select_related('text').in_bulk([chunk_id for chunk_id, _, _ in hits])
+
+        results = []
+        for chunk_id, text_id, score in hits:
+            chunk = chunks.get(chunk_id)
+            # индекс мог ещё не увидеть удаление текста
+            if chunk is None:
+                continue
+            results.append({
+                "chunk_id": chunk.id,
+                "text_id": text_id,
+                "title": chunk.text.title,
+                "corpus_id": chunk.text.corpus_id,
+                "ordinal": chunk.ordinal,
+                "char_start": chunk.char_start,
+                "char_end": chunk.char_end,
+                "content": chunk.text.content[chunk.char_start:chunk.char_end],
+                "score": score,
+            })
+        return results
+
+    def group_by_text(self, results: List[dict], k: int) -> List[dict]:
+        texts = {}
+        for result in results:
+            best = texts.get(result["text_id"])
+            if best is None:
+                texts[result["text_id"]] = {
+                    "text_id": result["text_id"],
+                    "title": result["title"],
+                    "corpus_id": result["corpus_id"],
+                    "score": result["score"],
+                    "chunks": [result],
+                }
+            else:
+                best["chunks"].append(result)
+        return sorted(texts.values(), key=lambda t: -t["score"])[:k]
+
+    def search(self, query: str, k: int = 10, corpus: Optional[int] = None, genre: Optional[str] = None,
+               level: str = "chunk", nprobe: Optional[int] = None, exact: bool = False) -> List[dict]:
+        return self.search_batch([query], k, corpus, genre, level, nprobe, exact)[0]
+
+    def search_batch(self, queries: List[str], k: int = 10, corpus: Optional[int] = None,
+                     genre: Optional[str] = None, level: str = "chunk", nprobe: Optional[int] = None,
+                     exact: bool = False) -> List[List[dict]]:
+        allowed = self.allowed_text_ids(corpus, genre)
+        if not queries or (allowed is not None and not allowed):
+            return [[] for _ in queries]
+
+        # запросы разовые, в общий кэш эмбеддингов чанков их не пишем
+        query_vectors = np.asarray(EmbeddingUtils().get_embeddings(queries, use_cache=False))
+
+        # для выдачи по текстам берём с запасом, т.к. у одного текста много чанков
+        limit = k * 5 if level == "text" else k
+        matrix = get_vector_matrix()
+        if exact and matrix.is_fresh():
+            hits = matrix.search_batch(query_vectors, limit, allowed)
+        else:
+            # матрица не собрана или отстала от текстов: точный поиск - полный перебор списков IVF
+            index = get_vector_index()
+            hits = [index.search(vector, limit, allowed, nprobe, exhaustive=exact) for vector in query_vectors]
+
+        results = []
+        for query_hits in hits:
+            chunks = self.collect_hits(query_hits)
+            results.append(self.group_by_text(chunks, k) if level == "text" else chunks)
+        return results
@@ -1,6 +1,18 @@
-from db.models import Text, Corpus
-from db.utils.embedding_utils import EmbeddingUtils
-import json
+from itertools import groupby
+from typing import Iterable, List, Optional
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from db.models import EmbeddingJob, Text, TextAlignment, TextChunk, Corpus
+from db.utils.embedding_utils import EmbeddingUtils, hash_chunk
+from db.utils.vector_index import get_vector_index
+from db.utils.vector_matrix import get_vector_matrix
+
+END = object()
 
 
 class TextRepository:
@@ -15,31 +27,245 @@ class TextRepository:
             "content": text.content,
             "corpus_id": text.corpus_id,
             "has_translation": text.has_translation_id,
+            "embedding_status": text.embedding_status,
+        }
+
+    def collect_chunk(self, chunk: TextChunk, content: str):
+        return {
+            "id": chunk.id,
+            "ordinal": chunk.ordinal,
+            "char_start": chunk.char_start,
+            "char_end": chunk.char_end,
+            "content_hash": chunk.content_hash,
+            "content": content[chunk.char_start:chunk.char_end],
         }
 
     def getText(self, id: int):
         text = Text.objects.get(pk=id)
         return self.collect_text(text)
 
+    def getTextChunks(self, id: int):
+        text = Text.objects.get(pk=id)
+        return [self.collect_chunk(chunk, text.content) for chunk in text.chunks.all()]
+
+    def build_chunks(self, text: Text, spans: list, vectors, dtype: str, model_name: str) -> List[TextChunk]:
+        chunks = []
+        for ordinal, (start, end, chunk) in enumerate(spans):
+            text_chunk = TextChunk(
+                text=text,
+                ordinal=ordinal,
+                char_start=start,
+                char_end=end,
+                content_hash=hash_chunk(chunk),
+                model_name=model_name,
+            )
+            text_chunk.set_vector(vectors[ordinal], dtype)
+            chunks.append(text_chunk)
+        return chunks
+
+    def embed_text(self, text: Text, emb_utils: EmbeddingUtils) -> None:
+        spans, counts = emb_utils.get_counted_spans(text.content, text.corpus.get_chunking())
+        vectors = emb_utils.get_embeddings([chunk for _, _, chunk in spans], token_counts=counts)
+        dtype = settings.EMBEDDING_STORAGE_DTYPE
+
+        text.set_embeddings(vectors, dtype)
+        text.embedding_status = Text.EMBEDDING_READY
+        text.embedded_at = timezone.now()
+        text.save()
+
+        text.chunks.all().delete()
+        TextChunk.objects.bulk_create(self.build_chunks(text, spans, vectors, dtype, emb_utils.model_name))
+        # чанки поменялись: выравнивания с переводом и оригиналом устарели
+        TextAlignment.objects.filter(Q(source=text) | Q(target=text)).delete()
+
+        chunk_ids = list(text.chunks.order_by('ordinal').values_list('id', flat=True))
+        transaction.on_commit(lambda: self.index_text(text.id, chunk_ids, vectors))
+
+    def import_texts(self, records: Iterable[dict], default_corpus: Optional[int] = None,
+                     batch_size: Optional[int] = None) -> dict:
+        batch_size = batch_size or settings.TEXT_IMPORT_BATCH_SIZE
+        emb_utils = EmbeddingUtils()
+        corpora = {}
+        stats = {"created": 0, "ids": [], "errors": [], "aborted": False}
+
+        batch = []
+        records = iter(records)
+        line_no = 0
+        while True:
+            try:
+                record = next(records, END)
+            except ValueError as e:
+                # поток дальше не разобрать: дописываем накопленное и отдаём статистику с ошибкой
+                self.import_batch(batch, emb_utils, corpora, stats)
+                stats["errors"].append({"line": line_no + 1, "error": str(e)})
+                stats["aborted"] = True
+                return stats
+            if record is END:
+                break
+            line_no += 1
+
+            if not isinstance(record, dict):
+                stats["errors"].append({"line": line_no, "error": "record must be a JSON object"})
+                continue
+            corpus_id = record.get("corpus", default_corpus)
+            if not record.get("content") or corpus_id is None:
+                stats["errors"].append({"line": line_no, "error": "content and corpus are required"})
+                continue
+            # id из JSON могут прийти строками, а ключи in_bulk - числа
+            try:
+                corpus_id = int(corpus_id)
+                if record.get("has_translation"):
+                    record["has_translation"] = int(record["has_translation"])
+            except (TypeError, ValueError):
+                stats["errors"].append({"line": line_no, "error": "corpus and has_translation must be integer ids"})
+                continue
+            batch.append((line_no, corpus_id, record))
+            if len(batch) >= batch_size:
+                self.import_batch(batch, emb_utils, corpora, stats)
+                batch = []
+        self.import_batch(batch, emb_utils, corpora, stats)
+
+        return stats
+
+    def import_batch(self, batch: list, emb_utils: EmbeddingUtils, corpora: dict, stats: dict) -> None:
+        if not batch:
+            return
+
+        unknown = {corpus_id for _, corpus_id, _ in batch if corpus_id not in corpora}
+        if unknown:
+            corpora.update(Corpus.objects.in_bulk(list(unknown)))
+        translation_ids = {record["has_translation"] for _, _, record in batch if record.get("has_translation")}
+        translations = Text.objects.in_bulk(list(translation_ids)) if translation_ids else {}
+
+        texts, spans, counts = [], [], []
+        for line_no, corpus_id, record in batch:
+            corpus = corpora.get(corpus_id)
+            if corpus is None:
+                stats["errors"].append({"line": line_no, "error": f"corpus {corpus_id} not found"})
+                continue
+            texts.append(Text(
+                title=record.get("title", ""),
+                description=record.get("description", ""),
+                content=record["content"],
+                corpus=corpus,
+                has_translation=translations.get(record.get("has_translation")),
+            ))
+            text_spans, text_counts = emb_utils.get_counted_spans(record["content"], corpus.get_chunking())
+            spans.append(text_spans)
+            counts.extend(text_counts)
+
+        # один вызов модели на всю пачку текстов
+        all_chunks = [chunk for text_spans in spans for _, _, chunk in text_spans]
+        all_vectors = emb_utils.get_embeddings(all_chunks, token_counts=counts) if all_chunks else []
+        dtype = settings.EMBEDDING_STORAGE_DTYPE
+
+        offsets = []
+        offset = 0
+        for text, text_spans in zip(texts, spans):
+            offsets.append((offset, offset + len(text_spans)))
+            text.set_embeddings(all_vectors[offset:offset + len(text_spans)], dtype)
+            offset += len(text_spans)
+            text.embedding_status = Text.EMBEDDING_READY
+            text.embedded_at = timezone.now()
+
+        with transaction.atomic():
+            if connection.features.can_return_rows_from_bulk_insert:
+                Text.objects.bulk_create(texts)
+            else:
+                for text in texts:
+                    text.save()
+
+            chunks = []
+            for text, text_spans, (start, end) in zip(texts, spans, offsets):
+                chunks.extend(self.build_chunks(text, text_spans, all_vectors[start:end], dtype,
+                                                 emb_utils.model_name))
+            TextChunk.objects.bulk_create(chunks, batch_size=1000)
+
+            text_ids = [text.id for text in texts]
+            transaction.on_commit(lambda: self.index_texts(text_ids))
+
+        stats["created"] += len(texts)
+        stats["ids"].extend(text.id for text in texts)
+
+    @staticmethod
+    def chunk_vectors(text: Text, chunks: List[TextChunk]) -> np.ndarray:
+        # матрица текста читается из одного BinaryField без копирования; если она не сходится
+        # с чанками (чанки пересобраны в обход embed_text), собираем векторы по чанкам
+        if text.embeddings_rows == len(chunks) and text.embeddings_dim:
+            return text.get_embeddings()
+        return np.stack([chunk.get_vector() for chunk in chunks])
+
+    def index_texts(self, text_ids: List[int]) -> None:
+        texts = Text.objects.only('id', 'embeddings', 'embeddings_dtype', 'embeddings_rows', 'embeddings_dim') \
+            .in_bulk(text_ids)
+        chunks = TextChunk.objects.filter(text_id__in=text_ids) \
+            .only('id', 'text_id', 'vector', 'vector_dtype', 'dim').order_by('text_id', 'ordinal')
+        with get_vector_index().writing() as index:
+            for text_id, text_chunks in groupby(chunks, key=lambda chunk: chunk.text_id):
+                text_chunks = list(text_chunks)
+                index.upsert_text(
+                    text_id,
+                    [chunk.id for chunk in text_chunks],
+                    self.chunk_vectors(texts[text_id], text_chunks),
+                )
+        get_vector_matrix().mark_dirty()
+
+    def index_text(self, text_id: int, chunk_ids: list, vectors) -> None:
+        with get_vector_index().writing() as index:
+            index.upsert_text(text_id, chunk_ids, vectors)
+        # id чанков сменились, матрица для точного поиска устарела до пересборки
+        get_vector_matrix().mark_dirty()
+
+    def unindex_text(self, text_id: int) -> None:
+        with get_vector_index().writing() as index:
+            index.remove_text(text_id)
+        get_vector_matrix().mark_dirty()
+
+    def enqueue_embedding(self, text: Text) -> EmbeddingJob:
+        # ожидающая задача всё равно возьмёт актуальный content, вторая не нужна
+        job = text.embedding_jobs.filter(status=EmbeddingJob.PENDING).first()
+        if job is None:
+            job = EmbeddingJob.objects.create(text=text)
+        return job
+
+    def drop_chunks(self, text: Text) -> None:
+        # смещения старых чанков к новому content не подходят: чанки (вместе со связями
+        # с онтологией), выравнивания и векторы в индексе уходят в одной транзакции со сменой текста
+        text.chunks.all().delete()
+        text.set_embeddings(np.empty((0, 0), dtype=np.float32))
+        TextAlignment.objects.filter(Q(source=text) | Q(target=text)).delete()
+        text_id = text.id
+        transaction.on_commit(lambda: self.unindex_text(text_id))
+
+    def schedule_embedding(self, text: Text) -> None:
+        if settings.EMBEDDING_ASYNC:
+            with transaction.atomic():
+                if text.pk is not None:
+                    self.drop_chunks(text)
+                text.embedding_status = Text.EMBEDDING_PENDING
+                text.save()
+                self.enqueue_embedding(text)
+        else:
+            with transaction.atomic():
+                self.embed_text(text, EmbeddingUtils())
+
     def create_text(self, data: dict) -> dict:
         corpus = Corpus.objects.get(pk=data["corpus"]) if "corpus" in data else None
         has_translation = Text.objects.get(pk=data["has_translation"]) if "has_translation" in data else None
 
-        emb_utils = EmbeddingUtils()
-        chunks = emb_utils.get_chunks(data["content"])
-
-        text = Text.objects.create(
+        text = Text(
             title=data.get("title", ""),
             description=data.get("description", ""),
             content=data.get("content", ""),
             corpus=corpus,
-            embeddings=json.dumps(emb_utils.get_embeddings(chunks).tolist()),
             has_translation=has_translation,
         )
+        self.schedule_embedding(text)
         return self.collect_text(text)
 
     def update_text(self, id: int, data: dict) -> dict:
         text = Text.objects.get(pk=id)
+        previous_content = text.content
 
         text.title = data.get("title", text.title)
         text.description = data.get("description", text.description)
@@ -50,14 +276,17 @@ class TextRepository:
         if "has_translation" in data:
             text.has_translation = Text.objects.get(pk=data["has_translation"])
 
-        emb_utils = EmbeddingUtils()
-        chunks = emb_utils.get_chunks(data["content"])
-        text.embeddings = json.dumps(emb_utils.get_embeddings(chunks).tolist())
+        # при смене только метаданных эмбеддинги пересчитывать не нужно
+        if text.content == previous_content:
+            text.save()
+            return self.collect_text(text)
 
-        text.save()
+        self.schedule_embedding(text)
         return self.collect_text(text)
 
     def deleteText(self, id: int):
         text = Text.objects.get(pk=id)
+        text_id = text.id
         text.delete()
+        self.unindex_text(text_id)
         return id
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from db.models import TextChunk
+from db.utils.vector_matrix import get_vector_matrix
+
+
+class Command(BaseCommand):
+    help = "Собирает memory-mapped матрицу векторов чанков для точного поиска"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        chunks = TextChunk.objects.exclude(vector=None).filter(dim__gt=0)
+        first = chunks.order_by('id').first()
+        if first is None:
+            self.stdout.write("No chunk vectors to build from")
+            return
+
+        rows = (
+            (chunk.id, chunk.text_id, chunk.get_vector())
+            for chunk in chunks.only('id', 'text_id', 'vector', 'vector_dtype', 'dim')
+                               .order_by('id').iterator(chunk_size=options['batch_size'])
+        )
+        written = get_vector_matrix().build(rows, chunks.count(), first.dim)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} chunk vectors"))
@@ -0,0 +1,43 @@
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from db.models import TextChunk
+from db.utils.vector_index import get_vector_index
+
+
+class Command(BaseCommand):
+    help = "Перестраивает IVF-индекс чанков из таблицы TextChunk"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--nlist', type=int, default=None, help="Число кластеров (по умолчанию 4*sqrt(N))")
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        with get_vector_index().writing() as index:
+            index.reset()
+
+            batch = []
+            chunks = TextChunk.objects.only('id', 'text_id', 'vector', 'vector_dtype', 'dim').order_by('id')
+            for chunk in chunks.iterator(chunk_size=batch_size):
+                if chunk.vector and chunk.dim:
+                    batch.append(chunk)
+                if len(batch) >= batch_size:
+                    self.add_batch(index, batch)
+                    batch = []
+            self.add_batch(index, batch)
+
+            if len(index):
+                index.train(options['nlist'])
+
+            self.stdout.write(self.style.SUCCESS(f"Indexed {len(index)} chunks in {index.nlist} lists"))
+
+    def add_batch(self, index, chunks):
+        if not chunks:
+            return
+        index.add(
+            [chunk.id for chunk in chunks],
+            [chunk.text_id for chunk in chunks],
+            np.stack([chunk.get_vector() for chunk in chunks]),
+        )
@@ -0,0 +1,34 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from db.api.embedding_job_repository import EmbeddingJobRepository
+from db.utils.embedding_utils import EmbeddingUtils
+
+
+class Command(BaseCommand):
+    help = "Фоновый воркер: считает эмбеддинги текстов из очереди EmbeddingJob"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Обработать очередь и выйти")
+        parser.add_argument('--poll-interval', type=float, default=settings.EMBEDDING_WORKER_POLL_INTERVAL)
+
+    def handle(self, *args, **options):
+        repo = EmbeddingJobRepository()
+        emb_utils = EmbeddingUtils()
+
+        while True:
+            repo.requeue_stale()
+            job = repo.claim_next()
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(options['poll_interval'])
+                continue
+
+            try:
+                repo.run_job(job, emb_utils)
+                self.stdout.write(f"Embedded text {job.text_id} (job {job.id})")
+            except Exception as e:
+                self.stderr.write(f"Job {job.id} for text {job.text_id} failed: {e!r}")
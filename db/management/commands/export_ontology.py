@@ -0,0 +1,45 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from db.api.neo4j_repository import Neo4jRepository
+from db.api.ontology_io import OntologyExporter
+from db.utils.rdf_utils import format_ntriple, format_turtle, rdf_format_for, turtle_prefixes
+
+
+class Command(BaseCommand):
+    help = ("Потоковый экспорт онтологии в N-Triples (.nt), Turtle (.ttl) или CSV "
+            "(каталог с nodes.csv и edges.csv). Uri узлов и имена без схемы получают префикс LOCAL_NAMESPACE, "
+            "который import_ontology снимает обратно")
+
+    def add_arguments(self, parser):
+        parser.add_argument('output')
+        parser.add_argument('--format', choices=['nt', 'turtle', 'csv'], default=None,
+                            help="По умолчанию определяется по расширению; без расширения - csv")
+        parser.add_argument('--page-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        output = options['output']
+        rdf_format = options['format'] or rdf_format_for(output) or 'csv'
+        exporter = OntologyExporter(Neo4jRepository(), options['page_size'])
+
+        if rdf_format == 'csv':
+            os.makedirs(output, exist_ok=True)
+            with open(os.path.join(output, 'nodes.csv'), 'w', encoding='utf-8', newline='') as nodes, \
+                    open(os.path.join(output, 'edges.csv'), 'w', encoding='utf-8', newline='') as edges:
+                stats = exporter.export_csv(nodes, edges)
+            self.stdout.write(self.style.SUCCESS(f"Exported {stats['nodes']} nodes and {stats['edges']} edges"))
+            return
+
+        if rdf_format not in ('nt', 'turtle'):
+            raise CommandError(f"Export to {rdf_format} is not supported, use nt, turtle or csv")
+
+        format_triple = format_ntriple if rdf_format == 'nt' else format_turtle
+        count = 0
+        with open(output, 'w', encoding='utf-8') as f:
+            if rdf_format == 'turtle':
+                f.write(turtle_prefixes())
+            for triple in exporter.iter_triples():
+                f.write(format_triple(triple))
+                count += 1
+        self.stdout.write(self.style.SUCCESS(f"Exported {count} triples"))
@@ -0,0 +1,65 @@
+import json
+import os
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from db.api.text_repository import TextRepository
+
+
+class Command(BaseCommand):
+    help = "Массовый импорт текстов: .jsonl (одна запись на строку) или файлы/каталоги с .txt"
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+')
+        parser.add_argument('--corpus', type=int, help="Корпус для записей без поля corpus")
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--encoding', default='utf-8')
+        parser.add_argument('--build-matrix', action='store_true',
+                            help="После импорта пересобрать матрицу для точного поиска")
+
+    def iter_files(self, paths):
+        for path in paths:
+            if os.path.isdir(path):
+                for root, _, files in os.walk(path):
+                    for name in sorted(files):
+                        yield os.path.join(root, name)
+            elif os.path.exists(path):
+                yield path
+            else:
+                raise CommandError(f"{path} does not exist")
+
+    def iter_records(self, paths, encoding):
+        for path in self.iter_files(paths):
+            if path.endswith('.jsonl'):
+                with open(path, encoding=encoding) as f:
+                    for number, line in enumerate(f, 1):
+                        line = line.strip()
+                        if line:
+                            try:
+                                yield json.loads(line)
+                            except ValueError as e:
+                                raise ValueError(f"{path}:{number}: {e}")
+            elif path.endswith('.txt'):
+                with open(path, encoding=encoding) as f:
+                    yield {
+                        "title": os.path.splitext(os.path.basename(path))[0],
+                        "content": f.read(),
+                    }
+
+    def handle(self, *args, **options):
+        repo = TextRepository()
+        stats = repo.import_texts(
+            self.iter_records(options['paths'], options['encoding']),
+            default_corpus=options['corpus'],
+            batch_size=options['batch_size'],
+        )
+
+        for error in stats["errors"]:
+            self.stderr.write(f"Record {error['line']}: {error['error']}")
+        if stats["aborted"]:
+            raise CommandError(f"Import stopped after {stats['created']} texts")
+        self.stdout.write(self.style.SUCCESS(f"Imported {stats['created']} texts"))
+
+        if options['build_matrix']:
+            call_command('build_chunk_matrix')
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from db.api.class_hierarchy_cache import hierarchy_cache
+from db.api.neo4j_repository import Neo4jRepository
+from db.api.ontology_io import OntologyImporter
+from db.utils.rdf_utils import iter_ntriples, iter_rdflib, rdf_format_for
+
+
+class Command(BaseCommand):
+    help = ("Массовый импорт онтологии: N-Triples (.nt), Turtle (.ttl), RDF/XML (.owl, .rdf) "
+            "или CSV узлов (uri,labels,title,description) и связей (from,rel_type,to). "
+            "Перед импортом выполните neo4j_schema: MERGE по uri опирается на индекс Resource")
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help="CSV узлов указывайте раньше CSV связей")
+        parser.add_argument('--format', choices=['nt', 'turtle', 'xml', 'n3', 'csv'], default=None,
+                            help="По умолчанию определяется по расширению")
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--checkpoint', default=None,
+                            help="Файл прогресса; при повторном запуске импорт продолжится с места остановки")
+        parser.add_argument('--encoding', default='utf-8')
+
+    def handle(self, *args, **options):
+        repo = Neo4jRepository()
+        importer = OntologyImporter(repo, options['batch_size'], options['checkpoint'])
+
+        for path in options['paths']:
+            rdf_format = options['format'] or rdf_format_for(path)
+            if rdf_format is None:
+                raise CommandError(f"Cannot detect format of {path}, use --format")
+
+            try:
+                if rdf_format in ('nt', 'csv'):
+                    with open(path, encoding=options['encoding'], newline='') as f:
+                        if rdf_format == 'nt':
+                            stats = importer.import_triples(iter_ntriples(f), path)
+                        else:
+                            stats = importer.import_csv(f, path)
+                else:
+                    stats = importer.import_triples(iter_rdflib(path, rdf_format), path)
+            except ImportError:
+                raise CommandError("Turtle and RDF/XML import requires rdflib")
+            except (OSError, ValueError) as e:
+                raise CommandError(f"{path}: {e}")
+
+            self.stdout.write(
+                f"{path}: {stats['imported']} imported, {stats['skipped']} skipped"
+                + (f", resumed after {stats['resumed_from']}" if stats['resumed_from'] else "")
+            )
+
+        # иерархия классов могла измениться: воркеры перечитают кэш
+        hierarchy_cache.bump(repo)
+        self.stdout.write(self.style.SUCCESS("Ontology imported"))
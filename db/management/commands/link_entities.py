@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from db.api.entity_link_repository import EntityLinkRepository
+from db.models import Text
+from db.utils.embedding_utils import EmbeddingUtils
+from db.utils.model_registry import registry
+
+
+class Command(BaseCommand):
+    help = "Кодирует классы и объекты онтологии и связывает с ними чанки текстов по сходству эмбеддингов"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--skip-entities', action='store_true',
+                            help="Не перекодировать сущности, использовать текущую матрицу 'entities'")
+        parser.add_argument('--text', type=int, action='append', dest='texts', help="Только указанные тексты")
+        parser.add_argument('--corpus', type=int, help="Только тексты корпуса")
+        parser.add_argument('--k', type=int, default=None)
+        parser.add_argument('--threshold', type=float, default=None)
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--model', default=None,
+                            help="Модель для сущностей; должна совпадать с моделью векторов чанков, "
+                                 "по умолчанию берётся она")
+
+    def handle(self, *args, **options):
+        repo = EntityLinkRepository()
+
+        text_ids = options['texts']
+        if options['corpus'] is not None:
+            corpus_texts = Text.objects.filter(corpus_id=options['corpus']).values_list('id', flat=True)
+            text_ids = (text_ids or []) + list(corpus_texts)
+
+        try:
+            chunk_model = repo.chunk_model(text_ids)
+        except ValueError as e:
+            raise CommandError(str(e))
+        model_name = registry.resolve_name(options['model']) if options['model'] else chunk_model
+        # проверяем до кодирования сущностей, чтобы не тратить на него время впустую
+        if options['model'] and chunk_model and model_name != chunk_model:
+            raise CommandError(f"Chunks are encoded with {chunk_model}, not {model_name}")
+
+        if not options['skip_entities']:
+            stats = repo.embed_entities(EmbeddingUtils(model_name), options['batch_size'])
+            self.stdout.write(
+                f"Entities: {stats['embedded']} embedded, {stats['unchanged']} unchanged, {stats['removed']} removed"
+            )
+
+        try:
+            stats = repo.link_texts(text_ids, options['k'], options['threshold'], options['batch_size'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f"Linked {stats['chunks']} chunks, {stats['links']} links"))
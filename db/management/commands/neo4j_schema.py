@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from neo4j.exceptions import Neo4jError
+
+from db.api.neo4j_repository import Neo4jRepository
+from db.api.neo4j_schema import RELATIONSHIP_TYPES, backfill_resource_label, relationship_types, schema_statements
+
+
+class Command(BaseCommand):
+    help = "Создаёт ограничения уникальности и индексы Neo4j для uri, id связей и полнотекстового поиска"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all-rel-types', action='store_true',
+                            help="Индексировать id для всех типов связей, найденных в базе")
+        parser.add_argument('--batch-size', type=int, default=10000,
+                            help="Размер транзакции при проставлении метки Resource")
+
+    def handle(self, *args, **options):
+        repo = Neo4jRepository()
+        with repo.session() as session:
+            # метку Resource ставим до ограничений, иначе дубликаты uri всплывут позже
+            labeled = backfill_resource_label(session, options['batch_size'])
+            self.stdout.write(f"Resource label added to {labeled} nodes")
+
+            rel_types = list(RELATIONSHIP_TYPES)
+            if options['all_rel_types']:
+                rel_types += [t for t in relationship_types(session) if t not in rel_types]
+
+            for statement in schema_statements(rel_types):
+                try:
+                    session.run(statement).consume()
+                    self.stdout.write(statement)
+                except Neo4jError as e:
+                    self.stderr.write(f"Failed: {statement}\n  {e.message}")
+
+            session.run("CALL db.awaitIndexes()").consume()
+        self.stdout.write(self.style.SUCCESS("Schema is up to date"))
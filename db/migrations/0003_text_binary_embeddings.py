@@ -0,0 +1,79 @@
+import json
+
+import numpy as np
+from django.db import migrations, models
+
+
+def json_to_binary(apps, schema_editor):
+    Text = apps.get_model('db', 'Text')
+    for text in Text.objects.only('id', 'embeddings').iterator():
+        vectors = np.asarray(json.loads(text.embeddings or '[]'), dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors.reshape(1, -1) if vectors.size else vectors.reshape(0, 0)
+
+        rows, dim = vectors.shape
+        Text.objects.filter(pk=text.pk).update(
+            embeddings_data=vectors.tobytes() if rows else None,
+            embeddings_dtype='float32',
+            embeddings_rows=rows,
+            embeddings_dim=dim,
+        )
+
+
+def binary_to_json(apps, schema_editor):
+    Text = apps.get_model('db', 'Text')
+    fields = ('id', 'embeddings_data', 'embeddings_dtype', 'embeddings_rows', 'embeddings_dim')
+    for text in Text.objects.only(*fields).iterator():
+        if text.embeddings_data and text.embeddings_rows:
+            vectors = np.frombuffer(text.embeddings_data, dtype=text.embeddings_dtype)
+            vectors = vectors.reshape(text.embeddings_rows, text.embeddings_dim).astype(np.float32)
+            data = json.dumps(vectors.tolist())
+        else:
+            data = '[]'
+        Text.objects.filter(pk=text.pk).update(embeddings=data)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('db', '0002_text_embeddings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='text',
+            name='embeddings_data',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='text',
+            name='embeddings_dtype',
+            field=models.CharField(default='float32', max_length=8),
+        ),
+        migrations.AddField(
+            model_name='text',
+            name='embeddings_rows',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='text',
+            name='embeddings_dim',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(json_to_binary, binary_to_json),
+        # default нужен, чтобы откат RemoveField мог вернуть колонку на непустую таблицу
+        migrations.AlterField(
+            model_name='text',
+            name='embeddings',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.RemoveField(
+            model_name='text',
+            name='embeddings',
+        ),
+        migrations.RenameField(
+            model_name='text',
+            old_name='embeddings_data',
+            new_name='embeddings',
+        ),
+    ]
@@ -0,0 +1,76 @@
+import hashlib
+import re
+
+import numpy as np
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def paragraph_spans(content):
+    spans = []
+    offset = 0
+    for paragraph in content.split('\n'):
+        stripped = paragraph.strip()
+        if stripped:
+            start = offset + paragraph.index(stripped)
+            spans.append((start, start + len(stripped), stripped))
+        offset += len(paragraph) + 1
+    return spans
+
+
+def backfill_chunks(apps, schema_editor):
+    # Строки Text.embeddings идут в порядке абзацев content, поэтому
+    # чанки восстанавливаются без повторного кодирования
+    Text = apps.get_model('db', 'Text')
+    TextChunk = apps.get_model('db', 'TextChunk')
+
+    fields = ('id', 'content', 'embeddings', 'embeddings_dtype', 'embeddings_rows', 'embeddings_dim')
+    for text in Text.objects.only(*fields).iterator():
+        spans = paragraph_spans(text.content or '')
+        if not text.embeddings or len(spans) != text.embeddings_rows:
+            continue
+
+        vectors = np.frombuffer(text.embeddings, dtype=text.embeddings_dtype)
+        vectors = vectors.reshape(text.embeddings_rows, text.embeddings_dim)
+        TextChunk.objects.bulk_create([
+            TextChunk(
+                text_id=text.id,
+                ordinal=ordinal,
+                char_start=start,
+                char_end=end,
+                content_hash=hashlib.sha1(re.sub(r'\s+', ' ', chunk).strip().encode('utf-8')).hexdigest(),
+                vector=vectors[ordinal].tobytes(),
+                vector_dtype=text.embeddings_dtype,
+                dim=text.embeddings_dim,
+            )
+            for ordinal, (start, end, chunk) in enumerate(spans)
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('db', '0003_text_binary_embeddings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TextChunk',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ordinal', models.PositiveIntegerField()),
+                ('char_start', models.PositiveIntegerField()),
+                ('char_end', models.PositiveIntegerField()),
+                ('content_hash', models.CharField(db_index=True, max_length=40)),
+                ('vector', models.BinaryField(blank=True, null=True)),
+                ('vector_dtype', models.CharField(default='float32', max_length=8)),
+                ('dim', models.PositiveIntegerField(default=0)),
+                ('text', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='db.Text')),
+            ],
+            options={
+                'ordering': ('text', 'ordinal'),
+                'unique_together': {('text', 'ordinal')},
+            },
+        ),
+        migrations.RunPython(backfill_chunks, migrations.RunPython.noop),
+    ]
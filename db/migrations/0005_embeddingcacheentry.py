@@ -0,0 +1,27 @@
+# Generated by Django 3.0.3 on 2026-10-18 08:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('db', '0004_textchunk'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmbeddingCacheEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_name', models.CharField(max_length=255)),
+                ('chunk_hash', models.CharField(max_length=40)),
+                ('vector', models.BinaryField()),
+                ('vector_dtype', models.CharField(default='float32', max_length=8)),
+                ('dim', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('model_name', 'chunk_hash')},
+            },
+        ),
+    ]
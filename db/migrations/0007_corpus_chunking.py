@@ -0,0 +1,18 @@
+# Generated by Django 3.0.3 on 2026-10-18 08:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('db', '0006_embedding_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='corpus',
+            name='chunking',
+            field=models.TextField(blank=True, null=True),
+        ),
+    ]
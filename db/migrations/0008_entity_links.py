@@ -0,0 +1,42 @@
+# Generated by Django 3.0.3 on 2026-10-18 08:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('db', '0007_corpus_chunking'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EntityEmbedding',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entity_uri', models.CharField(max_length=255, unique=True)),
+                ('label', models.CharField(max_length=32)),
+                ('title', models.CharField(blank=True, max_length=255, null=True)),
+                ('content_hash', models.CharField(max_length=40)),
+                ('model_name', models.CharField(max_length=255)),
+                ('vector', models.BinaryField()),
+                ('vector_dtype', models.CharField(default='float32', max_length=8)),
+                ('dim', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TextEntityLink',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entity_uri', models.CharField(db_index=True, max_length=255)),
+                ('score', models.FloatField()),
+                ('chunk', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entity_links', to='db.TextChunk')),
+                ('text', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entity_links', to='db.Text')),
+            ],
+            options={
+                'ordering': ('chunk', '-score'),
+                'unique_together': {('chunk', 'entity_uri')},
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 3.0.3 on 2026-10-18 08:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('db', '0008_entity_links'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TextAlignment',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_signature', models.CharField(max_length=40)),
+                ('target_signature', models.CharField(max_length=40)),
+                ('beads', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now=True)),
+                ('source', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alignments', to='db.Text')),
+                ('target', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='db.Text')),
+            ],
+            options={
+                'unique_together': {('source', 'target')},
+            },
+        ),
+    ]
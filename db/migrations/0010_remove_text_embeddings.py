@@ -0,0 +1,28 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # векторы абзацев живут в TextChunk.vector, копия на Text больше не нужна
+
+    dependencies = [
+        ('db', '0009_text_alignment'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='text',
+            name='embeddings',
+        ),
+        migrations.RemoveField(
+            model_name='text',
+            name='embeddings_dim',
+        ),
+        migrations.RemoveField(
+            model_name='text',
+            name='embeddings_dtype',
+        ),
+        migrations.RemoveField(
+            model_name='text',
+            name='embeddings_rows',
+        ),
+    ]
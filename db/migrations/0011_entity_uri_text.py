@@ -0,0 +1,23 @@
+# Generated by Django 3.0.3 on 2026-10-18 09:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('db', '0010_remove_text_embeddings'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='entityembedding',
+            name='entity_uri',
+            field=models.TextField(unique=True),
+        ),
+        migrations.AlterField(
+            model_name='textentitylink',
+            name='entity_uri',
+            field=models.TextField(db_index=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.0.3 on 2026-10-18 09:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('db', '0011_entity_uri_text'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='textchunk',
+            name='model_name',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+    ]
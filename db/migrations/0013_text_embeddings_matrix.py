@@ -0,0 +1,56 @@
+from itertools import groupby
+
+from django.db import migrations, models
+
+
+def backfill_embeddings(apps, schema_editor):
+    # 0010 удалила матрицу текста; собираем её заново из векторов чанков без повторного кодирования
+    Text = apps.get_model('db', 'Text')
+    TextChunk = apps.get_model('db', 'TextChunk')
+
+    chunks = TextChunk.objects.exclude(vector=None).filter(dim__gt=0) \
+        .only('text_id', 'vector', 'vector_dtype', 'dim').order_by('text_id', 'ordinal')
+    for text_id, text_chunks in groupby(chunks.iterator(), key=lambda chunk: chunk.text_id):
+        text_chunks = list(text_chunks)
+        first = text_chunks[0]
+        # матрица однородна: тексты со смешанными dtype/размерностью оставляем без неё
+        if any(chunk.vector_dtype != first.vector_dtype or chunk.dim != first.dim for chunk in text_chunks):
+            continue
+        Text.objects.filter(pk=text_id).update(
+            embeddings=b''.join(bytes(chunk.vector) for chunk in text_chunks),
+            embeddings_dtype=first.vector_dtype,
+            embeddings_rows=len(text_chunks),
+            embeddings_dim=first.dim,
+        )
+
+
+class Migration(migrations.Migration):
+    # возвращает матрицу эмбеддингов текста: её читают индексация и выравнивание
+
+    dependencies = [
+        ('db', '0012_textchunk_model_name'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='text',
+            name='embeddings',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='text',
+            name='embeddings_dim',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='text',
+            name='embeddings_dtype',
+            field=models.CharField(default='float32', max_length=8),
+        ),
+        migrations.AddField(
+            model_name='text',
+            name='embeddings_rows',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_embeddings, migrations.RunPython.noop),
+    ]
@@ -1,20 +1,46 @@
+import json
+
 from django.db import models
 
+from db.utils.vector_utils import pack_vectors, unpack_vectors
+
 
 class Corpus(models.Model):
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True, null=True)
     genre = models.CharField(max_length=100)
+    # JSON с настройками разбиения на чанки, см. TEXT_CHUNKING
+    chunking = models.TextField(blank=True, null=True)
 
     def __str__(self):
         return self.title
 
+    def get_chunking(self):
+        return json.loads(self.chunking) if self.chunking else None
+
 
 class Text(models.Model):
+    EMBEDDING_PENDING = 'pending'
+    EMBEDDING_PROCESSING = 'processing'
+    EMBEDDING_READY = 'ready'
+    EMBEDDING_FAILED = 'failed'
+    EMBEDDING_STATUS_CHOICES = (
+        (EMBEDDING_PENDING, 'Pending'),
+        (EMBEDDING_PROCESSING, 'Processing'),
+        (EMBEDDING_READY, 'Ready'),
+        (EMBEDDING_FAILED, 'Failed'),
+    )
+
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True, null=True)
     content = models.TextField()  # Поле с самим текстом
-    embeddings = models.TextField()
+    # Матрица эмбеддингов абзацев: сырые байты float32/float16 + форма; строка i - вектор чанка с ordinal i
+    embeddings = models.BinaryField(blank=True, null=True)
+    embeddings_dtype = models.CharField(max_length=8, default='float32')
+    embeddings_rows = models.PositiveIntegerField(default=0)
+    embeddings_dim = models.PositiveIntegerField(default=0)
+    embedding_status = models.CharField(max_length=16, choices=EMBEDDING_STATUS_CHOICES, default=EMBEDDING_READY)
+    embedded_at = models.DateTimeField(blank=True, null=True)
     corpus = models.ForeignKey(
         Corpus,
         on_delete=models.CASCADE,
@@ -30,3 +56,161 @@ class Text(models.Model):
 
     def __str__(self):
         return self.title
+
+    def get_embeddings(self):
+        return unpack_vectors(self.embeddings, self.embeddings_rows, self.embeddings_dim, self.embeddings_dtype)
+
+    def set_embeddings(self, vectors, dtype='float32'):
+        self.embeddings, self.embeddings_rows, self.embeddings_dim = pack_vectors(vectors, dtype)
+        self.embeddings_dtype = dtype
+
+
+class TextChunk(models.Model):
+    text = models.ForeignKey(
+        Text,
+        on_delete=models.CASCADE,
+        related_name='chunks'
+    )
+    ordinal = models.PositiveIntegerField()
+    char_start = models.PositiveIntegerField()
+    char_end = models.PositiveIntegerField()
+    content_hash = models.CharField(max_length=40, db_index=True)
+    # модель, которой посчитан vector; пусто у чанков, закодированных до появления поля
+    model_name = models.CharField(max_length=255, blank=True, default='')
+    vector = models.BinaryField(blank=True, null=True)
+    vector_dtype = models.CharField(max_length=8, default='float32')
+    dim = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ('text', 'ordinal')
+        unique_together = ('text', 'ordinal')
+
+    def __str__(self):
+        return f"{self.text_id}:{self.ordinal}"
+
+    def get_vector(self):
+        return unpack_vectors(self.vector, 1, self.dim, self.vector_dtype)[0]
+
+    def set_vector(self, vector, dtype='float32'):
+        self.vector, _, self.dim = pack_vectors(vector, dtype)
+        self.vector_dtype = dtype
+
+
+class EmbeddingJob(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+
+    text = models.ForeignKey(
+        Text,
+        on_delete=models.CASCADE,
+        related_name='embedding_jobs'
+    )
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ('id',)
+        indexes = [
+            models.Index(fields=['status', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.text_id}:{self.status}"
+
+
+class EmbeddingCacheEntry(models.Model):
+    model_name = models.CharField(max_length=255)
+    chunk_hash = models.CharField(max_length=40)
+    vector = models.BinaryField()
+    vector_dtype = models.CharField(max_length=8, default='float32')
+    dim = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('model_name', 'chunk_hash')
+
+    def __str__(self):
+        return f"{self.model_name}:{self.chunk_hash}"
+
+    def get_vector(self):
+        return unpack_vectors(self.vector, 1, self.dim, self.vector_dtype)[0]
+
+
+class EntityEmbedding(models.Model):
+    # вектор названия и описания класса или объекта онтологии из Neo4j
+    # IRI импортированных онтологий бывают длиннее 255 символов
+    entity_uri = models.TextField(unique=True)
+    label = models.CharField(max_length=32)
+    title = models.CharField(max_length=255, blank=True, null=True)
+    content_hash = models.CharField(max_length=40)
+    model_name = models.CharField(max_length=255)
+    vector = models.BinaryField()
+    vector_dtype = models.CharField(max_length=8, default='float32')
+    dim = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return self.entity_uri
+
+    def get_vector(self):
+        return unpack_vectors(self.vector, 1, self.dim, self.vector_dtype)[0]
+
+    def set_vector(self, vector, dtype='float32'):
+        self.vector, _, self.dim = pack_vectors(vector, dtype)
+        self.vector_dtype = dtype
+
+
+class TextEntityLink(models.Model):
+    text = models.ForeignKey(
+        Text,
+        on_delete=models.CASCADE,
+        related_name='entity_links'
+    )
+    chunk = models.ForeignKey(
+        TextChunk,
+        on_delete=models.CASCADE,
+        related_name='entity_links'
+    )
+    entity_uri = models.TextField(db_index=True)
+    score = models.FloatField()
+
+    class Meta:
+        ordering = ('chunk', '-score')
+        unique_together = ('chunk', 'entity_uri')
+
+    def __str__(self):
+        return f"{self.chunk_id}:{self.entity_uri}"
+
+
+class TextAlignment(models.Model):
+    # выравнивание чанков текста и его перевода; подписи - хэш содержимого чанков на момент расчёта
+    source = models.ForeignKey(
+        Text,
+        on_delete=models.CASCADE,
+        related_name='alignments'
+    )
+    target = models.ForeignKey(
+        Text,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    source_signature = models.CharField(max_length=40)
+    target_signature = models.CharField(max_length=40)
+    beads = models.TextField()
+    created_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('source', 'target')
+
+    def __str__(self):
+        return f"{self.source_id}->{self.target_id}"
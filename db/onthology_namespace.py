@@ -27,5 +27,22 @@ IS_TRANSLATION_OF = "http://erlangen-crm.org/current/P73i_is_translation_of"
 HAS_COMMENTARY = "http://erlangen-crm.org/current/R_131_has_extra_materials"
 
 RESOURCE_NAMESPACE = "http://erlangen-crm.org/current"
+# IRI для uri узлов и имён связей/свойств, которые заведены через API и сами не являются IRI
+LOCAL_NAMESPACE = "urn:x-local:"
 
 RDF_TYPE = "http://www.w3.org/1999/02/22-rdf-syntax-ns#type"
+RDFS_CLASS = "http://www.w3.org/2000/01/rdf-schema#Class"
+COMMENT = "http://www.w3.org/2000/01/rdf-schema#comment"
+
+XSD_BOOLEAN = "http://www.w3.org/2001/XMLSchema#boolean"
+XSD_INTEGER = "http://www.w3.org/2001/XMLSchema#integer"
+XSD_DOUBLE = "http://www.w3.org/2001/XMLSchema#double"
+
+# префиксы для имён типов связей вида rdf__type и для экспорта в Turtle
+PREFIXES = {
+    "rdf": "http://www.w3.org/1999/02/22-rdf-syntax-ns#",
+    "rdfs": "http://www.w3.org/2000/01/rdf-schema#",
+    "owl": "http://www.w3.org/2002/07/owl#",
+    "xsd": "http://www.w3.org/2001/XMLSchema#",
+    "crm": RESOURCE_NAMESPACE + "/",
+}
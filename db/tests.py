@@ -1,3 +1,380 @@
-from django.test import TestCase
+import io
+import os
+import shutil
+import tempfile
+import time
 
-# Create your tests here.
+import numpy as np
+from django.test import SimpleTestCase, override_settings
+
+from db.api.class_hierarchy_cache import ClassHierarchyCache, build_closure
+from db.api.ontology_io import OntologyExporter, OntologyImporter
+from db.api.ontology_repository import fulltext_query, search_params
+from db.onthology_namespace import CLASS, RDF_TYPE, TITLE, XSD_INTEGER
+from db.utils.alignment import align
+from db.utils.chunking import ChunkingConfig, make_chunker
+from db.utils.rdf_utils import Triple, format_ntriple, iter_ntriples
+from db.utils.vector_index import IVFIndex
+from db.utils.vector_matrix import VectorMatrix
+
+
+def random_vectors(count, dim=16, seed=0):
+    return np.random.default_rng(seed).normal(size=(count, dim)).astype(np.float32)
+
+
+@override_settings(VECTOR_INDEX_TRAIN_SIZE=200, VECTOR_INDEX_NPROBE=4, VECTOR_INDEX_COMPACT_SIZE=10000)
+class IVFIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def make_index(self):
+        index = IVFIndex('chunks', self.directory)
+        index.refresh()
+        return index
+
+    def fill(self, index, texts, per_text=10, seed=0):
+        vectors = random_vectors(texts * per_text, seed=seed)
+        with index.writing() as writer:
+            for text_id in range(texts):
+                rows = slice(text_id * per_text, (text_id + 1) * per_text)
+                writer.upsert_text(text_id, range(rows.start, rows.stop), vectors[rows])
+        return vectors
+
+    def test_trains_only_after_threshold(self):
+        index = self.make_index()
+        self.fill(index, 19)
+        self.assertFalse(index.is_trained)
+        self.assertEqual(len(index), 190)
+
+        self.fill(index, 21)
+        self.assertTrue(index.is_trained)
+        self.assertGreater(index.nlist, 1)
+        self.assertEqual(len(index), 210)
+
+    def test_add_is_visible_to_other_workers(self):
+        vectors = self.fill(self.make_index(), 5)
+        other = self.make_index()
+        hits = other.search(vectors[12], k=1)
+        self.assertEqual(hits[0][:2], (12, 1))
+
+        writer = self.make_index()
+        with writer.writing() as index:
+            index.add([100, 101], [7, 7], vectors[:2] * -1)
+        self.assertEqual(other.search(-vectors[1], k=1)[0][:2], (101, 7))
+        self.assertEqual(len(other), 52)
+
+    def test_remove_and_upsert_replace_text_chunks(self):
+        index = self.make_index()
+        vectors = self.fill(index, 30)
+        self.assertTrue(index.is_trained)
+
+        with index.writing() as writer:
+            writer.remove_text(3)
+            writer.upsert_text(4, [900], vectors[:1])
+
+        other = self.make_index()
+        for reader in (index, other):
+            self.assertEqual(len(reader), 281)
+            found = {text_id for _, text_id, _ in reader.search(vectors[35], k=300, nprobe=reader.nlist)}
+            self.assertNotIn(3, found)
+            self.assertEqual([hit[0] for hit in reader.search(vectors[0], k=5, allowed_text_ids=[4])], [900])
+
+    def test_compaction_keeps_contents(self):
+        index = self.make_index()
+        vectors = self.fill(index, 30)
+        with override_settings(VECTOR_INDEX_COMPACT_SIZE=5):
+            generation = index.generation
+            with index.writing() as writer:
+                writer.remove_text(0)
+            self.assertNotEqual(index.generation, generation)
+            self.assertEqual(index.delta_size, 0)
+
+        other = self.make_index()
+        self.assertEqual(len(other), 290)
+        self.assertEqual(other.search(vectors[15], k=1)[0][:2], (15, 1))
+        self.assertEqual(other.search(vectors[5], k=1, allowed_text_ids=[0]), [])
+
+    def test_nprobe_recall(self):
+        index = self.make_index()
+        vectors = self.fill(index, 100)
+        queries = random_vectors(20, seed=1)
+        normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+        recall = []
+        for query in queries:
+            exact = set(np.argsort(-(normalized @ query))[:10])
+            found = {chunk_id for chunk_id, _, _ in index.search(query, k=10, nprobe=index.nlist // 2)}
+            recall.append(len(exact & found) / 10)
+        self.assertGreaterEqual(np.mean(recall), 0.7)
+
+        full = {chunk_id for chunk_id, _, _ in index.search(queries[0], k=10, nprobe=index.nlist)}
+        self.assertEqual(full, set(np.argsort(-(normalized @ queries[0]))[:10]))
+
+
+class VectorMatrixTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def build(self, matrix, vectors):
+        return matrix.build(((i, i, vector) for i, vector in enumerate(vectors)), len(vectors), vectors.shape[1])
+
+    def test_index_writes_make_matrix_stale(self):
+        matrix = VectorMatrix('chunks', self.directory)
+        self.assertFalse(matrix.is_fresh())
+
+        vectors = random_vectors(20)
+        self.build(matrix, vectors)
+        self.assertTrue(matrix.is_fresh())
+        self.assertEqual(matrix.search(vectors[3], k=1)[0][0], 3)
+
+        matrix.mark_dirty()
+        self.assertFalse(VectorMatrix('chunks', self.directory).is_fresh())
+        # отметки в один тик часов ФС со сборкой считаются сделанными во время сборки
+        time.sleep(0.05)
+        self.build(matrix, vectors)
+        self.assertTrue(matrix.is_fresh())
+
+    def test_build_keeps_previous_generation(self):
+        matrix = VectorMatrix('chunks', self.directory)
+        generations = []
+        for seed in range(3):
+            self.build(matrix, random_vectors(5, seed=seed))
+            generations.append(matrix.generation)
+
+        vector_files = sorted(name for name in os.listdir(self.directory) if name.endswith('.vectors.npy'))
+        self.assertEqual(vector_files, sorted(f'chunks.{generation}.vectors.npy' for generation in generations[1:]))
+
+
+class NTriplesTests(SimpleTestCase):
+    def parse(self, text):
+        return list(iter_ntriples(io.StringIO(text)))
+
+    def test_escapes(self):
+        [triple] = self.parse(r'<http://x/a> <http://x/p> "line\nquote\" tab\t \u00e9 \U0001F600 \\" .' + "\n")
+        self.assertEqual(triple.object, 'line\nquote" tab\t \u00e9 \U0001F600 \\')
+        self.assertTrue(triple.literal)
+
+    def test_blank_nodes_and_comments(self):
+        triples = self.parse(
+            "# комментарий\n"
+            "\n"
+            "_:b0 <http://x/p> _:b1 .\n"
+            "<http://x/a> <http://x/p> _:b0 . # хвост\n"
+        )
+        self.assertEqual(triples, [
+            Triple("_:b0", "http://x/p", "_:b1"),
+            Triple("http://x/a", "http://x/p", "_:b0"),
+        ])
+
+    def test_typed_and_language_literals(self):
+        triples = self.parse(
+            '<http://x/a> <http://x/n> "42"^^<http://www.w3.org/2001/XMLSchema#integer> .\n'
+            '<http://x/a> <http://x/l> "Человек"@ru .\n'
+            '<http://x/a> <http://x/l> "Person"@en-GB .\n'
+        )
+        self.assertEqual([(t.object, t.language, t.datatype) for t in triples], [
+            ("42", None, XSD_INTEGER),
+            ("Человек", "ru", None),
+            ("Person", "en-GB", None),
+        ])
+
+    def test_malformed_line(self):
+        with self.assertRaisesMessage(ValueError, "Line 2"):
+            self.parse('<http://x/a> <http://x/p> <http://x/b> .\n<http://x/a> "p" <http://x/b> .\n')
+
+    def test_format_round_trip(self):
+        triple = Triple("http://x/a", "http://x/p", 'a "b"\nc', True, "ru")
+        self.assertEqual(self.parse(format_ntriple(triple)), [triple])
+
+
+class OntologyRoundTripTests(SimpleTestCase):
+    def test_export_import_keeps_uris_predicates_and_literals(self):
+        node = {
+            "uri": "8f3a0c1e-0000-4000-8000-000000000001",
+            "labels": ["Resource", "Class"],
+            "props": {
+                "uri": "8f3a0c1e-0000-4000-8000-000000000001",
+                "title": "Person",
+                "title@ru": "Человек",
+                "alias": ["A", "B"],
+                "count": 3,
+                "http://x/flag": True,
+            },
+            "arcs": [
+                {"rel_type": "SUBCLASS_OF", "to": "http://erlangen-crm.org/current/E21_Person"},
+                {"rel_type": "http://x/knows", "to": "8f3a0c1e-0000-4000-8000-000000000002"},
+                {"rel_type": "related", "to": "http://x/b"},
+            ],
+        }
+        text = "".join(format_ntriple(t) for t in OntologyExporter(None).node_triples(node))
+        self.assertIn(f"<{RDF_TYPE}> <{CLASS}>", text)
+        self.assertIn(f'<{TITLE}> "Человек"@ru', text)
+        self.assertIn(f'"3"^^<{XSD_INTEGER}>', text)
+        self.assertIn("<http://x/knows>", text)
+
+        importer = OntologyImporter(None)
+        for triple in iter_ntriples(io.StringIO(text)):
+            importer.add_triple(triple)
+        writer = importer.writer
+
+        self.assertEqual(writer.labels, {"Class": {node["uri"]}})
+        self.assertEqual(writer.merge_props({}, writer.props[node["uri"]]),
+                         {key: value for key, value in node["props"].items() if key != "uri"})
+        self.assertEqual(
+            {(rel_type, a, b) for rel_type, pairs in writer.edges.items() for a, b in pairs},
+            {(arc["rel_type"], node["uri"], arc["to"]) for arc in node["arcs"]},
+        )
+
+    def test_language_only_title_is_copied_and_not_exported_twice(self):
+        importer = OntologyImporter(None)
+        importer.add_triple(Triple("http://x/a", TITLE, "Personne", True, "fr"))
+        importer.add_triple(Triple("http://x/a", TITLE, "Person", True, "en"))
+        props = importer.writer.merge_props({}, importer.writer.props["http://x/a"])
+        self.assertEqual(props, {"title": "Personne", "title@fr": "Personne", "title@en": "Person"})
+
+        triples = list(OntologyExporter(None).node_triples({"uri": "http://x/a", "labels": [], "props": props,
+                                                             "arcs": []}))
+        self.assertEqual(sorted((t.object, t.language) for t in triples), [("Person", "en"), ("Personne", "fr")])
+
+
+@override_settings(TEXT_CHUNKING={'strategy': 'paragraph', 'min_tokens': 0, 'max_tokens': None, 'overlap': 0})
+class ChunkingTests(SimpleTestCase):
+    def split(self, text, **options):
+        chunker = make_chunker(ChunkingConfig.from_dict(options))
+        chunks, counts = chunker.split_counted(text)
+        for start, end, chunk in chunks:
+            self.assertEqual(text[start:end], chunk)
+        return [chunk for _, _, chunk in chunks], counts
+
+    def test_config_validation(self):
+        self.assertEqual(ChunkingConfig.from_dict(None), ChunkingConfig(overlap=0))
+        for options in ({"size": 10}, {"strategy": "word"}, {"min_tokens": -1}, {"max_tokens": 0},
+                        {"max_tokens": True}, {"overlap": 1.5}, {"max_tokens": 4, "overlap": 4}):
+            with self.assertRaises(ValueError, msg=options):
+                ChunkingConfig.from_dict(options)
+
+    def test_paragraphs(self):
+        text = "  один два\n\nтри четыре пять\n"
+        self.assertEqual(self.split(text), (["один два", "три четыре пять"], [2, 3]))
+        # короткие абзацы склеиваются до min_tokens
+        self.assertEqual(self.split("а\nб\nв г", min_tokens=2), (["а\nб", "в г"], [2, 2]))
+
+    def test_sentences_are_packed_up_to_max_tokens(self):
+        text = "Раз два. Три четыре! Пять шесть? Семь"
+        chunks, counts = self.split(text, strategy="sentence", max_tokens=4)
+        self.assertEqual(chunks, ["Раз два. Три четыре!", "Пять шесть? Семь"])
+        self.assertEqual(counts, [4, 3])
+
+    def test_window_overlap(self):
+        text = " ".join(str(i) for i in range(10))
+        chunks, counts = self.split(text, strategy="window", max_tokens=4, overlap=1)
+        self.assertEqual(chunks, ["0 1 2 3", "3 4 5 6", "6 7 8 9"])
+        self.assertEqual(counts, [4, 4, 4])
+
+    def test_long_paragraph_is_windowed(self):
+        chunks, _ = self.split("a b c d e\nf", max_tokens=3)
+        self.assertEqual(chunks, ["a b c", "d e", "f"])
+
+    def test_empty_text(self):
+        self.assertEqual(self.split(" \n "), ([], []))
+
+
+class FakeHierarchyRepository:
+    def __init__(self, parents):
+        self.parents = parents
+
+    def run_custom_query(self, query, params=None):
+        return [{"uri": uri, "title": uri, "description": "", "labels": ["Class"], "parents": list(items)}
+                for uri, items in self.parents.items()]
+
+
+class ClassHierarchyCacheTests(SimpleTestCase):
+    def test_closure_of_diamond(self):
+        ancestors = build_closure({"a": (), "b": ("a",), "c": ("a",), "d": ("b", "c")})
+        self.assertEqual(ancestors, {"a": set(), "b": {"a"}, "c": {"a"}, "d": {"a", "b", "c"}})
+
+    def test_closure_survives_cycles_and_deep_chains(self):
+        ancestors = build_closure({"a": ("b",), "b": ("a",)})
+        self.assertEqual(ancestors, {"a": {"b"}, "b": {"a"}})
+
+        chain = {str(i): (str(i - 1),) if i else () for i in range(3000)}
+        self.assertEqual(len(build_closure(chain)["2999"]), 2999)
+
+    def test_add_parent_matches_full_rebuild(self):
+        cache = ClassHierarchyCache()
+        cache.load(FakeHierarchyRepository({"root": (), "a": ("root",), "x": (), "y": ("x",), "z": ("y",)}), version=1)
+
+        cache.add_parent("x", "a")
+
+        self.assertEqual(cache.ancestors, build_closure(cache.parents))
+        self.assertEqual(cache.ancestors["z"], {"y", "x", "a", "root"})
+        self.assertEqual(set(cache.get_descendant_uris("root")), {"a", "x", "y", "z"})
+        self.assertEqual([c["uri"] for c in cache.get_subtree("a")["children"]], ["x"])
+        self.assertEqual(cache.get_subtree("a", max_depth=1)["children"][0]["children"], [])
+
+    def test_add_parent_is_ignored_until_loaded(self):
+        cache = ClassHierarchyCache()
+        cache.add_parent("x", "a")
+        self.assertEqual(cache.parents, {})
+
+
+class FulltextQueryTests(SimpleTestCase):
+    def test_modes(self):
+        self.assertEqual(fulltext_query("Красный Кот"), "title:(красный AND кот*)^3 OR description:(красный AND кот*)")
+        self.assertEqual(fulltext_query("кот", "fuzzy"), "title:(кот~)^3 OR description:(кот~)")
+        self.assertEqual(fulltext_query("красный кот", "exact"),
+                         'title:("красный кот")^3 OR description:("красный кот")')
+
+    def test_lucene_syntax_is_escaped(self):
+        query = fulltext_query('a+b (c) "d" e:f x\\y 1/2 -g* OR', "exact")
+        self.assertEqual(query.split(")^3")[0],
+                         'title:("a\\+b \\(c\\) \\"d\\" e\\:f x\\\\y 1\\/2 \\-g\\* or"')
+
+    def test_blank_text(self):
+        self.assertIsNone(fulltext_query("  "))
+        self.assertIsNone(search_params("", "prefix", None, 10))
+
+    def test_label_filter_fetches_extra_candidates(self):
+        self.assertEqual(search_params("кот", "prefix", ["Class"], 10)["fetch"], 50)
+        self.assertEqual(search_params("кот", "prefix", [], 10)["labels"], None)
+
+
+def unit(*rows):
+    vectors = np.array(rows, dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+class AlignmentTests(SimpleTestCase):
+    def setUp(self):
+        self.basis = np.eye(8, dtype=np.float32)
+
+    def pairs(self, beads):
+        return [(sources, targets) for sources, targets, _ in beads]
+
+    def test_one_to_one(self):
+        beads = align(self.basis[:4], self.basis[:4])
+        self.assertEqual(self.pairs(beads), [([i], [i]) for i in range(4)])
+        self.assertTrue(all(abs(similarity - 1) < 1e-5 for _, _, similarity in beads))
+
+    def test_merges(self):
+        e = self.basis
+        # два предложения источника переведены одним, затем одно - двумя
+        source = unit(e[0], e[1], e[2], e[3] + e[4])
+        target = unit(e[0] + e[1], e[2], e[3], e[4])
+        beads = align(source, target)
+        self.assertEqual(self.pairs(beads), [([0, 1], [0]), ([2], [1]), ([3], [2, 3])])
+        self.assertAlmostEqual(beads[0][2], 1.0, places=5)
+        self.assertAlmostEqual(beads[2][2], 1.0, places=5)
+
+    def test_unmatched_chunks_are_skipped(self):
+        e = self.basis
+        beads = align(unit(e[0], e[1]), unit(e[0], e[5], e[1]))
+        self.assertEqual(self.pairs(beads), [([0], [0]), ([], [1]), ([1], [2])])
+        beads = align(unit(e[0], e[6], e[1]), unit(e[0], e[1]))
+        self.assertEqual(self.pairs(beads), [([0], [0]), ([1], []), ([2], [1])])
+
+    def test_empty_side(self):
+        self.assertEqual(self.pairs(align(self.basis[:2], self.basis[:0])), [([0], []), ([1], [])])
+        self.assertEqual(self.pairs(align(self.basis[:0], self.basis[:1])), [([], [0])])
@@ -1,5 +1,5 @@
 from django.urls import path
-from db.views import views, ontology_views
+from db.views import views, ontology_views, ontology_async_views
 from db.views import embedding_views
 
 urlpatterns = [
@@ -11,18 +11,28 @@ urlpatterns = [
 
     # text
     path('api/text/get/', views.getText),
+    path('api/text/chunks/', views.getTextChunks),
+    path('api/text/entities/', views.getTextEntities),
+    path('api/text/alignment/', views.getTextAlignment),
+    path('api/text/embedding_status/', views.getTextEmbeddingStatus),
     path('api/text/create/', views.createText),
+    path('api/text/import/', views.importTexts),
     path('api/text/update/', views.updateCorpus),
     path('api/text/delete/', views.deleteText),
 
     # Ontology
-    path('api/ontology/get/', ontology_views.get_ontology),
+    path('api/ontology/get/', ontology_async_views.get_ontology),
     path('api/ontology/parents/', ontology_views.get_ontology_parent_classes),
+    path('api/ontology/search/', ontology_async_views.search),
 
     # Class
-    path('api/class/get/', ontology_views.get_class),
+    path('api/class/get/', ontology_async_views.get_class),
+    path('api/class/get/batch/', ontology_async_views.get_classes),
     path('api/class/parents/', ontology_views.get_class_parents),
     path('api/class/children/', ontology_views.get_class_children),
+    path('api/class/ancestors/', ontology_views.get_class_ancestors),
+    path('api/class/descendants/', ontology_views.get_class_descendants),
+    path('api/class/subtree/', ontology_views.get_class_subtree),
     path('api/class/objects/', ontology_views.get_class_objects),
     path('api/class/create/', ontology_views.create_class),
     path('api/class/update/', ontology_views.update_class),
@@ -36,15 +46,22 @@ urlpatterns = [
     path('api/class/parent/add/', ontology_views.add_class_parent),
 
     # Objects
-    path('api/object/get/', ontology_views.get_object),
+    path('api/object/get/', ontology_async_views.get_object),
+    path('api/object/get/batch/', ontology_async_views.get_objects),
+    path('api/object/view/', ontology_async_views.get_object_view),
+    path('api/object/view/batch/', ontology_async_views.get_object_views),
     path('api/object/create/', ontology_views.create_object),
     path('api/object/update/', ontology_views.update_object),
     path('api/object/delete/', ontology_views.delete_object),
 
     # Signatures
     path('api/class/signature/', ontology_views.collect_signature),
+    path('api/class/signature/inherited/', ontology_async_views.collect_inherited_signature),
+    path('api/class/signature/inherited/batch/', ontology_async_views.collect_inherited_signatures),
 
     path("embeddings/chunk/", embedding_views.chunk_text),
     path("embeddings/generate/", embedding_views.generate_embeddings),
     path("embeddings/compare/", embedding_views.compare_embeddings),
+    path("embeddings/search/", embedding_views.search),
+    path("embeddings/search/batch/", embedding_views.search_batch),
 ]
@@ -0,0 +1,108 @@
+from typing import List, Tuple
+
+import numpy as np
+
+# ходы выравнивания: сколько чанков источника и перевода забирает шаг
+MOVES = {
+    1: (1, 1),
+    2: (1, 2),
+    3: (2, 1),
+    4: (1, 0),  # чанк источника без пары
+    5: (0, 1),  # чанк перевода без пары
+}
+
+Bead = Tuple[List[int], List[int], float]
+
+
+def merged_similarity(sims: np.ndarray, adjacent: np.ndarray) -> np.ndarray:
+    # cos(a, b1 + b2) для нормализованных векторов: (a·b1 + a·b2) / |b1 + b2|
+    return (sims[..., :-1] + sims[..., 1:]) / np.sqrt(np.maximum(2 + 2 * adjacent, 1e-6))
+
+
+def align(source: np.ndarray, target: np.ndarray, baseline: float = 0.3, gap: float = 0.0,
+          merge_penalty: float = 0.05) -> List[Bead]:
+    """
+    Монотонное выравнивание чанков текста и перевода динамическим программированием
+    с шагами 1-1, 1-2, 2-1 и пропусками. Матрица сходства считается одним умножением,
+    DP идёт по строкам векторно: горизонтальный пропуск внутри строки сводится к cummax.
+    """
+    n, m = len(source), len(target)
+    if not n or not m:
+        return [([i], [], 0.0) for i in range(n)] + [([], [j], 0.0) for j in range(m)]
+
+    sims = (source @ target.T).astype(np.float32)
+    # сходство соседних чанков нужно для склеенных пар 1-2 и 2-1
+    source_adjacent = np.einsum('ij,ij->i', source[:-1], source[1:])
+    target_adjacent = np.einsum('ij,ij->i', target[:-1], target[1:])
+
+    score = np.full((n + 1, m + 1), -np.inf, dtype=np.float32)
+    moves = np.zeros((n + 1, m + 1), dtype=np.int8)
+    score[0] = gap * np.arange(m + 1)
+    moves[0, 1:] = 5
+    columns = np.arange(m + 1, dtype=np.float32)
+
+    for i in range(1, n + 1):
+        row = np.full(m + 1, -np.inf, dtype=np.float32)
+        move = np.zeros(m + 1, dtype=np.int8)
+
+        def take(candidate, code):
+            better = candidate > row
+            row[better] = candidate[better]
+            move[better] = code
+
+        # пропуск чанка источника
+        take(score[i - 1] + gap, 4)
+
+        one_to_one = np.full(m + 1, -np.inf, dtype=np.float32)
+        one_to_one[1:] = score[i - 1, :-1] + sims[i - 1] - baseline
+        take(one_to_one, 1)
+
+        if m > 1:
+            one_to_two = np.full(m + 1, -np.inf, dtype=np.float32)
+            merged = merged_similarity(sims[i - 1], target_adjacent)
+            one_to_two[2:] = score[i - 1, :-2] + 1.5 * (merged - baseline) - merge_penalty
+            take(one_to_two, 2)
+
+        if i > 1:
+            two_to_one = np.full(m + 1, -np.inf, dtype=np.float32)
+            merged = (sims[i - 2] + sims[i - 1]) / np.sqrt(max(2 + 2 * source_adjacent[i - 2], 1e-6))
+            two_to_one[1:] = score[i - 2, :-1] + 1.5 * (merged - baseline) - merge_penalty
+            take(two_to_one, 3)
+
+        # пропуск чанка перевода: row[j] = max(row[j], row[j-1] + gap)
+        # = gap * j + cummax(row[k] - gap * k)
+        shifted = np.maximum.accumulate(row - gap * columns) + gap * columns
+        horizontal = shifted > row
+        row[horizontal] = shifted[horizontal]
+        move[horizontal] = 5
+
+        score[i] = row
+        moves[i] = move
+
+    return traceback(moves, sims, source_adjacent, target_adjacent)
+
+
+def traceback(moves: np.ndarray, sims: np.ndarray, source_adjacent: np.ndarray,
+              target_adjacent: np.ndarray) -> List[Bead]:
+    beads = []
+    i, j = moves.shape[0] - 1, moves.shape[1] - 1
+    while i > 0 or j > 0:
+        code = int(moves[i, j]) if i > 0 else 5
+        di, dj = MOVES[code]
+        sources = list(range(i - di, i))
+        targets = list(range(j - dj, j))
+
+        if code == 1:
+            similarity = sims[i - 1, j - 1]
+        elif code == 2:
+            similarity = merged_similarity(sims[i - 1, j - 2:j], target_adjacent[j - 2:j - 1])[0]
+        elif code == 3:
+            similarity = merged_similarity(sims[i - 2:i, j - 1], source_adjacent[i - 2:i - 1])[0]
+        else:
+            similarity = 0.0
+
+        beads.append((sources, targets, float(similarity)))
+        i, j = i - di, j - dj
+
+    beads.reverse()
+    return beads
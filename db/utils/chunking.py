@@ -0,0 +1,185 @@
+import re
+from bisect import bisect_left
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+
+Span = Tuple[int, int, str]
+
+SENTENCE_END = re.compile(r'[.!?…]+[»"\')\]]*(?=\s)|\n+')
+WORD = re.compile(r'\S+')
+
+
+@dataclass
+class ChunkingConfig:
+    strategy: str = "paragraph"
+    min_tokens: int = 0
+    max_tokens: Optional[int] = None
+    overlap: int = 0
+
+    @classmethod
+    def from_dict(cls, data: Optional[dict]) -> "ChunkingConfig":
+        fields = asdict(cls())
+        unknown = set(data or {}) - set(fields)
+        if unknown:
+            raise ValueError(f"Unknown chunking options: {', '.join(sorted(unknown))}")
+
+        config = dict(settings.TEXT_CHUNKING)
+        config.update({key: value for key, value in (data or {}).items() if value is not None})
+        if config["strategy"] not in CHUNKING_STRATEGIES:
+            raise ValueError(f"Unknown chunking strategy: {config['strategy']}")
+
+        # настройки хранятся в корпусе, поэтому ошибку ловим при сохранении, а не при каждом эмбеддинге
+        def is_count(value, minimum):
+            return isinstance(value, int) and not isinstance(value, bool) and value >= minimum
+
+        if not is_count(config["min_tokens"], 0):
+            raise ValueError("min_tokens must be a non-negative integer")
+        if config["max_tokens"] is not None and not is_count(config["max_tokens"], 1):
+            raise ValueError("max_tokens must be a positive integer or null")
+        if not is_count(config["overlap"], 0):
+            raise ValueError("overlap must be a non-negative integer")
+        if config["max_tokens"] is not None and config["overlap"] >= config["max_tokens"]:
+            raise ValueError("overlap must be less than max_tokens")
+        return cls(**{key: config[key] for key in fields if key in config})
+
+
+class Chunker:
+    """
+    Делит текст на сегменты (абзацы, предложения, весь текст), режет слишком
+    длинные окном по токенам с перекрытием и склеивает слишком короткие.
+    """
+
+    # склеивать соседние сегменты, пока влезают в max_tokens
+    pack = False
+
+    def __init__(self, config: ChunkingConfig, tokenizer=None, model_max_tokens: Optional[int] = None):
+        self.config = config
+        self.tokenizer = tokenizer
+        self.max_tokens = max(1, config.max_tokens or model_max_tokens or 256)
+        # перекрытие не больше половины окна, иначе шаг окна вырождается
+        self.overlap = min(max(0, config.overlap), self.max_tokens // 2)
+
+    def token_offsets(self, text: str) -> Tuple[List[int], List[int]]:
+        if self.tokenizer is not None and getattr(self.tokenizer, 'is_fast', False):
+            encoded = self.tokenizer(text, add_special_tokens=False, return_offsets_mapping=True, verbose=False)
+            offsets = [(start, end) for start, end in encoded['offset_mapping'] if end > start]
+        else:
+            offsets = [match.span() for match in WORD.finditer(text)]
+        return [start for start, _ in offsets], [end for _, end in offsets]
+
+    def segments(self, text: str) -> List[Tuple[int, int]]:
+        return [(0, len(text))]
+
+    def split(self, text: str) -> List[Span]:
+        return self.split_counted(text)[0]
+
+    def split_counted(self, text: str) -> Tuple[List[Span], List[int]]:
+        # число токенов в каждом чанке нужно encode_batched, чтобы не токенизировать чанки повторно
+        starts, ends = self.token_offsets(text)
+        if not starts:
+            return [], []
+
+        def token_range(start, end):
+            return bisect_left(starts, start), bisect_left(starts, end)
+
+        pieces = []
+        for start, end in self.segments(text):
+            first, last = token_range(start, end)
+            if first == last:
+                continue
+            pieces.extend(self.window(starts, ends, first, last))
+
+        merged = self.merge(pieces, starts)
+        counts = [bisect_left(starts, end) - bisect_left(starts, start) for start, end in merged]
+        return [(start, end, text[start:end]) for start, end in merged], counts
+
+    def window(self, starts: List[int], ends: List[int], first: int, last: int) -> List[Tuple[int, int]]:
+        if last - first <= self.max_tokens:
+            return [(starts[first], ends[last - 1])]
+
+        step = self.max_tokens - self.overlap
+        windows = []
+        for index in range(first, last, step):
+            stop = min(index + self.max_tokens, last)
+            windows.append((starts[index], ends[stop - 1]))
+            if stop == last:
+                break
+        return windows
+
+    def merge(self, pieces: List[Tuple[int, int]], starts: List[int]) -> List[Tuple[int, int]]:
+        def count(start, end):
+            return bisect_left(starts, end) - bisect_left(starts, start)
+
+        merged = []
+        for start, end in pieces:
+            if merged:
+                prev_start, prev_end = merged[-1]
+                fits = count(prev_start, end) <= self.max_tokens
+                too_small = count(prev_start, prev_end) < self.config.min_tokens
+                if fits and (too_small or self.pack) and start >= prev_end:
+                    merged[-1] = (prev_start, end)
+                    continue
+            merged.append((start, end))
+
+        # хвостовой обрывок присоединяем к предыдущему чанку
+        if len(merged) > 1 and count(*merged[-1]) < self.config.min_tokens:
+            prev_start, _ = merged[-2]
+            if merged[-2][1] <= merged[-1][0] and count(prev_start, merged[-1][1]) <= self.max_tokens:
+                merged[-2:] = [(prev_start, merged[-1][1])]
+        return merged
+
+
+class ParagraphChunker(Chunker):
+    def segments(self, text: str) -> List[Tuple[int, int]]:
+        segments = []
+        offset = 0
+        for paragraph in text.split('\n'):
+            stripped = paragraph.strip()
+            if stripped:
+                start = offset + paragraph.index(stripped)
+                segments.append((start, start + len(stripped)))
+            offset += len(paragraph) + 1
+        return segments
+
+
+class SentenceChunker(Chunker):
+    pack = True
+
+    def segments(self, text: str) -> List[Tuple[int, int]]:
+        segments = []
+        start = 0
+        for match in SENTENCE_END.finditer(text):
+            segments.append((start, match.end()))
+            start = match.end()
+        segments.append((start, len(text)))
+
+        result = []
+        for start, end in segments:
+            sentence = text[start:end]
+            stripped = sentence.strip()
+            if stripped:
+                start += sentence.index(stripped)
+                result.append((start, start + len(stripped)))
+        return result
+
+
+class TokenWindowChunker(Chunker):
+    pass
+
+
+CHUNKING_STRATEGIES: Dict[str, type] = {
+    "paragraph": ParagraphChunker,
+    "sentence": SentenceChunker,
+    "window": TokenWindowChunker,
+}
+
+
+def make_chunker(config: ChunkingConfig, model=None) -> Chunker:
+    tokenizer = getattr(model, 'tokenizer', None)
+    model_max_tokens = getattr(model, 'max_seq_length', None)
+    if model_max_tokens:
+        # место под [CLS]/[SEP]
+        model_max_tokens -= 2
+    return CHUNKING_STRATEGIES[config.strategy](config, tokenizer, model_max_tokens)
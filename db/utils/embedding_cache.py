@@ -0,0 +1,84 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable
+
+import numpy as np
+from django.conf import settings
+
+from db.models import EmbeddingCacheEntry
+from db.utils.vector_utils import pack_vectors
+
+
+class EmbeddingCache:
+    """
+    Кэш эмбеддингов по (имя модели, хэш чанка): LRU в памяти процесса
+    поверх общей таблицы EmbeddingCacheEntry.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, key: tuple, vector: np.ndarray) -> None:
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def get_many(self, model_name: str, hashes: Iterable[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        missing = []
+        with self._lock:
+            for chunk_hash in set(hashes):
+                vector = self._entries.get((model_name, chunk_hash))
+                if vector is None:
+                    missing.append(chunk_hash)
+                else:
+                    self._entries.move_to_end((model_name, chunk_hash))
+                    found[chunk_hash] = vector
+
+        batch_size = settings.EMBEDDING_CACHE_DB_BATCH
+        for start in range(0, len(missing), batch_size):
+            entries = EmbeddingCacheEntry.objects.filter(
+                model_name=model_name,
+                chunk_hash__in=missing[start:start + batch_size],
+            )
+            for entry in entries:
+                found[entry.chunk_hash] = entry.get_vector()
+
+        with self._lock:
+            for chunk_hash in missing:
+                if chunk_hash in found:
+                    self._remember((model_name, chunk_hash), found[chunk_hash])
+        return found
+
+    def set_many(self, model_name: str, vectors: Dict[str, np.ndarray]) -> None:
+        if not vectors:
+            return
+
+        dtype = settings.EMBEDDING_STORAGE_DTYPE
+        entries = []
+        for chunk_hash, vector in vectors.items():
+            data, _, dim = pack_vectors(vector, dtype)
+            entries.append(EmbeddingCacheEntry(
+                model_name=model_name,
+                chunk_hash=chunk_hash,
+                vector=data,
+                vector_dtype=dtype,
+                dim=dim,
+            ))
+        EmbeddingCacheEntry.objects.bulk_create(
+            entries, batch_size=settings.EMBEDDING_CACHE_DB_BATCH, ignore_conflicts=True
+        )
+
+        with self._lock:
+            for chunk_hash, vector in vectors.items():
+                self._remember((model_name, chunk_hash), vector)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+embedding_cache = EmbeddingCache(settings.EMBEDDING_CACHE_SIZE)
@@ -1,36 +1,90 @@
+import hashlib
+import json
+import re
 import numpy as np
-from typing import List, Union
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+from typing import List, Optional, Tuple, Union
+from django.conf import settings
+
+from db.utils.chunking import Chunker, ChunkingConfig, make_chunker
+from db.utils.embedding_cache import embedding_cache
+from db.utils.encode_batching import encode_batched
+from db.utils.model_registry import get_model, registry
+
+
+def hash_chunk(chunk: str) -> str:
+    normalized = re.sub(r'\s+', ' ', chunk).strip()
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()
 
 
 class EmbeddingUtils:
-    def __init__(self):
-        self.model = SentenceTransformer("sentence-transformers/paraphrase-multilingual-mpnet-base-v2")
+    def __init__(self, model_name: Optional[str] = None, chunking: Optional[dict] = None):
+        self.model_name = registry.resolve_name(model_name)
+        self.model = get_model(self.model_name)
+        self.chunker = self.make_chunker(chunking)
+        self._chunkers = {}
+
+    def make_chunker(self, chunking: Optional[dict] = None) -> Chunker:
+        return make_chunker(ChunkingConfig.from_dict(chunking), self.model)
+
+    def get_chunker(self, chunking: Optional[dict] = None) -> Chunker:
+        if not chunking:
+            return self.chunker
+
+        key = json.dumps(chunking, sort_keys=True)
+        chunker = self._chunkers.get(key)
+        if chunker is None:
+            chunker = self._chunkers[key] = self.make_chunker(chunking)
+        return chunker
 
-    def get_chunks(self, texts: Union[str, List[str]]) -> List[str]:
+    def get_chunks(self, texts: Union[str, List[str]], chunking: Optional[dict] = None) -> List[str]:
         if isinstance(texts, str):
             texts = [texts]
 
         chunks = []
         for text in texts:
-            paragraphs = text.split('\n')
+            chunks.extend(chunk for _, _, chunk in self.get_chunk_spans(text, chunking))
 
-            for paragraph in paragraphs:
-                paragraph = paragraph.strip()
+        return chunks
 
-                if paragraph:
-                    chunks.append(paragraph)
+    def get_chunk_spans(self, text: str, chunking: Optional[dict] = None) -> List[Tuple[int, int, str]]:
+        return self.get_chunker(chunking).split(text)
 
-        return chunks
+    def get_counted_spans(self, text: str,
+                          chunking: Optional[dict] = None) -> Tuple[List[Tuple[int, int, str]], List[int]]:
+        return self.get_chunker(chunking).split_counted(text)
+
+    def encode(self, texts: List[str], token_counts: Optional[List[int]] = None) -> np.ndarray:
+        return encode_batched(self.model, texts, settings.EMBEDDING_BATCH_TOKENS, settings.EMBEDDING_MAX_BATCH_SIZE,
+                              token_counts)
 
-    def get_embeddings(self, texts: Union[str, List[str]]) -> np.ndarray:
+    def get_embeddings(self, texts: Union[str, List[str]], use_cache: bool = True,
+                       token_counts: Optional[List[int]] = None) -> np.ndarray:
+        # token_counts - длины чанков в токенах из чанкера, если они уже посчитаны
         if isinstance(texts, str):
             texts = [texts]
-        embeddings = self.model.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
-        return embeddings
+        if not use_cache or not texts:
+            return self.encode(texts, token_counts)
+
+        hashes = [hash_chunk(text) for text in texts]
+        vectors = embedding_cache.get_many(self.model_name, hashes)
+
+        # кодируем только промахи кэша, каждый уникальный чанк один раз
+        misses, miss_counts = {}, []
+        for position, (chunk_hash, text) in enumerate(zip(hashes, texts)):
+            if chunk_hash not in vectors and chunk_hash not in misses:
+                misses[chunk_hash] = text
+                if token_counts is not None:
+                    miss_counts.append(token_counts[position])
+        if misses:
+            encoded = self.encode(list(misses.values()), miss_counts if token_counts is not None else None)
+            new_vectors = dict(zip(misses.keys(), encoded))
+            embedding_cache.set_many(self.model_name, new_vectors)
+            vectors.update(new_vectors)
+
+        return np.stack([vectors[chunk_hash] for chunk_hash in hashes]).astype(np.float32, copy=False)
 
     def cos_compare(self, emb1: np.ndarray, emb2: np.ndarray) -> float:
-        emb1 = emb1.reshape(1, -1)
-        emb2 = emb2.reshape(1, -1)
-        return float(cosine_similarity(emb1, emb2)[0][0])
+        emb1 = np.asarray(emb1, dtype=np.float32).reshape(-1)
+        emb2 = np.asarray(emb2, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(emb1) * np.linalg.norm(emb2)
+        return float(emb1 @ emb2 / norm) if norm else 0.0
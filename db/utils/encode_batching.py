@@ -0,0 +1,54 @@
+from typing import List, Optional
+
+import numpy as np
+
+
+def token_lengths(model, texts: List[str]) -> np.ndarray:
+    tokenizer = getattr(model, 'tokenizer', None)
+    if tokenizer is None:
+        return np.array([len(text.split()) + 2 for text in texts], dtype=np.int64)
+
+    max_length = getattr(model, 'max_seq_length', None) or 512
+    encoded = tokenizer(texts, add_special_tokens=True, truncation=True, max_length=max_length)
+    return np.array([len(ids) for ids in encoded['input_ids']], dtype=np.int64)
+
+
+def padded_lengths(model, token_counts: List[int]) -> np.ndarray:
+    # чанкер считает токены без служебных [CLS]/[SEP]
+    max_length = getattr(model, 'max_seq_length', None) or 512
+    return np.minimum(np.asarray(token_counts, dtype=np.int64) + 2, max_length)
+
+
+def make_batches(lengths: np.ndarray, token_budget: int, max_batch_size: int) -> List[np.ndarray]:
+    # длинные идут первыми: первый элемент пачки задаёт длину паддинга всей пачки
+    order = np.argsort(-lengths, kind='stable')
+
+    batches = []
+    start = 0
+    while start < len(order):
+        padded_length = max(int(lengths[order[start]]), 1)
+        size = max(1, min(max_batch_size, token_budget // padded_length))
+        batches.append(order[start:start + size])
+        start += size
+    return batches
+
+
+def encode_batched(model, texts: List[str], token_budget: int, max_batch_size: int,
+                   token_counts: Optional[List[int]] = None) -> np.ndarray:
+    if not texts:
+        return np.empty((0, model.get_sentence_embedding_dimension()), dtype=np.float32)
+
+    lengths = token_lengths(model, texts) if token_counts is None else padded_lengths(model, token_counts)
+    result = None
+    for batch in make_batches(lengths, token_budget, max_batch_size):
+        vectors = model.encode(
+            [texts[i] for i in batch],
+            batch_size=len(batch),
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+        )
+        if result is None:
+            result = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+        # возвращаем векторы на исходные позиции
+        result[batch] = vectors
+    return result
@@ -0,0 +1,45 @@
+import threading
+from typing import Dict, Optional
+
+from django.conf import settings
+from sentence_transformers import SentenceTransformer
+
+
+class ModelRegistry:
+    def __init__(self):
+        self._models: Dict[str, SentenceTransformer] = {}
+        self._lock = threading.Lock()
+
+    def resolve_name(self, name: Optional[str] = None) -> str:
+        name = name or settings.EMBEDDING_MODEL
+        # допускаем как алиас из EMBEDDING_MODELS, так и полное имя модели
+        return settings.EMBEDDING_MODELS.get(name, name)
+
+    def get(self, name: Optional[str] = None) -> SentenceTransformer:
+        model_name = self.resolve_name(name)
+
+        model = self._models.get(model_name)
+        if model is not None:
+            return model
+
+        with self._lock:
+            model = self._models.get(model_name)
+            if model is None:
+                model = SentenceTransformer(model_name, device=settings.EMBEDDING_DEVICE)
+                self._models[model_name] = model
+        return model
+
+    def warm_up(self) -> None:
+        for name in settings.EMBEDDING_WARMUP_MODELS:
+            self.get(name).encode(["warm up"], convert_to_numpy=True)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._models.clear()
+
+
+registry = ModelRegistry()
+
+
+def get_model(name: Optional[str] = None) -> SentenceTransformer:
+    return registry.get(name)
@@ -0,0 +1,165 @@
+import re
+from typing import IO, Iterator, NamedTuple, Optional
+
+from db.onthology_namespace import LOCAL_NAMESPACE, PREFIXES
+
+
+class Triple(NamedTuple):
+    subject: str
+    predicate: str
+    object: str
+    # object - литерал, а не IRI/пустой узел
+    literal: bool = False
+    # языковой тег и тип литерала
+    language: Optional[str] = None
+    datatype: Optional[str] = None
+
+
+IRI = r'<([^>]*)>'
+BNODE = r'(_:\S+)'
+LITERAL = r'"((?:[^"\\]|\\.)*)"(?:@([A-Za-z]+(?:-[A-Za-z0-9]+)*)|\^\^<([^>]*)>)?'
+NTRIPLE = re.compile(
+    rf'^\s*(?:{IRI}|{BNODE})\s+{IRI}\s+(?:{IRI}|{BNODE}|{LITERAL})\s*\.\s*(?:#.*)?$'
+)
+ESCAPE = re.compile(r'\\(?:u([0-9A-Fa-f]{4})|U([0-9A-Fa-f]{8})|(.))')
+ESCAPES = {'t': '\t', 'b': '\b', 'n': '\n', 'r': '\r', 'f': '\f', '"': '"', "'": "'", '\\': '\\'}
+
+RDFLIB_FORMATS = {
+    '.ttl': 'turtle',
+    '.owl': 'xml',
+    '.rdf': 'xml',
+    '.xml': 'xml',
+    '.n3': 'n3',
+}
+
+
+def unescape(value: str) -> str:
+    if '\\' not in value:
+        return value
+
+    def replace(match):
+        code = match.group(1) or match.group(2)
+        return chr(int(code, 16)) if code else ESCAPES.get(match.group(3), match.group(3))
+
+    return ESCAPE.sub(replace, value)
+
+
+def escape(value: str) -> str:
+    return (value.replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n').replace('\r', '\\r').replace('\t', '\\t'))
+
+
+def iter_ntriples(file: IO[str]) -> Iterator[Triple]:
+    """Потоковый разбор N-Triples: строка за строкой, без загрузки файла в память."""
+    for number, line in enumerate(file, 1):
+        if not line.strip() or line.lstrip().startswith('#'):
+            continue
+        match = NTRIPLE.match(line)
+        if match is None:
+            raise ValueError(f"Line {number}: malformed triple")
+
+        s_iri, s_bnode, predicate, o_iri, o_bnode, o_literal, language, datatype = match.groups()
+        subject = unescape(s_iri) if s_iri is not None else s_bnode
+        if o_literal is not None:
+            yield Triple(subject, unescape(predicate), unescape(o_literal), True, language,
+                         unescape(datatype) if datatype else None)
+        else:
+            yield Triple(subject, unescape(predicate), unescape(o_iri) if o_iri is not None else o_bnode, False)
+
+
+def iter_rdflib(path: str, rdf_format: str) -> Iterator[Triple]:
+    # Turtle и RDF/XML разбирает rdflib; граф он строит целиком в памяти
+    from rdflib import BNode, Graph, Literal
+
+    graph = Graph()
+    graph.parse(path, format=rdf_format)
+    # порядок обхода графа не постоянен между запусками, а продолжение по checkpoint на него опирается
+    for s, p, o in sorted(graph):
+        literal = isinstance(o, Literal)
+        yield Triple(
+            f"_:{s}" if isinstance(s, BNode) else str(s),
+            str(p),
+            f"_:{o}" if isinstance(o, BNode) else str(o),
+            literal,
+            o.language if literal else None,
+            str(o.datatype) if literal and o.datatype else None,
+        )
+
+
+def is_bnode(term: str) -> bool:
+    return term.startswith('_:')
+
+
+def is_absolute(iri: str) -> bool:
+    return re.match(r'^[A-Za-z][A-Za-z0-9+.-]*:', iri) is not None
+
+
+# Имена в графе и IRI в RDF переводятся друг в друга без потерь:
+# uri узлов и имена связей/свойств, заведённые через API, получают префикс LOCAL_NAMESPACE,
+# IRI из известных словарей сокращаются до prefix__name, остальные IRI хранятся как есть.
+
+def rel_type_for(predicate: str) -> str:
+    # <http://www.w3.org/1999/02/22-rdf-syntax-ns#type> -> rdf__type
+    if predicate.startswith(LOCAL_NAMESPACE):
+        return predicate[len(LOCAL_NAMESPACE):]
+    for prefix, namespace in PREFIXES.items():
+        if predicate.startswith(namespace):
+            return f"{prefix}__{predicate[len(namespace):]}"
+    return predicate
+
+
+def predicate_for(rel_type: str) -> str:
+    prefix, sep, name = rel_type.partition('__')
+    if sep and prefix in PREFIXES:
+        return PREFIXES[prefix] + name
+    return rel_type if is_absolute(rel_type) else LOCAL_NAMESPACE + rel_type
+
+
+def node_iri(uri: str) -> str:
+    # узлы, созданные через API, имеют uri-uuid; в RDF им нужен абсолютный IRI
+    return uri if is_absolute(uri) else LOCAL_NAMESPACE + uri
+
+
+def node_uri(iri: str) -> str:
+    return iri[len(LOCAL_NAMESPACE):] if iri.startswith(LOCAL_NAMESPACE) else iri
+
+
+def format_literal(triple: Triple, name=lambda iri: f'<{iri}>') -> str:
+    literal = f'"{escape(triple.object)}"'
+    if triple.language:
+        return f'{literal}@{triple.language}'
+    if triple.datatype:
+        return f'{literal}^^{name(triple.datatype)}'
+    return literal
+
+
+def format_ntriple(triple: Triple) -> str:
+    obj = format_literal(triple) if triple.literal else f'<{triple.object}>'
+    return f'<{triple.subject}> <{triple.predicate}> {obj} .\n'
+
+
+def format_turtle(triple: Triple) -> str:
+    def name(iri: str) -> str:
+        for prefix, namespace in PREFIXES.items():
+            rest = iri[len(namespace):]
+            if iri.startswith(namespace) and re.fullmatch(r'[A-Za-z_][\w-]*', rest):
+                return f"{prefix}:{rest}"
+        return f"<{iri}>"
+
+    obj = format_literal(triple, name) if triple.literal else name(triple.object)
+    return f'{name(triple.subject)} {name(triple.predicate)} {obj} .\n'
+
+
+def turtle_prefixes() -> str:
+    return "".join(f"@prefix {prefix}: <{namespace}> .\n" for prefix, namespace in PREFIXES.items()) + "\n"
+
+
+def rdf_format_for(path: str) -> Optional[str]:
+    if path.endswith('.nt'):
+        return 'nt'
+    if path.endswith('.csv'):
+        return 'csv'
+    for ext, rdf_format in RDFLIB_FORMATS.items():
+        if path.endswith(ext):
+            return rdf_format
+    return None
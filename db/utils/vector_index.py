@@ -0,0 +1,485 @@
+import fcntl
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from django.conf import settings
+
+# массивы поколения: векторы и id отсортированы по спискам, text_order/text_keys - по text_id
+ARRAYS = ('centroids', 'offsets', 'ids', 'text_ids', 'vectors', 'text_order', 'text_keys')
+# заголовок записи журнала: text_id, число векторов, размерность
+RECORD_HEADER = struct.Struct('<qqq')
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def spherical_kmeans(vectors: np.ndarray, nlist: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+
+    for _ in range(iterations):
+        assign = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, vectors)
+        counts = np.bincount(assign, minlength=nlist)
+
+        # пустые кластеры переинициализируем случайными точками
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]
+        centroids = normalize(sums)
+
+    return centroids
+
+
+def load_array(path: str) -> np.ndarray:
+    # старые версии numpy не умеют mmap массивов нулевого размера
+    try:
+        return np.load(path, mmap_mode='r')
+    except ValueError:
+        return np.load(path)
+
+
+class IVFIndex:
+    """
+    Inverted-file индекс по нормализованным векторам чанков.
+
+    На диске индекс - поколение из .npy-файлов и журнал изменений к нему.
+    Векторы поколения воркеры открывают через mmap и делят страницы между собой,
+    а журнал дочитывают с последней позиции: запись текста стоит одной дописанной
+    записи. Когда в журнале набирается VECTOR_INDEX_COMPACT_SIZE векторов,
+    пишущий процесс сливает его с поколением в новое.
+    Пока векторов меньше VECTOR_INDEX_TRAIN_SIZE, всё лежит в одном списке
+    (точный поиск); после обучения k-means поиск идёт по nprobe ближайшим спискам.
+    """
+
+    def __init__(self, name: str, directory: Optional[str] = None):
+        self.name = name
+        self.directory = directory or settings.VECTOR_INDEX_DIR
+        self.pointer_path = os.path.join(self.directory, f'{name}.ivf.current')
+        self.lock_path = os.path.join(self.directory, f'{name}.ivf.lock')
+        self.generation = None
+        self.log_offset = 0
+        self._stale = True
+        self._rebuild = False
+        self._touched: Set[int] = set()
+        self._lock = threading.RLock()
+        self._set_base(None)
+
+    def _set_base(self, arrays: Optional[Dict[str, np.ndarray]]) -> None:
+        if arrays is None:
+            empty = np.empty(0, dtype=np.int64)
+            arrays = {
+                'centroids': np.empty((0, 0), dtype=np.float32),
+                'offsets': np.zeros(2, dtype=np.int64),
+                'ids': empty, 'text_ids': empty, 'text_order': empty, 'text_keys': empty,
+                'vectors': np.empty((0, 0), dtype=np.float32),
+            }
+
+        # центроиды и границы списков маленькие, их держим в памяти
+        self.centroids = np.array(arrays['centroids']) if len(arrays['centroids']) else None
+        self.offsets = np.array(arrays['offsets'])
+        self.ids = arrays['ids']
+        self.text_ids = arrays['text_ids']
+        self.vectors = arrays['vectors']
+        self.text_order = arrays['text_order']
+        self.text_keys = arrays['text_keys']
+        self.dim = self.vectors.shape[1] if len(self.vectors) else None
+        if self.dim is None and self.centroids is not None:
+            self.dim = self.centroids.shape[1]
+
+        # строки поколения, перекрытые журналом
+        self.alive = np.ones(len(self.ids), dtype=bool)
+        self.dead = 0
+        # text_id -> (ids, vectors, lists) из журнала; пустые ids - текст удалён
+        self.delta: Dict[int, Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+        self._delta_arrays = None
+
+    def __len__(self) -> int:
+        return len(self.ids) - self.dead + sum(len(ids) for ids, _, _ in self.delta.values())
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    @property
+    def nlist(self) -> int:
+        return len(self.offsets) - 1
+
+    @property
+    def delta_size(self) -> int:
+        return self.dead + sum(len(ids) for ids, _, _ in self.delta.values())
+
+    # ==================== PERSISTENCE ====================
+
+    def _path(self, kind: str, generation: Optional[str] = None) -> str:
+        suffix = '' if kind == 'log' else '.npy'
+        return os.path.join(self.directory, f'{self.name}.ivf.{generation or self.generation}.{kind}{suffix}')
+
+    def _current_generation(self) -> Optional[str]:
+        try:
+            with open(self.pointer_path) as pointer:
+                return pointer.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def _load(self, generation: Optional[str]) -> None:
+        if generation is None:
+            self._set_base(None)
+        else:
+            self._set_base({kind: load_array(self._path(kind, generation)) for kind in ARRAYS})
+        self.generation = generation
+        self.log_offset = 0
+        self._stale = False
+
+    def _read_log(self) -> None:
+        path = self._path('log')
+        try:
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            return
+        if size <= self.log_offset:
+            return
+
+        with open(path, 'rb') as log:
+            log.seek(self.log_offset)
+            data = log.read(size - self.log_offset)
+
+        position = 0
+        while position + RECORD_HEADER.size <= len(data):
+            text_id, count, dim = RECORD_HEADER.unpack_from(data, position)
+            start = position + RECORD_HEADER.size
+            end = start + count * 8 + count * dim * 4
+            # последнюю запись могут ещё дописывать
+            if end > len(data):
+                break
+            ids = np.frombuffer(data, dtype='<i8', count=count, offset=start)
+            vectors = np.frombuffer(data, dtype='<f4', count=count * dim, offset=start + count * 8)
+            self._apply(text_id, ids.astype(np.int64), vectors.reshape(count, dim).astype(np.float32))
+            position = end
+        self.log_offset += position
+
+    def refresh(self) -> None:
+        # другой воркер мог дописать журнал или выпустить новое поколение
+        with self._lock:
+            generation = self._current_generation()
+            if self._stale or generation != self.generation:
+                self._load(generation)
+            if self.generation is not None:
+                self._read_log()
+
+    def _append_log(self) -> None:
+        if not self._touched:
+            return
+        # журнал принадлежит поколению; первое поколение пишем целиком
+        if self.generation is None:
+            self.compact()
+            return
+
+        records = []
+        for text_id in sorted(self._touched):
+            entry = self.delta.get(text_id)
+            ids, vectors = (entry[0], entry[1]) if entry else (np.empty(0, dtype=np.int64), None)
+            dim = vectors.shape[1] if len(ids) else 0
+            records.append(RECORD_HEADER.pack(text_id, len(ids), dim))
+            if len(ids):
+                records.append(ids.astype('<i8').tobytes())
+                records.append(vectors.astype('<f4').tobytes())
+
+        with open(self._path('log'), 'ab') as log:
+            log.write(b''.join(records))
+            log.flush()
+            os.fsync(log.fileno())
+            self.log_offset = log.tell()
+        self._touched = set()
+
+    def _remove_generations(self, keep: Set[str]) -> None:
+        prefix = f'{self.name}.ivf.'
+        for filename in os.listdir(self.directory):
+            if not filename.startswith(prefix):
+                continue
+            generation = filename[len(prefix):].split('.')[0]
+            if generation.isdigit() and generation not in keep:
+                os.remove(os.path.join(self.directory, filename))
+
+    def compact(self, nlist: Optional[int] = None, retrain: bool = False, block_size: int = 65536) -> None:
+        """Сливает поколение и журнал в новое поколение; при retrain заново обучает кластеры."""
+        base_rows = np.flatnonzero(self.alive)
+        delta_ids, delta_text_ids, delta_vectors, delta_lists = self._delta()
+        count = len(base_rows) + len(delta_ids)
+        dim = self.dim or 0
+
+        def gather(rows: np.ndarray) -> np.ndarray:
+            # rows - номера в общей нумерации: сначала живые строки поколения, потом журнал
+            is_base = rows < len(base_rows)
+            result = np.empty((len(rows), dim), dtype=np.float32)
+            if is_base.any():
+                result[is_base] = self.vectors[base_rows[rows[is_base]]]
+            if not is_base.all():
+                result[~is_base] = delta_vectors[rows[~is_base] - len(base_rows)]
+            return result
+
+        centroids = self.centroids
+        if retrain:
+            centroids = None
+            if count:
+                nlist = min(nlist or max(1, int(4 * np.sqrt(count))), count)
+                sample_size = min(count, nlist * 64)
+                sample = np.sort(np.random.default_rng(0).choice(count, sample_size, replace=False))
+                centroids = spherical_kmeans(gather(sample), nlist)
+            lists = np.zeros(count, dtype=np.int64)
+            if centroids is not None:
+                for start in range(0, count, block_size):
+                    rows = np.arange(start, min(start + block_size, count))
+                    lists[rows] = np.argmax(gather(rows) @ centroids.T, axis=1)
+        else:
+            base_lists = np.searchsorted(self.offsets, base_rows, side='right') - 1
+            lists = np.concatenate([base_lists, delta_lists]).astype(np.int64)
+
+        nlist = 1 if centroids is None else len(centroids)
+        order = np.argsort(lists, kind='stable')
+        ids = np.concatenate([self.ids[base_rows], delta_ids]).astype(np.int64)[order]
+        text_ids = np.concatenate([self.text_ids[base_rows], delta_text_ids]).astype(np.int64)[order]
+        text_order = np.argsort(text_ids, kind='stable')
+
+        os.makedirs(self.directory, exist_ok=True)
+        generation = str(time.time_ns())
+        np.save(self._path('centroids', generation),
+                centroids if centroids is not None else np.empty((0, dim), dtype=np.float32))
+        np.save(self._path('offsets', generation),
+                np.concatenate([[0], np.cumsum(np.bincount(lists, minlength=nlist))]).astype(np.int64))
+        np.save(self._path('ids', generation), ids)
+        np.save(self._path('text_ids', generation), text_ids)
+        np.save(self._path('text_order', generation), text_order)
+        np.save(self._path('text_keys', generation), text_ids[text_order])
+
+        if count:
+            vectors = np.lib.format.open_memmap(self._path('vectors', generation), mode='w+',
+                                                dtype=np.float32, shape=(count, dim))
+            for start in range(0, count, block_size):
+                vectors[start:start + block_size] = gather(order[start:start + block_size])
+            vectors.flush()
+            del vectors
+        else:
+            np.save(self._path('vectors', generation), np.empty((0, dim), dtype=np.float32))
+        open(self._path('log', generation), 'wb').close()
+
+        previous = self._current_generation()
+        with open(self.pointer_path + '.tmp', 'w') as pointer:
+            pointer.write(generation)
+        os.replace(self.pointer_path + '.tmp', self.pointer_path)
+
+        # предыдущее поколение оставляем: его могли только что прочитать по старому указателю
+        self._remove_generations({generation, previous})
+        self._load(generation)
+        self._touched = set()
+        self._rebuild = False
+
+    @contextmanager
+    def writing(self):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.lock_path, 'w') as lock_file, self._lock:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self.refresh()
+                self._touched, self._rebuild = set(), False
+                yield self
+                needs_training = not self.is_trained and len(self) >= settings.VECTOR_INDEX_TRAIN_SIZE
+                if self._rebuild or needs_training or self.delta_size >= settings.VECTOR_INDEX_COMPACT_SIZE:
+                    self.compact(retrain=needs_training)
+                else:
+                    self._append_log()
+            except BaseException:
+                # изменения в памяти не записаны: при следующем обращении перечитываем с диска
+                self._stale = True
+                raise
+            finally:
+                self._touched, self._rebuild = set(), False
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    # ==================== WRITE ====================
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        if self.centroids is None or not len(vectors):
+            return np.zeros(len(vectors), dtype=np.int64)
+        return np.argmax(vectors @ self.centroids.T, axis=1)
+
+    def _base_rows(self, text_id: int) -> np.ndarray:
+        start, end = np.searchsorted(self.text_keys, [text_id, text_id + 1])
+        return self.text_order[start:end]
+
+    def _apply(self, text_id: int, ids: np.ndarray, vectors: np.ndarray) -> None:
+        rows = self._base_rows(text_id)
+        if len(rows):
+            self.dead += int(self.alive[rows].sum())
+            self.alive[rows] = False
+
+        if len(ids):
+            self.dim = vectors.shape[1]
+            self.delta[text_id] = (ids, vectors, self._assign(vectors))
+        else:
+            self.delta.pop(text_id, None)
+        self._delta_arrays = None
+
+    def _text_rows(self, text_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        if text_id in self.delta:
+            ids, vectors, _ = self.delta[text_id]
+            return ids, vectors
+        rows = np.sort(self._base_rows(text_id))
+        rows = rows[self.alive[rows]]
+        return np.asarray(self.ids[rows]), np.asarray(self.vectors[rows])
+
+    def _upsert(self, text_id: int, ids: np.ndarray, vectors: np.ndarray) -> None:
+        self._apply(text_id, ids, vectors)
+        self._touched.add(text_id)
+
+    def add(self, ids: Iterable[int], text_ids: Iterable[int], vectors: np.ndarray) -> None:
+        ids = np.asarray(list(ids), dtype=np.int64)
+        text_ids = np.asarray(list(text_ids), dtype=np.int64)
+        if not len(ids):
+            return
+
+        vectors = normalize(vectors)
+        order = np.argsort(text_ids, kind='stable')
+        groups, starts = np.unique(text_ids[order], return_index=True)
+        for text_id, rows in zip(groups, np.split(order, starts[1:])):
+            current_ids, current_vectors = self._text_rows(int(text_id))
+            if len(current_ids):
+                self._upsert(int(text_id), np.concatenate([current_ids, ids[rows]]),
+                             np.concatenate([current_vectors, vectors[rows]]))
+            else:
+                self._upsert(int(text_id), ids[rows], vectors[rows])
+
+    def remove_text(self, text_id: int) -> None:
+        self._upsert(int(text_id), np.empty(0, dtype=np.int64), np.empty((0, self.dim or 0), dtype=np.float32))
+
+    def upsert_text(self, text_id: int, ids: Iterable[int], vectors: np.ndarray) -> None:
+        ids = np.asarray(list(ids), dtype=np.int64)
+        if not len(ids):
+            self.remove_text(text_id)
+            return
+        self._upsert(int(text_id), ids, normalize(vectors).reshape(len(ids), -1))
+
+    def reset(self) -> None:
+        # полная перестройка: при выходе из writing() пишется новое поколение без журнала
+        self._set_base(None)
+        self._rebuild = True
+
+    def train(self, nlist: Optional[int] = None) -> None:
+        self.compact(nlist, retrain=True)
+
+    # ==================== SEARCH ====================
+
+    def _delta(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        if self._delta_arrays is None:
+            entries = list(self.delta.items())
+            if entries:
+                self._delta_arrays = (
+                    np.concatenate([ids for _, (ids, _, _) in entries]),
+                    np.concatenate([np.full(len(ids), text_id, dtype=np.int64) for text_id, (ids, _, _) in entries]),
+                    np.concatenate([vectors for _, (_, vectors, _) in entries]),
+                    np.concatenate([lists for _, (_, _, lists) in entries]),
+                )
+            else:
+                empty = np.empty(0, dtype=np.int64)
+                self._delta_arrays = (empty, empty, np.empty((0, self.dim or 0), dtype=np.float32), empty)
+        return self._delta_arrays
+
+    def _text_lists(self, allowed: np.ndarray) -> Set[int]:
+        starts = np.searchsorted(self.text_keys, allowed, side='left')
+        ends = np.searchsorted(self.text_keys, allowed, side='right')
+        rows = [self.text_order[start:end] for start, end in zip(starts, ends) if end > start]
+        lists = set()
+        if rows:
+            rows = np.concatenate(rows)
+            rows = rows[self.alive[rows]]
+            lists.update(int(list_no) for list_no in np.unique(np.searchsorted(self.offsets, rows, side='right') - 1))
+        for text_id in allowed:
+            entry = self.delta.get(int(text_id))
+            if entry is not None:
+                lists.update(int(list_no) for list_no in np.unique(entry[2]))
+        return lists
+
+    def search(self, query: np.ndarray, k: int = 10, allowed_text_ids: Optional[Iterable[int]] = None,
+               nprobe: Optional[int] = None, exhaustive: bool = False) -> List[Tuple[int, int, float]]:
+        with self._lock:
+            self.refresh()
+            if not len(self) or k < 1:
+                return []
+
+            query = normalize(query).reshape(-1)
+            allowed = None
+            if allowed_text_ids is not None:
+                allowed = np.fromiter(allowed_text_ids, dtype=np.int64)
+                candidate_lists = self._text_lists(allowed)
+                if not candidate_lists:
+                    return []
+
+            if self.centroids is None:
+                probe = [0]
+            else:
+                # exhaustive: просматриваем все списки, поиск становится точным
+                nprobe = len(self.centroids) if exhaustive else min(nprobe or settings.VECTOR_INDEX_NPROBE,
+                                                                    len(self.centroids))
+                centroid_scores = self.centroids @ query
+                if allowed is None:
+                    probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+                else:
+                    # при фильтре просматриваем ближайшие списки, где вообще есть нужные тексты
+                    order = np.argsort(-centroid_scores)
+                    probe = [list_no for list_no in order if list_no in candidate_lists][:nprobe]
+
+            ids, text_ids, scores = [], [], []
+            for list_no in probe:
+                start, end = self.offsets[list_no], self.offsets[list_no + 1]
+                if start == end:
+                    continue
+                mask = self.alive[start:end]
+                if allowed is not None:
+                    mask = mask & np.isin(self.text_ids[start:end], allowed)
+                if not mask.any():
+                    continue
+                ids.append(self.ids[start:end][mask])
+                text_ids.append(self.text_ids[start:end][mask])
+                scores.append((self.vectors[start:end] @ query)[mask])
+
+            delta_ids, delta_text_ids, delta_vectors, delta_lists = self._delta()
+            if len(delta_ids):
+                mask = np.isin(delta_lists, probe)
+                if allowed is not None:
+                    mask &= np.isin(delta_text_ids, allowed)
+                ids.append(delta_ids[mask])
+                text_ids.append(delta_text_ids[mask])
+                scores.append(delta_vectors[mask] @ query)
+
+            if not ids:
+                return []
+            ids, text_ids, scores = np.concatenate(ids), np.concatenate(text_ids), np.concatenate(scores)
+            if not len(scores):
+                return []
+
+            k = min(k, len(scores))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(int(ids[i]), int(text_ids[i]), float(scores[i])) for i in top]
+
+
+_indexes: Dict[str, IVFIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_vector_index(name: str = 'chunks') -> IVFIndex:
+    with _indexes_lock:
+        index = _indexes.get(name)
+        if index is None:
+            index = _indexes[name] = IVFIndex(name)
+    return index
@@ -0,0 +1,179 @@
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+
+from db.utils.vector_index import normalize
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    k = min(k, scores.shape[-1])
+    if k <= 0:
+        return np.empty(scores.shape[:-1] + (0,), dtype=np.int64)
+
+    top = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=-1), axis=-1)
+    return np.take_along_axis(top, order, axis=-1)
+
+
+class VectorMatrix:
+    """
+    Все нормализованные векторы одной матрицей float32 в .npy-файле,
+    который воркеры открывают через mmap и делят страницы между собой.
+    Поколения файлов переключаются атомарной заменой файла-указателя.
+    Матрицу пересобирают вручную, поэтому записи в индекс помечают её устаревшей:
+    отметка dirty новее начала сборки поколения.
+    """
+
+    def __init__(self, name: str, directory: Optional[str] = None):
+        self.name = name
+        self.directory = directory or settings.VECTOR_INDEX_DIR
+        self.pointer_path = os.path.join(self.directory, f'{name}.current')
+        self.dirty_path = os.path.join(self.directory, f'{name}.dirty')
+        self.generation = None
+        self.vectors: Optional[np.ndarray] = None
+        self.ids = np.empty(0, dtype=np.int64)
+        self.text_ids = np.empty(0, dtype=np.int64)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _paths(self, generation: str) -> Tuple[str, str]:
+        prefix = os.path.join(self.directory, f'{self.name}.{generation}')
+        return prefix + '.vectors.npy', prefix + '.ids.npy'
+
+    def _current_generation(self) -> Optional[str]:
+        try:
+            with open(self.pointer_path) as pointer:
+                return pointer.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def mark_dirty(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.dirty_path, 'a'):
+            pass
+        os.utime(self.dirty_path)
+
+    def is_fresh(self) -> bool:
+        self.refresh()
+        if self.generation is None:
+            return False
+        try:
+            # запись в индекс во время или после сборки (и в тот же тик часов) делает матрицу устаревшей
+            return os.stat(self.dirty_path).st_mtime_ns < int(self.generation)
+        except FileNotFoundError:
+            return True
+
+    def _remove_generations(self, keep: set) -> None:
+        prefix = f'{self.name}.'
+        for filename in os.listdir(self.directory):
+            generation = filename[len(prefix):].split('.')[0]
+            if filename.startswith(prefix) and generation.isdigit() and generation not in keep:
+                os.remove(os.path.join(self.directory, filename))
+
+    def refresh(self) -> None:
+        generation = self._current_generation()
+        if generation == self.generation:
+            return
+
+        with self._lock:
+            if generation is None:
+                self.vectors = None
+                self.ids = self.text_ids = np.empty(0, dtype=np.int64)
+            else:
+                vectors_path, ids_path = self._paths(generation)
+                ids = np.load(ids_path)
+                self.vectors = np.load(vectors_path, mmap_mode='r')
+                self.ids, self.text_ids = ids[0], ids[1]
+            self.generation = generation
+
+    def build(self, rows: Iterable[Tuple[int, int, np.ndarray]], count: int, dim: int) -> int:
+        os.makedirs(self.directory, exist_ok=True)
+        # имя поколения - mtime в тех же часах файловой системы, что и у отметки dirty
+        open(self.pointer_path + '.tmp', 'w').close()
+        generation = str(os.stat(self.pointer_path + '.tmp').st_mtime_ns)
+        vectors_path, ids_path = self._paths(generation)
+
+        vectors = np.lib.format.open_memmap(vectors_path, mode='w+', dtype=np.float32, shape=(count, dim))
+        ids = np.empty((2, count), dtype=np.int64)
+
+        written = 0
+        for row_id, text_id, vector in rows:
+            if written >= count:
+                break
+            vectors[written] = normalize(vector)
+            ids[0, written], ids[1, written] = row_id, text_id
+            written += 1
+        vectors.flush()
+        del vectors
+
+        # если строк оказалось меньше, чем ожидали, сохраняем только заполненную часть
+        if written < count:
+            full = np.load(vectors_path, mmap_mode='r')
+            trimmed = np.lib.format.open_memmap(vectors_path + '.tmp', mode='w+', dtype=np.float32,
+                                                shape=(written, dim))
+            trimmed[:] = full[:written]
+            trimmed.flush()
+            del trimmed, full
+            os.replace(vectors_path + '.tmp', vectors_path)
+        np.save(ids_path, ids[:, :written])
+
+        previous = self._current_generation()
+        with open(self.pointer_path + '.tmp', 'w') as pointer:
+            pointer.write(generation)
+        os.replace(self.pointer_path + '.tmp', self.pointer_path)
+
+        # предыдущее поколение удаляем только при следующей сборке:
+        # другой процесс мог уже прочитать старый указатель, но ещё не открыть файлы
+        self._remove_generations({generation, previous})
+
+        self.refresh()
+        return written
+
+    def _allowed_mask(self, allowed_text_ids: Optional[Iterable[int]]) -> Optional[np.ndarray]:
+        if allowed_text_ids is None:
+            return None
+        return np.isin(self.text_ids, np.fromiter(allowed_text_ids, dtype=np.int64))
+
+    def search(self, query: np.ndarray, k: int = 10,
+               allowed_text_ids: Optional[Iterable[int]] = None) -> List[Tuple[int, int, float]]:
+        return self.search_batch(np.asarray(query).reshape(1, -1), k, allowed_text_ids)[0]
+
+    def search_batch(self, queries: np.ndarray, k: int = 10, allowed_text_ids: Optional[Iterable[int]] = None,
+                     block_size: int = 256) -> List[List[Tuple[int, int, float]]]:
+        self.refresh()
+        queries = normalize(np.atleast_2d(queries))
+        if self.vectors is None or not len(self):
+            return [[] for _ in range(len(queries))]
+
+        mask = self._allowed_mask(allowed_text_ids)
+        results = []
+        # блоками, чтобы матрица scores (block x N) не разрасталась
+        for start in range(0, len(queries), block_size):
+            scores = queries[start:start + block_size] @ self.vectors.T
+            if mask is not None:
+                scores[:, ~mask] = -np.inf
+
+            top = top_k(scores, k)
+            for row, columns in enumerate(top):
+                results.append([
+                    (int(self.ids[i]), int(self.text_ids[i]), float(scores[row, i]))
+                    for i in columns if np.isfinite(scores[row, i])
+                ])
+        return results
+
+
+_matrices: Dict[str, VectorMatrix] = {}
+_matrices_lock = threading.Lock()
+
+
+def get_vector_matrix(name: str = 'chunks') -> VectorMatrix:
+    with _matrices_lock:
+        matrix = _matrices.get(name)
+        if matrix is None:
+            matrix = _matrices[name] = VectorMatrix(name)
+    return matrix
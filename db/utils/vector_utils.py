@@ -0,0 +1,30 @@
+import numpy as np
+from typing import Optional, Tuple
+
+VECTOR_DTYPES = ('float32', 'float16')
+
+
+def pack_vectors(vectors: np.ndarray, dtype: str = 'float32') -> Tuple[bytes, int, int]:
+    if dtype not in VECTOR_DTYPES:
+        raise ValueError(f"Unsupported vector dtype: {dtype}")
+
+    vectors = np.asarray(vectors)
+    if vectors.ndim == 1:
+        vectors = vectors.reshape(1, -1)
+    if vectors.size == 0:
+        return b'', 0, 0
+
+    rows, dim = vectors.shape
+    data = np.ascontiguousarray(vectors, dtype=dtype).tobytes()
+    return data, rows, dim
+
+
+def unpack_vectors(data: Optional[bytes], rows: int, dim: int, dtype: str = 'float32') -> np.ndarray:
+    if not data or not rows:
+        return np.empty((0, dim or 0), dtype=np.float32)
+
+    # memoryview из BinaryField читается без копирования
+    vectors = np.frombuffer(data, dtype=dtype).reshape(rows, dim)
+    if vectors.dtype != np.float32:
+        vectors = vectors.astype(np.float32)
+    return vectors
@@ -1,6 +1,7 @@
 from rest_framework.decorators import api_view
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponse
 import numpy as np
+from db.api.search_repository import SearchRepository
 from db.utils.embedding_utils import EmbeddingUtils
 
 
@@ -8,7 +9,10 @@ from db.utils.embedding_utils import EmbeddingUtils
 def chunk_text(request):
     data = request.data
     text = data.get("text", "")
-    utils = EmbeddingUtils()
+    try:
+        utils = EmbeddingUtils(chunking=data.get("chunking"))
+    except ValueError as e:
+        return HttpResponse(str(e), status=400)
     chunks = utils.get_chunks(text)
     return JsonResponse({"chunks": chunks})
 
@@ -18,7 +22,7 @@ def generate_embeddings(request):
     data = request.data
     texts = data.get("texts", [])
     utils = EmbeddingUtils()
-    embeddings = utils.get_embeddings(texts)
+    embeddings = utils.get_embeddings(texts, use_cache=False)
     return JsonResponse({"embeddings": embeddings.tolist()})
 
 
@@ -31,3 +35,67 @@ def compare_embeddings(request):
     utils = EmbeddingUtils()
     similarity = utils.cos_compare(emb1, emb2)
     return JsonResponse({"cosine_similarity": similarity})
+
+
+# ограничения поиска: число результатов на запрос
+SEARCH_MAX_K = 1000
+
+
+def positive_int(value, maximum=None):
+    # в JSON приходят числа, из форм - строки; bool тоже int, его не принимаем
+    if isinstance(value, str) and value.isdigit():
+        value = int(value)
+    if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+        return None
+    if maximum is not None and value > maximum:
+        return None
+    return value
+
+
+def search_options(data):
+    k = positive_int(data.get("k", 10), SEARCH_MAX_K)
+    if k is None:
+        return None, HttpResponse(f"k must be an integer from 1 to {SEARCH_MAX_K}", status=400)
+    nprobe = data.get("nprobe")
+    if nprobe is not None:
+        nprobe = positive_int(nprobe)
+        if nprobe is None:
+            return None, HttpResponse("nprobe must be a positive integer", status=400)
+    return {
+        "k": k,
+        "corpus": data.get("corpus"),
+        "genre": data.get("genre"),
+        "level": data.get("level", "chunk"),
+        "nprobe": nprobe,
+        "exact": data.get("exact", False) in (True, "1", "true"),
+    }, None
+
+
+@api_view(["POST"])
+def search(request):
+    data = request.data
+    query = data.get("query")
+    if not query:
+        return HttpResponse("Missing query", status=400)
+    options, error = search_options(data)
+    if error:
+        return error
+
+    repo = SearchRepository()
+    results = repo.search(query, **options)
+    return JsonResponse({"results": results})
+
+
+@api_view(["POST"])
+def search_batch(request):
+    data = request.data
+    queries = data.get("queries", [])
+    if not isinstance(queries, list):
+        return HttpResponse("queries must be a list", status=400)
+    options, error = search_options(data)
+    if error:
+        return error
+
+    repo = SearchRepository()
+    results = repo.search_batch(queries, **options)
+    return JsonResponse({"results": results})
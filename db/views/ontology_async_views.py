@@ -0,0 +1,255 @@
+from functools import wraps
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.http import JsonResponse, HttpResponse, HttpResponseNotAllowed, StreamingHttpResponse
+from rest_framework import exceptions
+from rest_framework.settings import api_settings
+import json
+
+from db.api.neo4j_async_repository import AsyncNeo4jRepository
+from db.api.neo4j_schema import FULLTEXT_LABELS
+from db.api.ontology_async_repository import AsyncOntologyRepository
+from db.api.ontology_repository import SEARCH_MODES
+from db.views.ontology_views import (
+    OBJECT_VIEW_MAX_DEPTH,
+    OBJECT_VIEW_MAX_LIMIT,
+    ONTOLOGY_LABELS,
+    ONTOLOGY_PAGE_MAX_LIMIT,
+    ONTOLOGY_PAGE_SIZE,
+    batch_response,
+    get_uris,
+)
+
+SEARCH_MAX_LIMIT = 100
+
+
+# ================== HELPER ==================
+
+def check_access(request):
+    # те же аутентификация и права, что у @api_view (REST_FRAMEWORK в settings)
+    user, auth = AnonymousUser(), None
+    for authenticator in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        result = authenticator().authenticate(request)
+        if result is not None:
+            user, auth = result
+            break
+    request.user, request.auth = user, auth
+
+    for permission in api_settings.DEFAULT_PERMISSION_CLASSES:
+        if not permission().has_permission(request, None):
+            raise exceptions.NotAuthenticated() if auth is None else exceptions.PermissionDenied()
+
+
+def async_api_view(methods):
+    """Аналог @api_view для async-представлений: DRF 3.x их не поддерживает."""
+
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return HttpResponseNotAllowed(methods)
+            try:
+                await sync_to_async(check_access)(request)
+            except exceptions.APIException as e:
+                return JsonResponse({"detail": str(e.detail)}, status=e.status_code)
+            return await view(request, *args, **kwargs)
+
+        # как и у @api_view, токен вместо CSRF
+        wrapper.csrf_exempt = True
+        return wrapper
+
+    return decorator
+
+
+class AsyncStreamingHttpResponse(StreamingHttpResponse):
+    """
+    Потоковый ответ поверх асинхронного итератора. Django 3.2 читает тело
+    StreamingHttpResponse синхронно, поэтому под ASGI его отдаёт обработчик из core.asgi,
+    а под WSGI (runserver) тело собирается целиком.
+    """
+
+    is_async = True
+
+    def _set_streaming_content(self, value):
+        self._iterator = value
+
+    async def __aiter__(self):
+        try:
+            async for part in self._iterator:
+                yield self.make_bytes(part)
+        finally:
+            await self._iterator.aclose()
+
+    def __iter__(self):
+        async def collect():
+            return [part async for part in self]
+
+        return iter(async_to_sync(collect)())
+
+
+def get_repo():
+    return AsyncOntologyRepository(AsyncNeo4jRepository())
+
+
+# ================== ONTOLOGY ==================
+
+async def stream_ontology_json(labels):
+    # {"classes": [...], "objects": [...]} отдаётся по мере чтения страниц из Neo4j;
+    # драйвер берём при первом чтении: он привязан к event loop, в котором идёт отдача
+    repo = get_repo()
+    yield "{"
+    for i, label in enumerate(labels):
+        yield ("," if i else "") + json.dumps(ONTOLOGY_LABELS[label]) + ":["
+        separator = ""
+        async for item in repo.iter_ontology(label, ONTOLOGY_PAGE_SIZE):
+            yield separator + json.dumps(item.to_dict())
+            separator = ","
+        yield "]"
+    yield "}"
+
+
+async def stream_ontology_ndjson(labels):
+    repo = get_repo()
+    for label in labels:
+        async for item in repo.iter_ontology(label, ONTOLOGY_PAGE_SIZE):
+            yield json.dumps({"type": label, **item.to_dict()}) + "\n"
+
+
+@async_api_view(['GET'])
+async def get_ontology(request):
+    label = request.GET.get("label")
+    if label and label not in ONTOLOGY_LABELS:
+        return HttpResponse("label must be Class or Object", status=400)
+    labels = [label] if label else list(ONTOLOGY_LABELS)
+
+    # ?limit=N[&after=uri] - одна страница с курсором на следующую
+    if "limit" in request.GET:
+        if not label:
+            return HttpResponse("Missing ?label= for paginated export", status=400)
+        limit = request.GET["limit"]
+        if not limit.isdigit() or not 1 <= int(limit) <= ONTOLOGY_PAGE_MAX_LIMIT:
+            return HttpResponse(f"limit must be an integer from 1 to {ONTOLOGY_PAGE_MAX_LIMIT}", status=400)
+        repo = get_repo()
+        items, next_uri = await repo.get_ontology_page(label, request.GET.get("after"), int(limit))
+        return JsonResponse({"items": [item.to_dict() for item in items], "next": next_uri})
+
+    if request.GET.get("format") == "ndjson":
+        return AsyncStreamingHttpResponse(stream_ontology_ndjson(labels), content_type="application/x-ndjson")
+    return AsyncStreamingHttpResponse(stream_ontology_json(labels), content_type="application/json")
+
+
+# ================== SEARCH ==================
+
+@async_api_view(['GET'])
+async def search(request):
+    text = request.GET.get("q", "")
+    mode = request.GET.get("mode", "prefix")
+    labels = request.GET.getlist("label")
+    limit = request.GET.get("limit", "20")
+    if not limit.isdigit() or not 1 <= int(limit) <= SEARCH_MAX_LIMIT:
+        return HttpResponse(f"limit must be an integer from 1 to {SEARCH_MAX_LIMIT}", status=400)
+    if mode not in SEARCH_MODES:
+        return HttpResponse(f"Unknown mode, expected one of {', '.join(SEARCH_MODES)}", status=400)
+    if any(label not in FULLTEXT_LABELS for label in labels):
+        return HttpResponse(f"Unknown label, expected one of {', '.join(FULLTEXT_LABELS)}", status=400)
+    repo = get_repo()
+    hits = await repo.search(text, mode, labels, int(limit))
+    return JsonResponse([hit.to_dict() for hit in hits], safe=False)
+
+
+# ================== CLASS ==================
+
+@async_api_view(['GET'])
+async def get_class(request):
+    uri = request.GET.get("uri")
+    if not uri:
+        return HttpResponse("Missing ?uri=", status=400)
+    repo = get_repo()
+    data = await repo.get_class(uri)
+    return JsonResponse(data.to_dict() if data else {}, safe=False)
+
+
+@async_api_view(['GET', 'POST'])
+async def get_classes(request):
+    uris = get_uris(request)
+    if not isinstance(uris, list) or not uris:
+        return HttpResponse("Missing uris", status=400)
+    repo = get_repo()
+    return batch_response(await repo.get_classes(uris))
+
+
+@async_api_view(['GET'])
+async def collect_inherited_signature(request):
+    uri = request.GET.get("uri")
+    if not uri:
+        return HttpResponse("Missing ?uri=", status=400)
+    repo = get_repo()
+    sig = await repo.collect_inherited_signature(uri)
+    return JsonResponse(sig.to_dict(), safe=False)
+
+
+@async_api_view(['POST'])
+async def collect_inherited_signatures(request):
+    data = json.loads(request.body)
+    uris = data.get("uris")
+    if not isinstance(uris, list):
+        return HttpResponse("Missing uris", status=400)
+    repo = get_repo()
+    sigs = await repo.collect_inherited_signatures(uris)
+    return JsonResponse({uri: sig.to_dict() for uri, sig in sigs.items()}, safe=False)
+
+
+# ================== OBJECTS ==================
+
+@async_api_view(['GET'])
+async def get_object(request):
+    uri = request.GET.get("uri")
+    repo = get_repo()
+    data = await repo.get_object(uri)
+    return JsonResponse(data.to_dict() if data else {}, safe=False)
+
+
+@async_api_view(['GET', 'POST'])
+async def get_objects(request):
+    uris = get_uris(request)
+    if not isinstance(uris, list) or not uris:
+        return HttpResponse("Missing uris", status=400)
+    repo = get_repo()
+    return batch_response(await repo.get_objects(uris))
+
+
+def object_view_params(request):
+    """(depth, limit) из query string или ответ 400"""
+    depth = request.GET.get("depth", "1")
+    if not depth.isdigit() or not 1 <= int(depth) <= OBJECT_VIEW_MAX_DEPTH:
+        return None, HttpResponse(f"depth must be an integer from 1 to {OBJECT_VIEW_MAX_DEPTH}", status=400)
+    limit = request.GET.get("limit", "100")
+    if not limit.isdigit() or not 1 <= int(limit) <= OBJECT_VIEW_MAX_LIMIT:
+        return None, HttpResponse(f"limit must be an integer from 1 to {OBJECT_VIEW_MAX_LIMIT}", status=400)
+    return (int(depth), int(limit)), None
+
+
+@async_api_view(['GET'])
+async def get_object_view(request):
+    uri = request.GET.get("uri")
+    if not uri:
+        return HttpResponse("Missing ?uri=", status=400)
+    params, error = object_view_params(request)
+    if error:
+        return error
+    repo = get_repo()
+    data = await repo.get_object_view(uri, *params)
+    return JsonResponse(data.to_dict() if data else {}, safe=False)
+
+
+@async_api_view(['GET', 'POST'])
+async def get_object_views(request):
+    uris = get_uris(request)
+    if not isinstance(uris, list) or not uris:
+        return HttpResponse("Missing uris", status=400)
+    params, error = object_view_params(request)
+    if error:
+        return error
+    repo = get_repo()
+    return batch_response(await repo.get_object_views(uris, *params))
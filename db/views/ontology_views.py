@@ -6,26 +6,38 @@ import json
 from db.api.neo4j_repository import Neo4jRepository
 from db.api.ontology_repository import OntologyRepository
 
-NEO4J_URI = "neo4j://127.0.0.1:7687"
-NEO4J_USER = "neo4j"
-NEO4J_PASSWORD = "12345678"
-
 
 # ================== HELPER ==================
 
+def get_uris(request):
+    if request.method == "POST":
+        return json.loads(request.body).get("uris")
+    return request.GET.getlist("uri")
+
+
+def batch_response(items):
+    return JsonResponse({
+        "items": {uri: item.to_dict() if item else None for uri, item in items.items()},
+        "missing": [uri for uri, item in items.items() if item is None],
+    })
+
+
 def get_repo():
-    neo = Neo4jRepository(NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD)
+    # сессии берутся из общего пула драйвера, закрывать ничего не нужно
+    neo = Neo4jRepository()
     return OntologyRepository(neo)
 
 
 # ================== ONTOLOGY ==================
 
-@api_view(['GET'])
-def get_ontology(request):
-    repo = get_repo()
-    ontology = repo.get_ontology()
-    repo.repo.close()
-    return JsonResponse(ontology.to_dict(), safe=False)
+# метка узла -> ключ в ответе /ontology/get/
+ONTOLOGY_LABELS = {"Class": "classes", "Object": "objects"}
+ONTOLOGY_PAGE_SIZE = 500
+ONTOLOGY_PAGE_MAX_LIMIT = 5000
+
+# ограничения карточки объекта: глубина обхода и число связей в каждом списке
+OBJECT_VIEW_MAX_DEPTH = 3
+OBJECT_VIEW_MAX_LIMIT = 1000
 
 
 # ================== CLASS ==================
@@ -34,45 +46,69 @@ def get_ontology(request):
 def get_ontology_parent_classes(request):
     repo = get_repo()
     data = repo.get_ontology_parent_classes()
-    repo.repo.close()
     return JsonResponse([c.to_dict() for c in data], safe=False)
 
 
 @api_view(['GET'])
-def get_class(request):
+def get_class_parents(request):
     uri = request.GET.get("uri")
     if not uri:
         return HttpResponse("Missing ?uri=", status=400)
     repo = get_repo()
-    data = repo.get_class(uri)
-    repo.repo.close()
-    return JsonResponse(data.to_dict() if data else {}, safe=False)
+    data = repo.get_class_parents(uri)
+    return JsonResponse([d.to_dict() for d in data], safe=False)
 
 
 @api_view(['GET'])
-def get_class_parents(request):
+def get_class_children(request):
     uri = request.GET.get("uri")
+    if not uri:
+        return HttpResponse("Missing ?uri=", status=400)
     repo = get_repo()
-    data = repo.get_class_parents(uri)
-    repo.repo.close()
+    data = repo.get_class_children(uri)
     return JsonResponse([d.to_dict() for d in data], safe=False)
 
 
 @api_view(['GET'])
-def get_class_children(request):
+def get_class_ancestors(request):
     uri = request.GET.get("uri")
+    if not uri:
+        return HttpResponse("Missing ?uri=", status=400)
     repo = get_repo()
-    data = repo.get_class_children(uri)
-    repo.repo.close()
+    data = repo.get_class_ancestors(uri)
     return JsonResponse([d.to_dict() for d in data], safe=False)
 
 
+@api_view(['GET'])
+def get_class_descendants(request):
+    uri = request.GET.get("uri")
+    if not uri:
+        return HttpResponse("Missing ?uri=", status=400)
+    repo = get_repo()
+    data = repo.get_class_descendants(uri)
+    return JsonResponse([d.to_dict() for d in data], safe=False)
+
+
+@api_view(['GET'])
+def get_class_subtree(request):
+    uri = request.GET.get("uri")
+    if not uri:
+        return HttpResponse("Missing ?uri=", status=400)
+    # без ?depth= - всё поддерево
+    depth = request.GET.get("depth")
+    if depth and not depth.isdigit():
+        return HttpResponse("depth must be a non-negative integer", status=400)
+    repo = get_repo()
+    data = repo.get_class_subtree(uri, int(depth) if depth else None)
+    return JsonResponse(data or {}, safe=False)
+
+
 @api_view(['GET'])
 def get_class_objects(request):
     uri = request.GET.get("uri")
+    deep = request.GET.get("deep") in ("1", "true")
     repo = get_repo()
-    data = repo.get_class_objects(uri)
-    repo.repo.close()
+    data = repo.get_class_objects(uri, deep)
     return JsonResponse([d.to_dict() for d in data], safe=False)
 
 
@@ -84,7 +120,6 @@ def create_class(request):
     parent_uri = data.get("parent_uri")
     repo = get_repo()
     obj = repo.create_class(title, description, parent_uri)
-    repo.repo.close()
     return JsonResponse(obj.to_dict(), safe=False)
 
 
@@ -95,17 +130,18 @@ def update_class(request):
     params = data.get("params", {})
     repo = get_repo()
     obj = repo.update_class(uri, params)
-    repo.repo.close()
     return JsonResponse(obj.to_dict() if obj else {}, safe=False)
 
 
 @api_view(['DELETE'])
 def delete_class(request):
     uri = request.GET.get("uri")
+    dry_run = request.GET.get("dry_run") in ("1", "true")
     repo = get_repo()
-    repo.delete_class(uri)
-    repo.repo.close()
-    return JsonResponse({"deleted": uri})
+    counts = repo.delete_class(uri, dry_run)
+    if dry_run:
+        return JsonResponse({"uri": uri, "dry_run": True, "counts": counts})
+    return JsonResponse({"deleted": uri, "counts": counts})
 
 
 # ================== CLASS ATTRIBUTES ==================
@@ -117,7 +153,6 @@ def add_class_attribute(request):
     title = data.get("title")
     repo = get_repo()
     attr = repo.add_class_attribute(class_uri, title)
-    repo.repo.close()
     return JsonResponse(attr.to_dict(), safe=False)
 
 
@@ -126,7 +161,6 @@ def delete_class_attribute(request):
     uri = request.GET.get("uri")
     repo = get_repo()
     repo.delete_class_attribute(uri)
-    repo.repo.close()
     return JsonResponse({"deleted": uri})
 
 
@@ -138,7 +172,6 @@ def add_class_object_attribute(request):
     range_class_uri = data["range_class_uri"]
     repo = get_repo()
     obj = repo.add_class_object_attribute(class_uri, attr_name, range_class_uri)
-    repo.repo.close()
     return JsonResponse(obj.to_dict(), safe=False)
 
 
@@ -147,7 +180,6 @@ def delete_class_object_attribute(request):
     uri = request.GET.get("uri")
     repo = get_repo()
     repo.delete_class_object_attribute(uri)
-    repo.repo.close()
     return JsonResponse({"deleted": uri})
 
 
@@ -157,22 +189,15 @@ def add_class_parent(request):
     parent_uri = data["parent_uri"]
     target_uri = data["target_uri"]
     repo = get_repo()
-    repo.add_class_parent(parent_uri, target_uri)
-    repo.repo.close()
+    try:
+        repo.add_class_parent(parent_uri, target_uri)
+    except ValueError as e:
+        return HttpResponse(str(e), status=404)
     return JsonResponse({"parent_added": parent_uri, "target": target_uri})
 
 
 # ================== OBJECTS ==================
 
-@api_view(['GET'])
-def get_object(request):
-    uri = request.GET.get("uri")
-    repo = get_repo()
-    data = repo.get_object(uri)
-    repo.repo.close()
-    return JsonResponse(data.to_dict() if data else {}, safe=False)
-
-
 @api_view(['POST'])
 def create_object(request):
     data = json.loads(request.body)
@@ -180,7 +205,6 @@ def create_object(request):
     params = data["params"]
     repo = get_repo()
     obj = repo.create_object(class_uri, params)
-    repo.repo.close()
     return JsonResponse(obj, safe=False)
 
 
@@ -191,7 +215,6 @@ def update_object(request):
     params = data["params"]
     repo = get_repo()
     obj = repo.update_object(uri, params)
-    repo.repo.close()
     return JsonResponse(obj.to_dict() if obj else {}, safe=False)
 
 
@@ -200,7 +223,6 @@ def delete_object(request):
     uri = request.GET.get("uri")
     repo = get_repo()
     repo.delete_object(uri)
-    repo.repo.close()
     return JsonResponse({"deleted": uri})
 
 
@@ -211,5 +233,4 @@ def collect_signature(request):
     uri = request.GET.get("uri")
     repo = get_repo()
     sig = repo.collect_signature(uri)
-    repo.repo.close()
     return JsonResponse(sig.to_dict() if sig else {}, safe=False)
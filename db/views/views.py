@@ -4,8 +4,11 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
 import json
 
+from db.api.alignment_repository import AlignmentRepository
 from db.api.corpus_repository import CorpusRepository
 from db.api.text_repository import TextRepository
+from db.api.embedding_job_repository import EmbeddingJobRepository
+from db.api.entity_link_repository import EntityLinkRepository
 
 # --- CORPUS ---
 
@@ -22,14 +25,20 @@ def getCorpus(request):
 def createCorpus(request):
     data = json.loads(request.body.decode('utf-8'))
     repo = CorpusRepository()
-    result = repo.create_corpus(data=data)
+    try:
+        result = repo.create_corpus(data=data)
+    except ValueError as e:
+        return HttpResponse(str(e), status=400)
     return JsonResponse(result)
 
 @api_view(['PUT'])
 def updateCorpus(request, corpus_id):
     data = json.loads(request.body.decode('utf-8'))
     repo = CorpusRepository()
-    result = repo.update_corpus(corpus_id, data)
+    try:
+        result = repo.update_corpus(corpus_id, data)
+    except ValueError as e:
+        return HttpResponse(str(e), status=400)
     return JsonResponse(result)
 
 @api_view(['DELETE'])
@@ -53,6 +62,45 @@ def getText(request):
     result = repo.getText(id)
     return Response(result)
 
+@api_view(['GET'])
+def getTextChunks(request):
+    id = request.GET.get('id')
+    if not id:
+        return HttpResponse(status=400)
+    repo = TextRepository()
+    result = repo.getTextChunks(id)
+    return Response(result)
+
+@api_view(['GET'])
+def getTextAlignment(request):
+    id = request.GET.get('id')
+    if not id:
+        return HttpResponse(status=400)
+    repo = AlignmentRepository()
+    try:
+        result = repo.get_alignment(id, refresh=request.GET.get('refresh') == '1')
+    except ValueError as e:
+        return HttpResponse(str(e), status=400)
+    return Response(result)
+
+@api_view(['GET'])
+def getTextEntities(request):
+    id = request.GET.get('id')
+    if not id:
+        return HttpResponse(status=400)
+    repo = EntityLinkRepository()
+    result = repo.get_text_links(id)
+    return Response(result)
+
+@api_view(['GET'])
+def getTextEmbeddingStatus(request):
+    id = request.GET.get('id')
+    if not id:
+        return HttpResponse(status=400)
+    repo = EmbeddingJobRepository()
+    result = repo.get_status(id)
+    return Response(result)
+
 @api_view(['POST'])
 def createText(request):
     data = json.loads(request.body.decode('utf-8'))
@@ -67,6 +115,29 @@ def createText(request, text_id):
     result = repo.update_text(text_id, data)
     return JsonResponse(result)
 
+def iter_jsonl(lines):
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if line:
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"Invalid JSONL at body line {number}: {e}")
+
+@api_view(['POST'])
+def importTexts(request):
+    corpus = request.GET.get('corpus')
+    if corpus and not corpus.isdigit():
+        return HttpResponse("corpus must be an integer id", status=400)
+    repo = TextRepository()
+    # тело читаем построчно, не загружая весь JSONL в память
+    result = repo.import_texts(
+        iter_jsonl(iter(request.readline, b'')),
+        default_corpus=int(corpus) if corpus else None,
+    )
+    # записи до битой строки уже сохранены: отдаём их статистику вместе с ошибкой
+    return JsonResponse(result, status=400 if result["aborted"] else 200)
+
 @api_view(['DELETE'])
 def deleteText(request):
     id = request.GET.get('id')
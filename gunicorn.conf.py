@@ -0,0 +1,15 @@
+# Gunicorn читает этот файл автоматически при запуске из корня проекта
+
+
+def post_worker_init(worker):
+    # Загружаем модели эмбеддингов в воркер до первого запроса
+    from db.utils.model_registry import registry
+    registry.warm_up()
+
+
+def worker_exit(server, worker):
+    # Закрываем пул соединений Neo4j при остановке воркера.
+    # Асинхронный драйвер привязан к event loop воркера, который здесь уже остановлен:
+    # его закрывает lifespan.shutdown в core.asgi
+    from db.api.neo4j_driver import close_driver
+    close_driver()